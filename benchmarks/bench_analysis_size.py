@@ -0,0 +1,63 @@
+"""Measures the speedup of scoring the frames at a lower resolution, and the agreement with the full resolution
+keyframes.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_analysis_size -ffmpeg ffmpeg -ffprobe ffprobe
+
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic_videos import make_test_video
+from videokf.ffmpeg_manager.check_ffmpeg import get_ff
+from videokf.utils.vidutils import get_iframes, get_keyframes_color, get_keyframes_flow, stream_frames
+
+
+# (size, duration in seconds, gop, source) of the generated videos
+VIDEOS = [("1920x1080", 10, 25, "testsrc"), ("3840x2160", 5, 25, "mandelbrot")]
+
+# Maximum widths of the frames used to score the shots. None is the full resolution
+ANALYSIS_SIZES = [None, 960, 640, 320, 160]
+
+METHODS = {"color": get_keyframes_color, "flow": get_keyframes_flow}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the analysis of the frames at lower resolutions")
+    parser.add_argument("-ffmpeg", "--ffmpeg", type=str, help="Path to the Ffmpeg executable")
+    parser.add_argument("-ffprobe", "--ffprobe", type=str, help="Path to the Ffprobe executable")
+    parser.add_argument("-d", "--videos_dir", type=str, help="Directory where the synthetic videos are generated")
+    args = parser.parse_args()
+
+    ffmpeg_exe = args.ffmpeg or get_ff("ffmpeg")
+    ffprobe_exe = args.ffprobe or get_ff("ffprobe")
+    videos_dir = Path(args.videos_dir or tempfile.mkdtemp(prefix="videokf_bench_"))
+
+    print(f"{'video':<40}{'method':<8}{'width':>6}{'time (s)':>10}{'speedup':>9}{'agreement':>11}")
+    for size, duration, gop, source in VIDEOS:
+        video_file = str(make_test_video(ffmpeg_exe, videos_dir / f"{source}_{size}_{duration}s_g{gop}.mp4",
+                                         size=size, duration=duration, gop=gop, source=source))
+        iframes = get_iframes(ffprobe_exe, video_file)
+
+        for method, get_keyframes_method in METHODS.items():
+            reference = None
+            for analysis_size in ANALYSIS_SIZES:
+                start = time.perf_counter()
+                frames = stream_frames(ffmpeg_exe, ffprobe_exe, video_file, analysis_size=analysis_size)
+                keyframes = get_keyframes_method(iframes, frames)
+                elapsed = time.perf_counter() - start
+
+                if reference is None:
+                    reference, reference_time = keyframes, elapsed
+
+                # Fraction of shots with the same keyframe as at full resolution
+                agreement = sum(a == b for a, b in zip(reference, keyframes)) / max(len(reference), 1)
+                print(f"{Path(video_file).name:<40}{method:<8}{analysis_size or 'full':>6}{elapsed:>10.2f}"
+                      f"{reference_time / elapsed:>8.1f}x{agreement:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Measures the speedup of decoding a video by ranges of frames in parallel, against the number of workers, and checks
+that the frames are exactly the same as in a sequential decode.
+
+Every frame decoded by ranges must have the same index and the same pixels as the frame decoded sequentially, both
+when the frames are streamed (see stream_frames_chunked()) and when they are extracted to a folder (see
+extract_frames_chunked()). The exit code is 1 if any frame is different.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_chunked -ffmpeg ffmpeg -ffprobe ffprobe
+
+"""
+import sys
+import os
+import argparse
+import hashlib
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic_videos import make_test_video
+from videokf.ffmpeg_manager.check_ffmpeg import get_ff
+from videokf.utils.frame_index import probe_frame_index
+from videokf.utils.vidutils import extract_frames, stream_frames, stream_frames_chunked
+
+
+# (size, duration in seconds, gop, source) of the generated videos
+VIDEOS = [("1920x1080", 20, 50, "testsrc"), ("1280x720", 20, 100, "mandelbrot")]
+
+
+def hash_frames(frames):
+    """Gets the hash of every frame of a sequence, in order."""
+    return [hashlib.sha1(im.tobytes()).hexdigest() for im in frames]
+
+
+def hash_files(frames_dir):
+    """Gets the hash of every file of a folder, by name."""
+    return {path.name: hashlib.sha1(path.read_bytes()).hexdigest() for path in Path(frames_dir).iterdir()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the decoding of a video by ranges of frames in parallel")
+    parser.add_argument("-ffmpeg", "--ffmpeg", type=str, help="Path to the Ffmpeg executable")
+    parser.add_argument("-ffprobe", "--ffprobe", type=str, help="Path to the Ffprobe executable")
+    parser.add_argument("-d", "--videos_dir", type=str, help="Directory where the synthetic videos are generated")
+    args = parser.parse_args()
+
+    ffmpeg_exe = args.ffmpeg or get_ff("ffmpeg")
+    ffprobe_exe = args.ffprobe or get_ff("ffprobe")
+    videos_dir = Path(args.videos_dir or tempfile.mkdtemp(prefix="videokf_bench_"))
+
+    # Powers of two up to the number of cores of the machine
+    n_cores = os.cpu_count() or 1
+    all_workers = [2 ** k for k in range(1, n_cores.bit_length()) if 2 ** k <= n_cores]
+
+    n_errors = 0
+    print(f"{'video':<40}{'mode':<8}{'workers':>8}{'time (s)':>10}{'speedup':>9}  check")
+    for size, duration, gop, source in VIDEOS:
+        video_file = str(make_test_video(ffmpeg_exe, videos_dir / f"{source}_{size}_{duration}s_g{gop}.mp4",
+                                         size=size, duration=duration, gop=gop, source=source))
+        name = Path(video_file).name
+        frame_index = probe_frame_index(ffprobe_exe, video_file)
+        iframes, frame_times = frame_index.iframes, frame_index.frame_times
+
+        # Streamed frames
+        start = time.perf_counter()
+        reference = hash_frames(stream_frames(ffmpeg_exe, ffprobe_exe, video_file))
+        sequential_time = time.perf_counter() - start
+        print(f"{name:<40}{'stream':<8}{1:>8}{sequential_time:>10.2f}{1:>8.1f}x  {len(reference)} frames")
+
+        for workers in all_workers:
+            start = time.perf_counter()
+            hashes = hash_frames(stream_frames_chunked(ffmpeg_exe, ffprobe_exe, video_file, iframes, frame_times,
+                                                       workers))
+            elapsed = time.perf_counter() - start
+
+            check = "ok" if hashes == reference else "different frames"
+            n_errors += hashes != reference
+            print(f"{name:<40}{'stream':<8}{workers:>8}{elapsed:>10.2f}{sequential_time / elapsed:>8.1f}x  {check}")
+
+        # Frames extracted to a folder
+        with tempfile.TemporaryDirectory(prefix="videokf_frames_") as frames_dir:
+            start = time.perf_counter()
+            extract_frames(ffmpeg_exe, video_file, output_dir=frames_dir, profile="archival")
+            sequential_time = time.perf_counter() - start
+            reference = hash_files(frames_dir)
+        print(f"{name:<40}{'extract':<8}{1:>8}{sequential_time:>10.2f}{1:>8.1f}x  {len(reference)} files")
+
+        for workers in all_workers:
+            with tempfile.TemporaryDirectory(prefix="videokf_frames_") as frames_dir:
+                start = time.perf_counter()
+                extract_frames(ffmpeg_exe, video_file, output_dir=frames_dir, frame_times=frame_times,
+                               profile="archival", iframes=iframes, workers=workers)
+                elapsed = time.perf_counter() - start
+                files = hash_files(frames_dir)
+
+            check = "ok" if files == reference else "different frames"
+            n_errors += files != reference
+            print(f"{name:<40}{'extract':<8}{workers:>8}{elapsed:>10.2f}{sequential_time / elapsed:>8.1f}x  {check}")
+
+    if n_errors:
+        print(f"!!! {n_errors} decodes by ranges gave different frames than the sequential decode !!!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
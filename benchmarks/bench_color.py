@@ -0,0 +1,96 @@
+"""Checks that the batched color method selects the same keyframes as the per frame one, and compares their speed.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_color -ffmpeg ffmpeg -ffprobe ffprobe
+
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import cv2
+
+from benchmarks.synthetic_videos import make_test_video
+from videokf.ffmpeg_manager.check_ffmpeg import get_ff
+from videokf.keyframe_manager.frame_manager import Frame
+from videokf.utils.vidutils import get_iframes, get_keyframes_color, iter_shots, stream_frames
+
+
+# (size, duration in seconds, gop, source) of the generated videos
+VIDEOS = [("320x240", 20, 50, "testsrc"), ("640x360", 20, 25, "mandelbrot"), ("1280x720", 10, 100, "testsrc")]
+
+
+def get_keyframes_color_reference(iframes, frames):
+    """Selects the keyframes with a Frame and a cv2.compareHist call for every frame (previous implementation).
+
+    Every shot sequence yielded by iter_shots() is scored, including the last one, from the last iframe to the end of
+    the video.
+
+    """
+    keyframes = [None] * len(iframes)
+
+    for i, (start, shot) in enumerate(iter_shots(frames, iframes)):
+        # The histograms are flattened, since cv2.compareHist() gives wrong correlations for 3D histograms in OpenCV 5
+        all_hist = np.array([Frame(j, im).histogram.ravel() for j, im in enumerate(shot, start)])
+        color_mean = np.mean(all_hist, axis=0)
+
+        min_corr = -1
+        min_idx = 0
+        for h in range(all_hist.shape[0]):
+            corr = cv2.compareHist(all_hist[h], color_mean, cv2.HISTCMP_CORREL)
+            if corr >= min_corr:
+                min_corr = corr
+                min_idx = h
+
+        keyframes[i] = start + min_idx
+
+    return keyframes
+
+
+def time_method(method, iframes, frames):
+    """Runs a color method over already decoded frames and returns its wall time, in seconds, and its keyframes."""
+    start = time.perf_counter()
+    keyframes = method(iframes, frames)
+
+    return time.perf_counter() - start, keyframes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checks and benchmarks the batched color method")
+    parser.add_argument("-ffmpeg", "--ffmpeg", type=str, help="Path to the Ffmpeg executable")
+    parser.add_argument("-ffprobe", "--ffprobe", type=str, help="Path to the Ffprobe executable")
+    parser.add_argument("-d", "--videos_dir", type=str, help="Directory where the synthetic videos are generated")
+    args = parser.parse_args()
+
+    ffmpeg_exe = args.ffmpeg or get_ff("ffmpeg")
+    ffprobe_exe = args.ffprobe or get_ff("ffprobe")
+    videos_dir = Path(args.videos_dir or tempfile.mkdtemp(prefix="videokf_bench_"))
+
+    mismatches = 0
+    print(f"{'video':<40}{'shots':>6}{'per frame (s)':>15}{'batched (s)':>13}{'speedup':>9}  check")
+    for size, duration, gop, source in VIDEOS:
+        video_file = make_test_video(ffmpeg_exe, videos_dir / f"{source}_{size}_{duration}s_g{gop}.mp4", size=size,
+                                     duration=duration, gop=gop, source=source)
+
+        # Decode the frames once, so that only the scoring is timed
+        iframes = get_iframes(ffprobe_exe, str(video_file))
+        frames = list(stream_frames(ffmpeg_exe, ffprobe_exe, str(video_file)))
+
+        reference_time, reference = time_method(get_keyframes_color_reference, iframes, frames)
+        batched_time, keyframes = time_method(get_keyframes_color, iframes, frames)
+
+        different = sum(a != b for a, b in zip(reference, keyframes)) + abs(len(reference) - len(keyframes))
+        mismatches += different
+        check = "ok" if different == 0 else f"{different} different keyframes"
+        print(f"{video_file.name:<40}{len(keyframes):>6}{reference_time:>15.3f}{batched_time:>13.3f}"
+              f"{reference_time / batched_time:>8.1f}x  {check}")
+
+    if mismatches:
+        raise SystemExit(f"The batched color method selected {mismatches} different keyframes")
+
+
+if __name__ == "__main__":
+    main()
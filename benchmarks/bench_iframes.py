@@ -0,0 +1,59 @@
+"""Compares the speed of the two ffprobe modes of get_iframes() on synthetic videos.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_iframes -ffmpeg ffmpeg -ffprobe ffprobe
+
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic_videos import make_test_video
+from videokf.ffmpeg_manager.check_ffmpeg import get_ff
+from videokf.utils.vidutils import get_iframes, validate_iframes
+
+
+# (size, duration in seconds, gop) of the generated videos
+VIDEOS = [("320x240", 60, 250), ("1280x720", 30, 250), ("1280x720", 30, 25), ("1920x1080", 20, 100)]
+
+
+def time_function(function, *args, repeat=3, **kwargs):
+    """Runs a function several times and returns the best wall time, in seconds, and its result."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the ffprobe modes used to get the iframes of a video")
+    parser.add_argument("-ffmpeg", "--ffmpeg", type=str, help="Path to the Ffmpeg executable")
+    parser.add_argument("-ffprobe", "--ffprobe", type=str, help="Path to the Ffprobe executable")
+    parser.add_argument("-d", "--videos_dir", type=str, help="Directory where the synthetic videos are generated")
+    args = parser.parse_args()
+
+    ffmpeg_exe = args.ffmpeg or get_ff("ffmpeg")
+    ffprobe_exe = args.ffprobe or get_ff("ffprobe")
+    videos_dir = Path(args.videos_dir or tempfile.mkdtemp(prefix="videokf_bench_"))
+
+    print(f"{'video':<32}{'iframes':>8}{'frames (s)':>12}{'packets (s)':>13}{'speedup':>9}  check")
+    for size, duration, gop in VIDEOS:
+        video_file = make_test_video(ffmpeg_exe, videos_dir / f"testsrc_{size}_{duration}s_g{gop}.mp4", size=size,
+                                     duration=duration, gop=gop)
+
+        slow_time, iframes = time_function(get_iframes, ffprobe_exe, str(video_file))
+        fast_time, _ = time_function(get_iframes, ffprobe_exe, str(video_file), fast=True)
+        mismatches = validate_iframes(ffprobe_exe, str(video_file))
+
+        check = "ok" if not mismatches else f"{len(mismatches)} mismatches"
+        print(f"{video_file.name:<32}{len(iframes):>8}{slow_time:>12.3f}{fast_time:>13.3f}"
+              f"{slow_time / fast_time:>8.1f}x  {check}")
+
+
+if __name__ == "__main__":
+    main()
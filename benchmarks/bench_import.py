@@ -0,0 +1,87 @@
+"""Measures the time taken by 'import videokf' (with python -X importtime) and checks that it doesn't import the heavy
+modules (numpy, cv2 and requests), which are only imported when the code that needs them runs.
+
+Every run imports videokf in a new interpreter, so the modules are never already imported. The exit code is 1 if any
+heavy module is imported.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_import
+
+"""
+import sys
+import argparse
+import subprocess
+
+
+# Modules that must not be imported by 'import videokf'
+HEAVY_MODULES = ["numpy", "cv2", "requests"]
+
+
+def run_import(module="videokf"):
+    """Imports a module in a new interpreter, with python -X importtime.
+
+    Args:
+        module (str): Name of the module.
+
+    Returns:
+        tuple: Import time of every module, as a dict {module: (self time, cumulative time)} in microseconds, and the
+               heavy modules imported (see HEAVY_MODULES).
+
+    """
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", code], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, check=True, universal_newlines=True)
+
+    return parse_importtime(output.stderr.splitlines()), [m for m in output.stdout.strip().split(",") if m]
+
+
+def parse_importtime(lines):
+    """Parses the output of python -X importtime.
+
+    Args:
+        lines (iterable[str]): Lines of the output, like 'import time:       412 |       1297 |   videokf'.
+
+    Returns:
+        dict: Self time and cumulative time of every module, in microseconds, as tuples.
+
+    """
+    times = {}
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # Header of the output
+            continue
+
+        times[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the time taken by 'import videokf'")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Number of runs. The best one is reported")
+    parser.add_argument("-n", "--top", type=int, default=10, help="Number of slowest modules shown")
+    args = parser.parse_args()
+
+    best_times, heavy_modules = None, []
+    for _ in range(args.repeat):
+        times, heavy_modules = run_import()
+        if best_times is None or times["videokf"][1] < best_times["videokf"][1]:
+            best_times = times
+
+    print(f"import videokf: {best_times['videokf'][1] / 1000:.1f} ms (best of {args.repeat})")
+    print(f"{'module':<48}{'self (ms)':>10}{'cumulative (ms)':>17}")
+    for module, (self_time, cumulative_time) in sorted(best_times.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"{module:<48}{self_time / 1000:>10.1f}{cumulative_time / 1000:>17.1f}")
+
+    if heavy_modules:
+        print(f"!!! 'import videokf' imports {', '.join(heavy_modules)} !!!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
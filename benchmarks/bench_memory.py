@@ -0,0 +1,82 @@
+"""Measures the peak memory of scoring a single, very long shot sequence with the "color" method, against its length.
+
+With the default memory limit, the peak memory must stay flat as the shot grows. Without limit, the stored histograms
+grow with the length of the shot. The exit code is 1 if, with the limit, the peak memory of the longest shot is more
+than the limit above the one of the shortest shot.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_memory -ffmpeg ffmpeg -ffprobe ffprobe
+
+"""
+import sys
+import argparse
+import tempfile
+from pathlib import Path
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic_videos import make_test_video
+from videokf.ffmpeg_manager.check_ffmpeg import get_ff
+from videokf.utils.profiling import get_peak_rss
+from videokf.utils.vidutils import SHOT_MEMORY_LIMIT, select_keyframe_color, stream_frames
+
+
+# (size, duration in seconds, rate) of the generated video: 100k frames
+VIDEO = ("160x90", 1000, 100)
+
+# Number of frames of the shot sequence
+SHOT_LENGTHS = [10000, 25000, 50000, 100000]
+
+
+def score_shot(ffmpeg_exe, ffprobe_exe, video_file, n_frames, memory_limit):
+    """Scores the first frames of a video as a single shot sequence. It is run in a new process, so that the peak
+    memory is only the one of this run.
+
+    Returns:
+        tuple: Keyframe and peak memory of the process, in bytes.
+
+    """
+    frames = stream_frames(ffmpeg_exe, ffprobe_exe, video_file, n_frames=n_frames)
+    keyframe = select_keyframe_color(0, frames, memory_limit)
+
+    return keyframe, get_peak_rss()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the memory of scoring long shot sequences")
+    parser.add_argument("-ffmpeg", "--ffmpeg", type=str, help="Path to the Ffmpeg executable")
+    parser.add_argument("-ffprobe", "--ffprobe", type=str, help="Path to the Ffprobe executable")
+    parser.add_argument("-d", "--videos_dir", type=str, help="Directory where the synthetic videos are generated")
+    args = parser.parse_args()
+
+    ffmpeg_exe = args.ffmpeg or get_ff("ffmpeg")
+    ffprobe_exe = args.ffprobe or get_ff("ffprobe")
+    videos_dir = Path(args.videos_dir or tempfile.mkdtemp(prefix="videokf_bench_"))
+
+    size, duration, rate = VIDEO
+    video_file = str(make_test_video(ffmpeg_exe, videos_dir / f"testsrc_{size}_{duration}s_r{rate}.mp4", size=size,
+                                     duration=duration, rate=rate))
+
+    print(f"{'frames':>8}{'limit (MB)':>12}{'keyframe':>10}{'peak rss (MB)':>15}")
+    limited_rss = []
+    for memory_limit in [SHOT_MEMORY_LIMIT, 2 ** 40]:
+        for n_frames in SHOT_LENGTHS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                keyframe, peak_rss = executor.submit(score_shot, ffmpeg_exe, ffprobe_exe, video_file, n_frames,
+                                                     memory_limit).result()
+
+            limit = f"{memory_limit / 1024 ** 2:.0f}" if memory_limit < 2 ** 40 else "none"
+            print(f"{n_frames:>8}{limit:>12}{keyframe:>10}{(peak_rss or 0) / 1e6:>15.1f}")
+            if memory_limit == SHOT_MEMORY_LIMIT and peak_rss is not None:
+                limited_rss.append(peak_rss)
+
+    if len(limited_rss) > 1 and limited_rss[-1] - limited_rss[0] > SHOT_MEMORY_LIMIT:
+        growth = limited_rss[-1] - limited_rss[0]
+        print(f"!!! The peak memory grew {growth / 1e6:.1f} MB with the length of the shot, more than the limit of "
+              f"{SHOT_MEMORY_LIMIT / 1e6:.1f} MB !!!")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
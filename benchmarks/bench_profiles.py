@@ -0,0 +1,57 @@
+"""Compares the decode profiles on every method, measuring the time and the size of the saved keyframes.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_profiles -ffmpeg ffmpeg -ffprobe ffprobe
+
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic_videos import make_test_video
+from videokf.ffmpeg_manager.check_ffmpeg import get_ff
+from videokf.keyframe_manager.keyframe_extractor import VALID_METHODS, get_keyframes
+from videokf.utils.decode_profile import DECODE_PROFILES
+
+
+# (size, duration in seconds, gop, source) of the generated videos
+VIDEOS = [("1280x720", 20, 50, "testsrc"), ("1920x1080", 10, 25, "mandelbrot")]
+
+
+def get_dir_size(directory):
+    """Gets the total size of the files in a directory, in bytes."""
+    return sum(f.stat().st_size for f in Path(directory).glob("*") if f.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the decode profiles")
+    parser.add_argument("-ffmpeg", "--ffmpeg", type=str, help="Path to the Ffmpeg executable")
+    parser.add_argument("-ffprobe", "--ffprobe", type=str, help="Path to the Ffprobe executable")
+    parser.add_argument("-d", "--videos_dir", type=str, help="Directory where the synthetic videos are generated")
+    args = parser.parse_args()
+
+    ffmpeg_exe = args.ffmpeg or get_ff("ffmpeg")
+    ffprobe_exe = args.ffprobe or get_ff("ffprobe")
+    videos_dir = Path(args.videos_dir or tempfile.mkdtemp(prefix="videokf_bench_"))
+
+    print(f"{'video':<40}{'method':<9}{'profile':<15}{'time (s)':>10}{'written (MB)':>14}")
+    for size, duration, gop, source in VIDEOS:
+        video_file = str(make_test_video(ffmpeg_exe, videos_dir / f"{source}_{size}_{duration}s_g{gop}.mp4",
+                                         size=size, duration=duration, gop=gop, source=source))
+
+        for method in VALID_METHODS:
+            for profile in DECODE_PROFILES:
+                with tempfile.TemporaryDirectory(prefix="videokf_keyframes_") as output_dir:
+                    start = time.perf_counter()
+                    get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method, output_dir, use_cache=False,
+                                  profile=profile)
+                    elapsed = time.perf_counter() - start
+                    written = get_dir_size(output_dir)
+
+                print(f"{Path(video_file).name:<40}{method:<9}{profile:<15}{elapsed:>10.2f}{written / 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
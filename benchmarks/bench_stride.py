@@ -0,0 +1,70 @@
+"""Measures the speedup of scoring only a sample of the frames, and the accuracy against scoring all of them.
+
+The accuracy is given as the fraction of shots with the same keyframe as scoring all the frames, and as the mean
+distance, in frames, between both keyframes.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_stride -ffmpeg ffmpeg -ffprobe ffprobe
+
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic_videos import make_test_video
+from videokf.ffmpeg_manager.check_ffmpeg import get_ff
+from videokf.keyframe_manager.keyframe_extractor import iter_keyframe_indices
+from videokf.utils.vidutils import get_frame_times, get_iframes
+
+
+# (size, duration in seconds, gop, source) of the generated videos. Long GOPs, as in static camera feeds
+VIDEOS = [("1280x720", 60, 500, "testsrc"), ("1280x720", 30, 250, "mandelbrot")]
+
+# (stride, scene threshold) of every sampling. (1, None) scores all the frames
+SAMPLINGS = [(1, None), (2, None), (5, None), (10, None), (25, None), (10, 0.1), (25, 0.1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the sampling of the frames")
+    parser.add_argument("-ffmpeg", "--ffmpeg", type=str, help="Path to the Ffmpeg executable")
+    parser.add_argument("-ffprobe", "--ffprobe", type=str, help="Path to the Ffprobe executable")
+    parser.add_argument("-d", "--videos_dir", type=str, help="Directory where the synthetic videos are generated")
+    parser.add_argument("-s", "--analysis-size", dest="analysis_size", type=int, default=320, help="Maximum width "
+                        "of the frames used to score the shots")
+    args = parser.parse_args()
+
+    ffmpeg_exe = args.ffmpeg or get_ff("ffmpeg")
+    ffprobe_exe = args.ffprobe or get_ff("ffprobe")
+    videos_dir = Path(args.videos_dir or tempfile.mkdtemp(prefix="videokf_bench_"))
+
+    print(f"{'video':<40}{'method':<8}{'stride':>7}{'scene':>7}{'time (s)':>10}{'speedup':>9}{'same':>7}"
+          f"{'distance':>10}")
+    for size, duration, gop, source in VIDEOS:
+        video_file = str(make_test_video(ffmpeg_exe, videos_dir / f"{source}_{size}_{duration}s_g{gop}.mp4",
+                                         size=size, duration=duration, gop=gop, source=source))
+        iframes = get_iframes(ffprobe_exe, video_file)
+        frame_times = get_frame_times(ffprobe_exe, video_file)
+
+        for method in ["color", "flow"]:
+            reference = None
+            for stride, scene_threshold in SAMPLINGS:
+                start = time.perf_counter()
+                keyframes = list(iter_keyframe_indices(ffmpeg_exe, ffprobe_exe, video_file, method, iframes,
+                                                       frame_times, analysis_size=args.analysis_size, stride=stride,
+                                                       scene_threshold=scene_threshold))
+                elapsed = time.perf_counter() - start
+
+                if reference is None:
+                    reference, reference_time = keyframes, elapsed
+
+                n_shots = max(len(reference), 1)
+                same = sum(a == b for a, b in zip(reference, keyframes)) / n_shots
+                distance = sum(abs(a - b) for a, b in zip(reference, keyframes)) / n_shots
+                print(f"{Path(video_file).name:<40}{method:<8}{stride:>7}{scene_threshold or '-':>7}{elapsed:>10.2f}"
+                      f"{reference_time / elapsed:>8.1f}x{same:>7.0%}{distance:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
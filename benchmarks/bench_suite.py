@@ -0,0 +1,186 @@
+"""Runs every method on a set of synthetic videos, measuring the frames per second, the peak memory and the bytes
+written, and compares the results against a stored baseline.
+
+It runs offline on a CPU-only machine, as long as ffmpeg and ffprobe are given or found locally (see get_ff()). Run it
+from the root of the repository:
+
+    python -m benchmarks.bench_suite -ffmpeg ffmpeg -ffprobe ffprobe --save-baseline
+
+to store the baseline of the current version, and later:
+
+    python -m benchmarks.bench_suite -ffmpeg ffmpeg -ffprobe ffprobe
+
+to compare a new version against it. The exit code is 1 if any result is worse than the baseline by more than the
+threshold, or if there is no baseline to compare with (the file is missing, or it misses any case of the suite).
+
+"""
+import sys
+import json
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from multiprocessing import get_context
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic_videos import make_test_video
+from videokf.extract_keyframes import extract_keyframes
+from videokf.ffmpeg_manager.check_ffmpeg import get_ff
+from videokf.keyframe_manager.keyframe_extractor import VALID_METHODS
+from videokf.utils.profiling import get_files_size, get_peak_rss
+from videokf.utils.vidutils import get_frame_times
+
+
+# (size, duration in seconds, gop, source) of the generated videos
+VIDEOS = [("320x240", 30, 250, "testsrc"), ("640x360", 20, 50, "testsrc"), ("1280x720", 10, 25, "mandelbrot"),
+          ("1920x1080", 10, 100, "testsrc")]
+
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+
+# Maximum relative regression allowed against the baseline
+DEFAULT_THRESHOLD = 0.1
+
+# For every metric, 1 if higher is better and -1 if lower is better
+METRICS = {"fps": 1, "peak_rss": -1, "bytes_written": -1}
+
+
+def run_case(ffmpeg_exe, ffprobe_exe, video_file, method):
+    """Extracts the keyframes of a video and measures the run. It is run in a new process, so that the peak memory is
+    only the one of this run.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+        method (str): Method to extract the keyframes.
+
+    Returns:
+        dict: Time taken (seconds), peak memory (bytes) and bytes written.
+
+    """
+    with tempfile.TemporaryDirectory(prefix="videokf_keyframes_") as output_dir:
+        start = time.perf_counter()
+        extract_keyframes(video_file, method, output_dir, ffmpeg_exe=ffmpeg_exe, ffprobe_exe=ffprobe_exe,
+                          use_cache=False)
+        elapsed = time.perf_counter() - start
+        bytes_written = get_files_size(Path(output_dir).iterdir())
+
+    return {"time": elapsed, "peak_rss": get_peak_rss(), "bytes_written": bytes_written}
+
+
+def run_suite(ffmpeg_exe, ffprobe_exe, videos_dir, repeat=3):
+    """Runs every method on every synthetic video.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        videos_dir (Path): Directory where the synthetic videos are generated.
+        repeat (int): Number of runs of every case. The fastest run is kept.
+
+    Returns:
+        dict: Results of every case, by name ('video/method').
+
+    """
+    results = {}
+    for size, duration, gop, source in VIDEOS:
+        video_file = str(make_test_video(ffmpeg_exe, videos_dir / f"{source}_{size}_{duration}s_g{gop}.mp4",
+                                         size=size, duration=duration, gop=gop, source=source))
+        n_frames = len(get_frame_times(ffprobe_exe, video_file))
+
+        for method in VALID_METHODS:
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    runs.append(executor.submit(run_case, ffmpeg_exe, ffprobe_exe, video_file, method).result())
+
+            best = min(runs, key=lambda run: run["time"])
+            results[f"{Path(video_file).stem}/{method}"] = {
+                "fps": n_frames / best["time"], "time": best["time"],
+                "peak_rss": max(run["peak_rss"] or 0 for run in runs), "bytes_written": best["bytes_written"]}
+
+    return results
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compares the results of the suite against a baseline.
+
+    Args:
+        results (dict): Results of every case (see run_suite()).
+        baseline (dict): Results of the baseline.
+        threshold (float): Maximum relative regression allowed, eg.: 0.1 is 10%.
+
+    Returns:
+        list[str]: Description of every regression. A case that is not in the baseline is also a regression, since it
+                   can't be checked.
+
+    """
+    regressions = []
+    for case, result in results.items():
+        if case not in baseline:
+            regressions.append(f"{case}: not in the baseline")
+            continue
+
+        for metric, sign in METRICS.items():
+            value, reference = result[metric], baseline[case][metric]
+            if not reference:
+                continue
+
+            change = sign * (value - reference) / reference
+            if change < -threshold:
+                regressions.append(f"{case}: {metric} {reference:.4g} -> {value:.4g} ({abs(change):.0%} worse)")
+
+    return regressions
+
+
+def print_results(results, baseline):
+    """Prints the results of the suite, with the relative change of the frames per second against the baseline."""
+    print(f"{'case':<42}{'fps':>9}{'vs base':>9}{'peak rss (MB)':>15}{'written (MB)':>14}")
+    for case, result in results.items():
+        reference = baseline.get(case, {}).get("fps")
+        change = f"{result['fps'] / reference - 1:>+8.0%}" if reference else f"{'-':>8}"
+        print(f"{case:<42}{result['fps']:>9.1f} {change}{result['peak_rss'] / 1e6:>15.1f}"
+              f"{result['bytes_written'] / 1e6:>14.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks every method and compares the results against a "
+                                                 "baseline")
+    parser.add_argument("-ffmpeg", "--ffmpeg", type=str, help="Path to the Ffmpeg executable")
+    parser.add_argument("-ffprobe", "--ffprobe", type=str, help="Path to the Ffprobe executable")
+    parser.add_argument("-d", "--videos_dir", type=str, help="Directory where the synthetic videos are generated")
+    parser.add_argument("-b", "--baseline", type=str, default=str(DEFAULT_BASELINE), help="Baseline JSON file")
+    parser.add_argument("--save-baseline", dest="save_baseline", action="store_true", help="If present, the results "
+                        "are saved as the new baseline instead of being compared")
+    parser.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD, help="Maximum relative "
+                        "regression allowed against the baseline, eg.: 0.1 is 10%%")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Number of runs of every case")
+    args = parser.parse_args()
+
+    ffmpeg_exe = args.ffmpeg or get_ff("ffmpeg")
+    ffprobe_exe = args.ffprobe or get_ff("ffprobe")
+    videos_dir = Path(args.videos_dir or tempfile.mkdtemp(prefix="videokf_bench_"))
+    baseline_file = Path(args.baseline)
+
+    results = run_suite(ffmpeg_exe, ffprobe_exe, videos_dir, args.repeat)
+
+    if args.save_baseline:
+        print_results(results, {})
+        baseline_file.write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"Baseline saved in '{baseline_file}'.")
+        return
+
+    baseline = json.loads(baseline_file.read_text()) if baseline_file.is_file() else {}
+    print_results(results, baseline)
+    if not baseline:
+        print(f"!!! No baseline found in '{baseline_file}'. Run with --save-baseline to create it. !!!")
+        sys.exit(1)
+
+    regressions = compare_results(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"!!! Regression: {regression} !!!")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Measures the speedup of scoring the shot sequences in parallel, against the number of workers.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_workers -ffmpeg ffmpeg -ffprobe ffprobe
+
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic_videos import make_test_video
+from videokf.ffmpeg_manager.check_ffmpeg import get_ff
+from videokf.utils.vidutils import get_frame_times, get_iframes, get_keyframes_color, get_keyframes_flow, \
+    get_keyframes_parallel, select_keyframe_color, select_keyframe_flow, stream_frames
+
+
+# (size, duration in seconds, gop) of the generated video
+VIDEO = ("1280x720", 60, 50)
+
+METHODS = {"color": (get_keyframes_color, select_keyframe_color), "flow": (get_keyframes_flow, select_keyframe_flow)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the parallel scoring of the shot sequences")
+    parser.add_argument("-ffmpeg", "--ffmpeg", type=str, help="Path to the Ffmpeg executable")
+    parser.add_argument("-ffprobe", "--ffprobe", type=str, help="Path to the Ffprobe executable")
+    parser.add_argument("-d", "--videos_dir", type=str, help="Directory where the synthetic videos are generated")
+    args = parser.parse_args()
+
+    ffmpeg_exe = args.ffmpeg or get_ff("ffmpeg")
+    ffprobe_exe = args.ffprobe or get_ff("ffprobe")
+    videos_dir = Path(args.videos_dir or tempfile.mkdtemp(prefix="videokf_bench_"))
+
+    size, duration, gop = VIDEO
+    video_file = str(make_test_video(ffmpeg_exe, videos_dir / f"testsrc_{size}_{duration}s_g{gop}.mp4", size=size,
+                                     duration=duration, gop=gop))
+    iframes = get_iframes(ffprobe_exe, video_file)
+    frame_times = get_frame_times(ffprobe_exe, video_file)
+
+    # Powers of two up to the number of cores of the machine
+    n_cores = os.cpu_count() or 1
+    all_workers = [2 ** k for k in range(n_cores.bit_length()) if 2 ** k <= n_cores]
+
+    print(f"{Path(video_file).name}: {len(iframes) - 1} shots, {n_cores} cores")
+    print(f"{'method':<8}{'workers':>8}{'time (s)':>10}{'speedup':>9}  check")
+    for method, (get_keyframes_method, select_keyframe) in METHODS.items():
+        start = time.perf_counter()
+        reference = get_keyframes_method(iframes, stream_frames(ffmpeg_exe, ffprobe_exe, video_file))
+        sequential_time = time.perf_counter() - start
+        print(f"{method:<8}{1:>8}{sequential_time:>10.2f}{1:>8.1f}x  -")
+
+        for workers in all_workers[1:]:
+            start = time.perf_counter()
+            keyframes = get_keyframes_parallel(select_keyframe, ffmpeg_exe, ffprobe_exe, video_file, iframes,
+                                               frame_times, workers)
+            parallel_time = time.perf_counter() - start
+
+            check = "ok" if keyframes == reference else "different keyframes"
+            print(f"{method:<8}{workers:>8}{parallel_time:>10.2f}{sequential_time / parallel_time:>8.1f}x  {check}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import subprocess
+from pathlib import Path
+
+
+def make_test_video(ffmpeg_exe, output_file, size="640x360", duration=10, rate=25, gop=250, source="testsrc",
+                    codec="libx264"):
+    """Generates a deterministic synthetic video with one of the ffmpeg test sources.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        output_file (str): Path of the video to generate. It is not generated again if it already exists.
+        size (str): Size of the frames, in the format 'WIDTHxHEIGHT'.
+        duration (int or float): Duration of the video, in seconds.
+        rate (int): Frame rate of the video.
+        gop (int): Maximum number of frames between two iframes.
+        source (str): ffmpeg test source used to generate the frames, eg.: 'testsrc' or 'mandelbrot'.
+        codec (str): Video encoder.
+
+    Returns:
+        Path: Path of the generated video.
+
+    """
+    output_file = Path(output_file)
+    if output_file.is_file():
+        return output_file
+
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    ffmpeg_args = [ffmpeg_exe, "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                   "-i", f"{source}=size={size}:rate={rate}", "-t", str(duration), "-c:v", codec, "-g", str(gop),
+                   "-pix_fmt", "yuv420p", str(output_file)]
+    subprocess.check_output(ffmpeg_args)
+
+    return output_file
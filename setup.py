@@ -26,11 +26,10 @@ setuptools.setup(
     entry_points={
         "console_scripts": ["video-kf=videokf.cli_scripts:main"]},
     classifiers=[
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
     keywords="keyframes iframes video extractor",
-    python_requires=">=3.6"
+    python_requires=">=3.7"
 )
@@ -0,0 +1,47 @@
+import shutil
+
+import pytest
+
+from benchmarks.synthetic_videos import make_test_video
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keeps the persistent cache of every test in its own folder, so the tests never read results of other runs."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("VIDEOKF_CACHE_DIR", str(cache_dir))
+
+    return cache_dir
+
+
+@pytest.fixture(scope="session")
+def ffmpeg_exe():
+    """ffmpeg executable of the system. The tests that decode videos are skipped if it is not installed."""
+    exe = shutil.which("ffmpeg")
+    if exe is None:
+        pytest.skip("ffmpeg is not installed")
+
+    return exe
+
+
+@pytest.fixture(scope="session")
+def ffprobe_exe():
+    """ffprobe executable of the system. The tests that probe videos are skipped if it is not installed."""
+    exe = shutil.which("ffprobe")
+    if exe is None:
+        pytest.skip("ffprobe is not installed")
+
+    return exe
+
+
+@pytest.fixture(scope="session")
+def make_clip(ffmpeg_exe, tmp_path_factory):
+    """Generates tiny synthetic videos (see make_test_video()), shared by all the tests."""
+    videos_dir = tmp_path_factory.mktemp("videos")
+
+    def make(size="160x120", duration=3, rate=25, gop=37, source="testsrc"):
+        video_file = videos_dir / f"{source}_{size}_{duration}s_r{rate}_g{gop}.mp4"
+        return str(make_test_video(ffmpeg_exe, video_file, size=size, duration=duration, rate=rate, gop=gop,
+                                   source=source))
+
+    return make
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from videokf.keyframe_manager.keyframe_extractor import get_keyframes, get_keyframes_async
+from videokf.utils import async_vidutils, cache
+from videokf.utils.async_vidutils import get_keyframe_indices_async
+from videokf.utils.vidutils import get_iframes
+
+
+@pytest.fixture
+def processes(monkeypatch):
+    """Records every process started by the async functions, with its arguments."""
+    started = []
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    async def create_and_record(*args, **kwargs):
+        process = await create_subprocess_exec(*args, **kwargs)
+        process.args = args
+        started.append(process)
+        return process
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", create_and_record)
+
+    return started
+
+
+@pytest.mark.parametrize("method", ["iframes", "color", "flow"])
+def test_same_keyframes_as_sync(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path, method):
+    video_file = make_clip(gop=30)
+    keyframes = get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method, output_dir=str(tmp_path / "sync"),
+                              use_cache=False)
+
+    async_keyframes = asyncio.run(get_keyframes_async(ffmpeg_exe, ffprobe_exe, video_file, method,
+                                                      output_dir=str(tmp_path / "async"), use_cache=False))
+
+    assert async_keyframes == keyframes
+    assert sorted(f.name for f in (tmp_path / "async").glob("*.jpg")) == sorted(f"{i}.jpg" for i in set(keyframes))
+
+
+@pytest.mark.parametrize("fast_probe", [False, True])
+@pytest.mark.parametrize("manifest", ["json", "csv"])
+def test_same_manifest_as_sync(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path, fast_probe, manifest):
+    video_file = make_clip(gop=30)
+    options = dict(fast_probe=fast_probe, use_cache=False, manifest=manifest)
+    get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, "color", output_dir=str(tmp_path / "sync"), **options)
+
+    asyncio.run(get_keyframes_async(ffmpeg_exe, ffprobe_exe, video_file, "color", output_dir=str(tmp_path / "async"),
+                                    **options))
+
+    manifest_file = f"keyframes.{manifest}"
+    assert (tmp_path / "async" / manifest_file).read_text() == (tmp_path / "sync" / manifest_file).read_text()
+
+
+def test_no_manifest(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path):
+    video_file = make_clip(gop=30)
+
+    asyncio.run(get_keyframes_async(ffmpeg_exe, ffprobe_exe, video_file, output_dir=str(tmp_path), use_cache=False,
+                                    manifest=None))
+
+    assert sorted(f.name for f in tmp_path.iterdir()) == ["0.jpg", "30.jpg", "60.jpg"]
+
+
+@pytest.mark.parametrize("fast_probe", [False, True])
+def test_video_is_probed_once(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path, processes, fast_probe):
+    video_file = make_clip(gop=30)
+
+    asyncio.run(get_keyframes_async(ffmpeg_exe, ffprobe_exe, video_file, output_dir=str(tmp_path),
+                                    fast_probe=fast_probe, use_cache=False))
+
+    assert [process for process in processes if process.args[0] == ffprobe_exe] == [processes[0]]
+
+
+def test_cancellation_kills_ffmpeg(ffmpeg_exe, ffprobe_exe, make_clip, monkeypatch, processes):
+    video_file = make_clip(duration=10, gop=250)
+    iframes = get_iframes(ffprobe_exe, video_file)
+
+    def select_keyframe_slowly(start, shot):
+        for _ in shot:
+            time.sleep(0.01)
+        return start
+
+    monkeypatch.setattr(async_vidutils, "select_keyframe_color", select_keyframe_slowly)
+
+    async def cancel_extraction():
+        task = asyncio.ensure_future(get_keyframe_indices_async(ffmpeg_exe, ffprobe_exe, video_file, "color",
+                                                                iframes))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_extraction())
+
+    assert processes and all(process.returncode is not None for process in processes)
+
+
+def test_scoring_error_is_raised_and_ffmpeg_killed(ffmpeg_exe, ffprobe_exe, make_clip, monkeypatch, processes):
+    # Many more frames than fit in the queue and the pipe, so ffmpeg is blocked writing when the scoring fails
+    video_file = make_clip(duration=10, gop=250)
+    iframes = get_iframes(ffprobe_exe, video_file)
+
+    def select_keyframe_failing(start, shot):
+        next(iter(shot))
+        raise ValueError("scoring failed")
+
+    monkeypatch.setattr(async_vidutils, "select_keyframe_color", select_keyframe_failing)
+
+    with pytest.raises(ValueError, match="scoring failed"):
+        asyncio.run(asyncio.wait_for(get_keyframe_indices_async(ffmpeg_exe, ffprobe_exe, video_file, "color",
+                                                                iframes), timeout=30))
+
+    assert processes and all(process.returncode is not None for process in processes)
+
+
+def test_cache_is_not_read_in_the_event_loop(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path, monkeypatch):
+    video_file = make_clip(gop=30)
+    threads = []
+
+    def record_thread(function):
+        def wrapper(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return function(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(cache, "video_fingerprint", record_thread(cache.video_fingerprint))
+    monkeypatch.setattr(cache.VideoCache, "load", record_thread(cache.VideoCache.load))
+    monkeypatch.setattr(cache.VideoCache, "try_save", record_thread(cache.VideoCache.try_save))
+
+    for output_dir in ["first", "second"]:
+        asyncio.run(get_keyframes_async(ffmpeg_exe, ffprobe_exe, video_file, "color",
+                                        output_dir=str(tmp_path / output_dir)))
+
+    assert threads and threading.main_thread() not in threads
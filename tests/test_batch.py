@@ -0,0 +1,54 @@
+import json
+import shutil
+
+import pytest
+
+from videokf.extract_keyframes import extract_keyframes_many
+
+
+@pytest.fixture
+def videos_dir(make_clip, tmp_path):
+    """Folder with two videos with the same name and different extensions, and a subfolder with another one."""
+    videos_dir = tmp_path / "videos"
+    (videos_dir / "other").mkdir(parents=True)
+    shutil.copy(make_clip(gop=25), videos_dir / "clip.mp4")
+    shutil.copy(make_clip(gop=30), videos_dir / "clip.mkv")
+    shutil.copy(make_clip(gop=30), videos_dir / "other" / "clip.mp4")
+
+    return videos_dir
+
+
+def test_videos_with_the_same_name_get_their_own_folder(ffmpeg_exe, ffprobe_exe, videos_dir):
+    video_files = [str(videos_dir / "clip.mp4"), str(videos_dir / "clip.mkv")]
+
+    summaries = extract_keyframes_many(video_files, output_dir_keyframes="keyframes", ffmpeg_exe=ffmpeg_exe,
+                                       ffprobe_exe=ffprobe_exe, use_cache=False)
+
+    assert [summary["status"] for summary in summaries] == ["ok", "ok"]
+    assert [summary["keyframes"] for summary in summaries] == [[0, 25, 50], [0, 30, 60]]
+    for name, summary in zip(["clip_mp4", "clip_mkv"], summaries):
+        assert summary["output_dir"] == str(videos_dir / "keyframes" / name)
+        assert json.loads((videos_dir / "keyframes" / f"{name}.json").read_text()) == summary
+        assert sorted(f.name for f in (videos_dir / "keyframes" / name).glob("*.jpg")) == \
+            sorted(f"{i}.jpg" for i in summary["keyframes"])
+
+
+@pytest.mark.parametrize("output_dir, features", [("full_path", False), ("keyframes", True), (None, False)])
+def test_videos_with_the_same_output_are_rejected(ffmpeg_exe, ffprobe_exe, videos_dir, tmp_path, output_dir,
+                                                  features):
+    if output_dir is None:
+        # The same video given twice
+        output_dir = "keyframes"
+        video_files = [str(videos_dir / "clip.mp4"), str(videos_dir / "clip.mp4")]
+    else:
+        video_files = [str(videos_dir / "clip.mp4"), str(videos_dir / "other" / "clip.mp4")]
+    if output_dir == "full_path":
+        output_dir = str(tmp_path / "keyframes")
+
+    with pytest.raises(ValueError, match="would be saved in the same"):
+        extract_keyframes_many(video_files, output_dir_keyframes=output_dir, ffmpeg_exe=ffmpeg_exe,
+                               ffprobe_exe=ffprobe_exe, use_cache=False,
+                               features_dir=str(tmp_path / "features") if features else None)
+
+    # Nothing was processed
+    assert not list(tmp_path.rglob("*.json")) and not list(tmp_path.rglob("*.jpg"))
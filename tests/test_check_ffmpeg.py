@@ -0,0 +1,134 @@
+import io
+import json
+import os
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from videokf.ffmpeg_manager import check_ffmpeg
+from videokf.ffmpeg_manager.check_ffmpeg import get_ff
+from videokf.utils.all_utils import url_retrieve
+
+
+def make_zip(file_name, content=b"#!/bin/sh\n"):
+    """Zip file with a single fake executable, as the ones of ffbinaries."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as f:
+        f.writestr(file_name, content)
+
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def ffbinaries(monkeypatch):
+    """Local stand-in of the ffbinaries API, serving a zip file for every executable. The requested paths are logged.
+
+    Yields:
+        list: Paths requested to the server, in order.
+
+    """
+    files = {}
+    requested = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requested.append(self.path)
+            if self.path not in files:
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(files[self.path])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = {ff: f"{base_url}/{ff}.zip" for ff in ["ffmpeg", "ffprobe"]}
+    platforms = ["windows-64", "windows-32", "linux-64", "linux-32", "osx-64"]
+    files["/api"] = json.dumps({"bin": {name: urls for name in platforms}}).encode("utf8")
+    files.update({f"/{ff}.zip": make_zip(ff) for ff in urls})
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(check_ffmpeg, "FFBINARIES_API_URL", f"{base_url}/api")
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    try:
+        yield requested
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def clean_lookup(tmp_path, monkeypatch):
+    """Clears the memoized executables and hides the ones of the system (environmental variables and PATH)."""
+    get_ff.cache_clear()
+    for var in ["FFMPEG", "FFPROBE"]:
+        monkeypatch.delenv(var, raising=False)
+    path_dir = tmp_path / "path"
+    path_dir.mkdir()
+    monkeypatch.setenv("PATH", str(path_dir))
+
+    yield path_dir
+
+    get_ff.cache_clear()
+
+
+def make_executable(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("#!/bin/sh\n")
+    path.chmod(0o755)
+
+    return path
+
+
+def test_environment_variable_comes_first(clean_lookup, tmp_path, monkeypatch, ffbinaries):
+    env_exe = make_executable(tmp_path / "env" / "ffmpeg")
+    make_executable(tmp_path / "Ffmpeg" / "ffmpeg")
+    make_executable(clean_lookup / "ffmpeg")
+    monkeypatch.setenv("FFMPEG", str(env_exe))
+
+    assert get_ff("ffmpeg", str(tmp_path)) == str(env_exe)
+    assert ffbinaries == []
+
+
+def test_directory_comes_before_path(clean_lookup, tmp_path, ffbinaries):
+    dir_exe = make_executable(tmp_path / "Ffmpeg" / "ffprobe")
+    make_executable(clean_lookup / "ffprobe")
+
+    assert get_ff("ffprobe", str(tmp_path)) == str(dir_exe)
+    assert ffbinaries == []
+
+
+def test_path_comes_before_download(clean_lookup, tmp_path, ffbinaries):
+    path_exe = make_executable(clean_lookup / "ffmpeg")
+
+    assert get_ff("ffmpeg", str(tmp_path)) == str(path_exe)
+    assert ffbinaries == []
+
+
+def test_download_when_not_found(clean_lookup, tmp_path, ffbinaries):
+    ffmpeg = get_ff("ffmpeg", str(tmp_path))
+
+    assert ffmpeg == str(tmp_path / "Ffmpeg" / "ffmpeg")
+    assert os.access(ffmpeg, os.X_OK)
+    assert not (tmp_path / "Ffmpeg" / "temp_file.zip").exists()
+    assert ffbinaries == ["/api", "/ffmpeg.zip"]
+
+    # The executable is memoized, so it is not searched or downloaded again
+    assert get_ff("ffmpeg", str(tmp_path)) == ffmpeg
+    assert ffbinaries == ["/api", "/ffmpeg.zip"]
+
+
+def test_download_error(ffbinaries, tmp_path):
+    url = check_ffmpeg.FFBINARIES_API_URL.replace("/api", "/missing.zip")
+
+    with pytest.raises(ConnectionError):
+        url_retrieve(url, tmp_path / "temp_file.zip")
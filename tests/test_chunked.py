@@ -0,0 +1,66 @@
+import hashlib
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from videokf.keyframe_manager.keyframe_extractor import get_keyframes
+from videokf.utils.frame_index import probe_frame_index
+from videokf.utils.vidutils import extract_frames, split_gop_ranges, stream_frames, stream_frames_chunked
+
+
+def hash_frames(frames):
+    return [hashlib.sha1(im.tobytes()).hexdigest() for im in frames]
+
+
+def hash_files(frames_dir):
+    return {path.name: hashlib.sha1(path.read_bytes()).hexdigest() for path in frames_dir.iterdir()}
+
+
+@pytest.mark.parametrize("iframes, n_frames, n_ranges", [([0, 10, 20, 30], 40, 2), ([0, 10, 20, 30], 40, 8),
+                                                         ([0, 3, 4, 30], 31, 3), ([5, 10], 12, 4), ([], 7, 3)])
+def test_ranges_start_at_iframes_and_cover_all_frames(iframes, n_frames, n_ranges):
+    ranges = split_gop_ranges(iframes, n_frames, n_ranges)
+
+    assert 1 <= len(ranges) <= n_ranges
+    assert ranges[0][0] == 0 and ranges[-1][1] == n_frames
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert all(start in iframes for start, _ in ranges[1:])
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_streamed_frames_match_sequential_decode(ffmpeg_exe, ffprobe_exe, make_clip, workers):
+    video_file = make_clip(duration=4, gop=12)
+    frame_index = probe_frame_index(ffprobe_exe, video_file)
+
+    reference = hash_frames(stream_frames(ffmpeg_exe, ffprobe_exe, video_file))
+    hashes = hash_frames(stream_frames_chunked(ffmpeg_exe, ffprobe_exe, video_file, frame_index.iframes,
+                                               frame_index.frame_times, workers))
+
+    assert len(reference) == len(frame_index.frame_times)
+    assert hashes == reference
+
+
+def test_extracted_frames_match_sequential_decode(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path):
+    video_file = make_clip(duration=2, gop=12)
+    frame_index = probe_frame_index(ffprobe_exe, video_file)
+
+    extract_frames(ffmpeg_exe, video_file, output_dir=str(tmp_path / "sequential"), profile="archival")
+    extract_frames(ffmpeg_exe, video_file, output_dir=str(tmp_path / "chunked"), frame_times=frame_index.frame_times,
+                   profile="archival", iframes=frame_index.iframes, workers=3)
+
+    reference = hash_files(tmp_path / "sequential")
+    assert len(reference) == len(frame_index.frame_times)
+    assert hash_files(tmp_path / "chunked") == reference
+
+
+@pytest.mark.parametrize("method", ["color", "flow"])
+def test_keyframes_match_sequential_decode(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path, method):
+    # The content segmenter decodes the whole video as a single sequence, so it is decoded by ranges with workers
+    video_file = make_clip(duration=4, gop=12)
+    options = dict(output_dir=str(tmp_path / "keyframes"), use_cache=False, segmenter="content",
+                   profile="analysis-only")
+
+    assert get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method, workers=3, **options) == \
+        get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method, workers=1, **options)
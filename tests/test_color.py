@@ -0,0 +1,103 @@
+import tracemalloc
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from videokf.keyframe_manager.features import select_keyframes_from_features, compute_features
+from videokf.utils.frame_index import probe_frame_index
+from videokf.utils.vidutils import HISTOGRAM_BATCH_MEMORY, get_histogram_capacity, get_iframes, get_keyframes_color, \
+    iter_shots, select_keyframe_color, stream_frames
+
+
+def select_keyframe_reference(start, frames, step=1):
+    """Selects the keyframe of a shot with OpenCV alone, comparing the histogram of every frame (or one of every step)
+    with the average one. In case of a tie, the last frame is selected."""
+    # The histograms are flattened, since cv2.compareHist() gives wrong correlations for 3D histograms in OpenCV 5
+    hists = [cv2.calcHist([im], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256]).ravel() for im in frames]
+    color_mean = np.mean(hists, axis=0, dtype=np.float64).astype(np.float32)
+
+    best_corr = -1
+    best_idx = 0
+    for idx in range(0, len(hists), step):
+        corr = cv2.compareHist(hists[idx], color_mean, cv2.HISTCMP_CORREL)
+        if corr >= best_corr:
+            best_corr = corr
+            best_idx = idx
+
+    return start + best_idx
+
+
+def random_frames(n_frames, seed=0):
+    """Random BGR images, so that every frame has a different histogram."""
+    return list(np.random.default_rng(seed).integers(0, 256, size=(n_frames, 12, 16, 3), dtype=np.uint8))
+
+
+@pytest.mark.parametrize("n_frames", [1, 5, 13, 37, 100])
+def test_select_keyframe_color_matches_argmax(n_frames):
+    frames = random_frames(n_frames)
+
+    assert select_keyframe_color(10, iter(frames)) == select_keyframe_reference(10, frames)
+
+
+@pytest.mark.parametrize("n_frames", [11, 37, 100, 333])
+def test_select_keyframe_color_under_memory_cap(n_frames):
+    # Room for 10 histograms: the shot is decimated to one of every step frames, the smallest power of two that fits
+    frames = random_frames(n_frames, seed=n_frames)
+    memory_limit = HISTOGRAM_BATCH_MEMORY + 2 * 10 * 512 * 4
+    assert get_histogram_capacity(memory_limit) == 10
+    step = 1
+    while -(-n_frames // step) > 10:
+        step *= 2
+
+    keyframe = select_keyframe_color(0, iter(frames), memory_limit=memory_limit)
+
+    assert keyframe == select_keyframe_reference(0, frames, step)
+
+
+def get_peak_memory(n_frames, memory_limit):
+    """Peak memory allocated while a shot of n_frames tiny frames is scored, in bytes."""
+    frames = (np.full((4, 4, 3), i % 256, dtype=np.uint8) for i in range(n_frames))
+
+    tracemalloc.start()
+    try:
+        select_keyframe_color(0, frames, memory_limit=memory_limit)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("memory_limit", [256 * 1024, 1024 ** 2])
+def test_select_keyframe_color_memory_is_flat(memory_limit):
+    # The memory is measured with tracemalloc rather than the peak RSS, which never decreases during the process and
+    # depends on the memory already used by the rest of the tests. The frames are tiny, so the histograms dominate
+    get_peak_memory(10, memory_limit)
+    peaks = [get_peak_memory(n_frames, memory_limit) for n_frames in [10000, 100000]]
+
+    # Without the cap, the histograms alone would take 100000 * 2 KB = 200 MB. A few KB are used by Python objects
+    assert max(peaks) < memory_limit + 64 * 1024
+    assert abs(peaks[1] - peaks[0]) < 16 * 1024
+
+
+def test_color_keyframes_of_clip_match_argmax(ffmpeg_exe, ffprobe_exe, make_clip):
+    # 320x240 frames have more than 65535 pixels, and a GOP of 37 frames gives shots that are not powers of two
+    video_file = make_clip(size="320x240", duration=6, gop=37)
+    iframes = get_iframes(ffprobe_exe, video_file)
+    frames = list(stream_frames(ffmpeg_exe, ffprobe_exe, video_file))
+
+    reference = [select_keyframe_reference(start, list(shot)) for start, shot in iter_shots(frames, iframes)]
+
+    assert len(reference) == len(iframes)
+    assert get_keyframes_color(iframes, frames) == reference
+
+
+def test_color_keyframes_from_features_match_streaming(ffmpeg_exe, ffprobe_exe, make_clip):
+    video_file = make_clip(size="320x240", duration=6, gop=37)
+    frame_index = probe_frame_index(ffprobe_exe, video_file)
+    frames = list(stream_frames(ffmpeg_exe, ffprobe_exe, video_file))
+
+    features = compute_features(ffmpeg_exe, ffprobe_exe, video_file, frame_index)
+
+    assert features["histograms"].dtype == np.uint32
+    assert select_keyframes_from_features(features, "color") == get_keyframes_color(frame_index.iframes, frames)
@@ -0,0 +1,113 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from videokf.extract_keyframes import extract_keyframes_many
+from videokf.keyframe_manager import dedup
+from videokf.keyframe_manager.dedup import DEDUP_WINDOW, calculate_dhashes, iter_unique_keyframes
+from videokf.utils.profiling import enable_profiling, get_stats, reset_stats
+
+
+def make_thumbnail(bits):
+    """Thumbnail (8 x 9 grayscale image) whose dHash has the given bits: every pixel is brighter than its left neighbour
+    where the bit is set."""
+    steps = np.where(np.asarray(bits, dtype=bool).reshape(8, 8), 1, -1)
+
+    return (128 + np.concatenate([np.zeros((8, 1), dtype=int), np.cumsum(steps, axis=1)], axis=1)).astype(np.uint8)
+
+
+def flip_bits(bits, n_bits):
+    flipped = np.array(bits, dtype=bool)
+    flipped[:n_bits] = ~flipped[:n_bits]
+
+    return flipped
+
+
+@pytest.fixture
+def thumbnails(monkeypatch):
+    """Replaces the decoding of the keyframes with the thumbnails of a dictionary, by keyframe index."""
+    images = {}
+
+    def decode_thumbnails(ffmpeg_exe, video_file, keyframes, frame_times, profile=None, keyframes_only=False):
+        return np.array([images[idx] for idx in keyframes])
+
+    monkeypatch.setattr(dedup, "decode_thumbnails", decode_thumbnails)
+
+    return images
+
+
+def random_bits(rng):
+    return rng.integers(0, 2, size=64).astype(bool)
+
+
+def test_thumbnails_have_the_given_hash():
+    rng = np.random.default_rng(0)
+    bits = random_bits(rng)
+
+    hashes = calculate_dhashes([make_thumbnail(bits), make_thumbnail(flip_bits(bits, 5))])
+
+    assert bin(int(hashes[0] ^ hashes[1])).count("1") == 5
+
+
+@pytest.mark.parametrize("threshold, dropped", [(0, [1, 5]), (3, [1, 2, 5]), (6, [1, 2, 5]), (7, [1, 2, 4, 5])])
+def test_keyframes_dropped_at_threshold(thumbnails, threshold, dropped):
+    rng = np.random.default_rng(1)
+    a, b = random_bits(rng), random_bits(rng)
+    # Keyframe 2 is 3 bits from 0, and keyframe 4 is 7 bits from 0 (and 4 bits from 2, which is only compared if
+    # it is kept)
+    for idx, bits in enumerate([a, a, flip_bits(a, 3), b, flip_bits(a, 7), b]):
+        thumbnails[idx] = make_thumbnail(bits)
+    suppressed = []
+
+    kept = list(iter_unique_keyframes("ffmpeg", "video.mp4", range(6), [], threshold, suppressed=suppressed))
+
+    assert suppressed == dropped
+    assert kept == [idx for idx in range(6) if idx not in dropped]
+
+
+@pytest.mark.parametrize("n_between, is_dropped", [(DEDUP_WINDOW - 1, True), (DEDUP_WINDOW, False)])
+def test_only_the_last_kept_keyframes_are_compared(thumbnails, n_between, is_dropped):
+    # The first keyframe is repeated after n_between keyframes that are all different: it is only dropped if it is
+    # still one of the last DEDUP_WINDOW keyframes kept
+    rng = np.random.default_rng(2)
+    first = random_bits(rng)
+    keyframes = list(range(n_between + 2))
+    thumbnails[0] = thumbnails[n_between + 1] = make_thumbnail(first)
+    for idx in keyframes[1:-1]:
+        thumbnails[idx] = make_thumbnail(random_bits(rng))
+    suppressed = []
+
+    kept = list(iter_unique_keyframes("ffmpeg", "video.mp4", keyframes, [], 2, suppressed=suppressed, batch_size=7))
+
+    assert suppressed == ([n_between + 1] if is_dropped else [])
+    assert kept == [idx for idx in keyframes if idx not in suppressed]
+
+
+def test_dropped_keyframes_are_profiled(thumbnails):
+    for idx in range(4):
+        thumbnails[idx] = make_thumbnail(np.zeros(64, dtype=bool))
+
+    reset_stats()
+    enable_profiling()
+    try:
+        kept = list(iter_unique_keyframes("ffmpeg", "video.mp4", range(4), [], 0))
+        stats = get_stats()
+    finally:
+        enable_profiling(False)
+        reset_stats()
+
+    assert kept == [0]
+    assert stats["deduplicate"]["frames"] == 4
+    assert stats["deduplicate"]["dropped"] == 3
+
+
+def test_dropped_keyframes_are_in_the_batch_summary(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path):
+    # With the maximum threshold, every keyframe after the first one is a near-duplicate
+    video_files = [make_clip(gop=25)]
+
+    summaries = extract_keyframes_many(video_files, output_dir_keyframes=str(tmp_path / "keyframes"),
+                                       ffmpeg_exe=ffmpeg_exe, ffprobe_exe=ffprobe_exe, use_cache=False,
+                                       dedup_threshold=64)
+
+    assert summaries[0]["keyframes"] == [0]
+    assert summaries[0]["suppressed"] == [25, 50]
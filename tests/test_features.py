@@ -0,0 +1,89 @@
+import zipfile
+from fractions import Fraction
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from videokf.keyframe_manager.features import FEATURES_COLUMNS, compute_features, load_features, save_features
+from videokf.utils.frame_index import probe_frame_index
+
+
+def make_features(n_frames=10):
+    return {"pts": np.arange(n_frames) * 512,
+            "pict_type": np.where(np.arange(n_frames) % 5 == 0, b"I", b"P"),
+            "time_base": np.array([1, 12800]),
+            "frame_times": np.arange(n_frames) / 25,
+            "is_iframe": np.arange(n_frames) % 5 == 0,
+            "iframes": np.arange(0, n_frames, 5),
+            "histograms": np.ones((n_frames, 512), dtype=np.uint32),
+            "motion": np.zeros(n_frames, dtype=np.float32)}
+
+
+def test_saved_features_are_loaded(tmp_path):
+    features_file = tmp_path / "features.npz"
+    save_features(features_file, make_features(), params="params")
+
+    features = load_features(features_file, "params")
+
+    assert set(features) == {"params", *FEATURES_COLUMNS}
+    assert np.array_equal(features["histograms"], make_features()["histograms"])
+    assert load_features(features_file, "other params") is None
+
+
+@pytest.mark.parametrize("size", [0, 10, 1000, -100])
+def test_truncated_file_is_not_loaded(tmp_path, size):
+    features_file = tmp_path / "features.npz"
+    save_features(features_file, make_features(), params="params")
+    content = features_file.read_bytes()
+    features_file.write_bytes(content[:size])
+
+    assert load_features(features_file, "params") is None
+
+
+def test_corrupted_column_is_not_loaded(tmp_path):
+    # The zip directory is valid, but the data of a column is not
+    features_file = tmp_path / "features.npz"
+    save_features(features_file, make_features(), params="params")
+    with zipfile.ZipFile(features_file) as f:
+        offset = f.getinfo("motion.npy").header_offset
+    content = bytearray(features_file.read_bytes())
+    content[offset:offset + 4] = b"\0\0\0\0"
+    features_file.write_bytes(bytes(content))
+
+    assert load_features(features_file, "params") is None
+
+
+@pytest.mark.parametrize("column", FEATURES_COLUMNS)
+def test_missing_column_is_not_loaded(tmp_path, column):
+    features = make_features()
+    del features[column]
+    features_file = tmp_path / "features.npz"
+    save_features(features_file, features, params="params")
+
+    assert load_features(features_file) is None
+    assert load_features(features_file, "params") is None
+
+
+def test_missing_params_are_not_loaded(tmp_path):
+    features_file = tmp_path / "features.npz"
+    with features_file.open("wb") as f:
+        np.savez(f, **make_features())
+
+    assert load_features(features_file) is not None
+    assert load_features(features_file, "params") is None
+
+
+def test_frame_index_columns_are_saved(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path):
+    pytest.importorskip("cv2")
+    video_file = make_clip(duration=2, gop=12)
+    frame_index = probe_frame_index(ffprobe_exe, video_file)
+    features_file = tmp_path / "features.npz"
+    save_features(features_file, compute_features(ffmpeg_exe, ffprobe_exe, video_file, frame_index), params="params")
+
+    features = load_features(features_file, "params")
+
+    assert features["pts"].tolist() == list(frame_index.pts)
+    assert features["pict_type"].tobytes() == frame_index.pict_types
+    assert Fraction(*features["time_base"].tolist()) == frame_index.time_base
+    assert features["iframes"].tolist() == frame_index.iframes == [0, 12, 24, 36, 48]
@@ -0,0 +1,62 @@
+import shutil
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from videokf.keyframe_manager.keyframe_extractor import get_keyframes
+from videokf.utils.all_utils import remove_frames_dir_quietly
+
+
+@pytest.fixture
+def video_file(make_clip, tmp_path):
+    """Clip copied to its own folder, where the frames and keyframes folders of the test are created."""
+    return str(shutil.copy(make_clip(gop=25), tmp_path))
+
+
+def join_background_threads():
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and not thread.daemon:
+            thread.join()
+
+
+@pytest.mark.parametrize("background_remove", [False, True])
+def test_extract_all_frames_moves_keyframes_and_removes_frames(ffmpeg_exe, ffprobe_exe, video_file, tmp_path,
+                                                               background_remove):
+    # The frames are scored from the saved JPEG files, so the keyframes can differ from the streamed ones, but there is
+    # still one keyframe in every shot of 25 frames
+    keyframes = get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, "color", output_dir="keyframes", use_cache=False,
+                              extract_all_frames=True, background_remove=background_remove)
+    join_background_threads()
+
+    assert [i // 25 for i in keyframes] == [0, 1, 2]
+    assert not (tmp_path / "frames").exists()
+    assert sorted(f.name for f in (tmp_path / "keyframes").glob("*.jpg")) == sorted(f"{i}.jpg" for i in keyframes)
+
+
+def test_frames_dir_is_kept_and_keyframes_are_linked(ffmpeg_exe, ffprobe_exe, video_file, tmp_path):
+    keyframes = get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, "flow", output_dir="keyframes", use_cache=False,
+                              remove_frames_dir=False)
+
+    assert (tmp_path / "frames").is_dir()
+    for i in keyframes:
+        assert (tmp_path / "keyframes" / f"{i}.jpg").stat().st_nlink == 2
+
+
+def test_remove_frames_dir_quietly_reports_errors(tmp_path, capsys):
+    remove_frames_dir_quietly(tmp_path / "missing")
+
+    assert "could not be removed" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("options", [{"remove_frames_dir": False}, {"extract_all_frames": True}])
+def test_analysis_only_profile_saves_no_images(ffmpeg_exe, ffprobe_exe, video_file, tmp_path, options):
+    streamed = get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, "color", output_dir="streamed", use_cache=False,
+                             profile="analysis-only")
+    keyframes = get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, "color", output_dir="keyframes", use_cache=False,
+                              profile="analysis-only", **options)
+
+    assert keyframes == streamed
+    assert not list(tmp_path.rglob("*.jpg"))
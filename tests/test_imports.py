@@ -0,0 +1,46 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# Modules that are only imported when the code that needs them runs
+HEAVY_MODULES = ["numpy", "cv2", "requests", "asyncio"]
+
+
+def run_python(code, blocked=()):
+    """Runs code in a fresh interpreter, where the blocked modules can't be imported (as if they weren't installed).
+
+    Returns:
+        str: Output of the code.
+
+    """
+    block = "".join(f"sys.modules[{name!r}] = None\n" for name in blocked)
+    result = subprocess.run([sys.executable, "-c", f"import sys\n{block}{code}"], capture_output=True, text=True,
+                            cwd=Path(__file__).parents[1])
+    assert result.returncode == 0, result.stderr
+
+    return result.stdout
+
+
+def test_import_does_not_load_heavy_modules():
+    output = run_python("import videokf\n"
+                        "import json\n"
+                        f"print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))")
+
+    assert json.loads(output) == []
+
+
+def test_iframes_method_works_without_numpy(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path):
+    video_file = make_clip(gop=30)
+    output_dir = tmp_path / "keyframes"
+
+    output = run_python("import json\n"
+                        "from videokf.keyframe_manager.keyframe_extractor import get_keyframes\n"
+                        f"keyframes = get_keyframes({ffmpeg_exe!r}, {ffprobe_exe!r}, {video_file!r}, 'iframes', "
+                        f"output_dir={str(output_dir)!r})\n"
+                        "print(json.dumps(keyframes))",
+                        blocked=["numpy", "cv2", "requests"])
+
+    keyframes = json.loads(output.splitlines()[-1])
+    assert keyframes == [0, 30, 60]
+    assert sorted(f.name for f in output_dir.glob("*.jpg")) == sorted(f"{i}.jpg" for i in keyframes)
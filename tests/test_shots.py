@@ -0,0 +1,77 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from videokf.keyframe_manager.features import select_keyframe_color_features, select_keyframe_flow_features
+from videokf.keyframe_manager.keyframe_extractor import get_keyframes
+from videokf.utils.vidutils import get_keyframes_color, get_keyframes_flow, get_shot_starts, iter_shots, \
+    select_keyframe_color, select_keyframe_flow
+
+
+def make_frames(n_frames):
+    """Frames with a moving square, so that every frame has corners and a different histogram."""
+    frames = []
+    for i in range(n_frames):
+        im = np.zeros((48, 64, 3), dtype=np.uint8)
+        im[10 + i % 8:30 + i % 8, 10 + 2 * i:30 + 2 * i] = (40 * i % 256, 255, 128)
+        frames.append(im)
+
+    return frames
+
+
+@pytest.mark.parametrize("select_keyframe", [select_keyframe_color, select_keyframe_flow])
+def test_empty_shot_selects_its_first_frame(select_keyframe):
+    assert select_keyframe(7, iter([])) == 7
+
+
+@pytest.mark.parametrize("get_keyframes", [get_keyframes_color, get_keyframes_flow])
+def test_fewer_frames_than_probed(get_keyframes):
+    # The iframes were probed for 16 frames, but only 6 frames are decoded: the shot starting at frame 8 is empty
+    keyframes = get_keyframes([0, 4, 8, 12], iter(make_frames(6)))
+
+    assert len(keyframes) == 3
+    assert 0 <= keyframes[0] < 4 <= keyframes[1] < 6
+    assert keyframes[2] == 8
+
+
+@pytest.mark.parametrize("select_keyframe", [select_keyframe_color_features, select_keyframe_flow_features])
+def test_empty_shot_of_features_selects_its_first_frame(select_keyframe):
+    features = {"histograms": np.ones((5, 512), dtype=np.uint32), "motion": np.ones(5, dtype=np.float32)}
+
+    assert select_keyframe(features, 5, 8) == 5
+
+
+@pytest.mark.parametrize("iframes, starts", [([0, 4, 8], [0, 4, 8]), ([3, 8], [0, 3, 8]), ([], [0])])
+def test_first_frame_starts_a_shot(iframes, starts):
+    assert get_shot_starts(iframes) == starts
+    assert [(start, len(list(shot))) for start, shot in iter_shots(range(10), iframes)] == \
+        [(start, end - start) for start, end in zip(starts, starts[1:] + [10])]
+
+
+@pytest.mark.parametrize("method", ["color", "flow"])
+@pytest.mark.parametrize("options", [{}, {"workers": 2}, {"stride": 3}, {"features_file": "features.npz"}])
+def test_window_inside_a_gop(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path, method, options):
+    # The window goes from frame 62 to frame 87, inside the GOP of the frames 50-99, so it has no iframes
+    video_file = make_clip(duration=6, gop=50)
+    if "features_file" in options:
+        options = {"features_file": str(tmp_path / options["features_file"])}
+
+    keyframes = get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method, output_dir=str(tmp_path / "keyframes"),
+                              use_cache=False, profile="analysis-only", start=2.5, end=3.5, **options)
+
+    # The indices are counted from the first frame of the window
+    assert len(keyframes) == 1
+    assert 0 <= keyframes[0] < 25
+
+
+@pytest.mark.parametrize("method", ["color", "flow"])
+def test_window_starting_inside_a_gop(ffmpeg_exe, ffprobe_exe, make_clip, tmp_path, method):
+    # The window goes from frame 37 to frame 112, with iframes at its frames 13 and 63
+    video_file = make_clip(duration=6, gop=50)
+
+    keyframes = get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method, output_dir=str(tmp_path / "keyframes"),
+                              use_cache=False, profile="analysis-only", start=1.5, end=4.5)
+
+    assert len(keyframes) == 3
+    assert 0 <= keyframes[0] < 13 <= keyframes[1] < 63 <= keyframes[2]
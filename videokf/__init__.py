@@ -1 +1,3 @@
-from videokf.extract_keyframes import extract_keyframes
\ No newline at end of file
+from videokf.extract_keyframes import extract_keyframes, extract_keyframes_async, extract_keyframes_many, \
+    iter_keyframes
+from videokf.keyframe_manager.features import load_features, select_keyframes_from_features
@@ -1,11 +1,38 @@
 import argparse
 
-from videokf.extract_keyframes import extract_keyframes
+from videokf.extract_keyframes import extract_keyframes, extract_keyframes_many
+from videokf.keyframe_manager.shot_detector import VALID_SEGMENTERS
+from videokf.utils.all_utils import find_videos
+from videokf.utils.decode_profile import DECODE_PROFILES
+from videokf.utils.frame_index import MANIFEST_FORMATS
+from videokf.utils.profiling import enable_profiling, format_stats, get_stats
+
+
+def parse_time(value):
+    """Parses a time given in the command line, either in seconds (eg.: '90.5') or as [HH:]MM:SS (eg.: '1:30.5').
+
+    Args:
+        value (str): Time.
+
+    Returns:
+        float: Time, in seconds.
+
+    """
+    seconds = 0.
+    try:
+        for part in value.split(":"):
+            seconds = 60 * seconds + float(part)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid time '{value}'. Use seconds or [HH:]MM:SS")
+
+    return seconds
 
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Extracts keyframes from a video")
-    parser.add_argument("video_file", type=str, help="Path to the video file to extract the keyframes from")
+    parser.add_argument("video_file", type=str, help="Path to the video file to extract the keyframes from. It can also "
+                        "be a directory, a glob pattern or a manifest file (.txt with one video per line), in which "
+                        "case the keyframes of every video are extracted in a folder named as the video")
     parser.add_argument("-m", "--method", type=str, default="iframes", help="Method to extract the keyframes")
     parser.add_argument("-o", "--output_dir_keyframes", type=str, default="keyframes", help="Directory where to "
                         "extract keyframes. If it is a string instead of a directory, keyframes will be saved in a "
@@ -14,14 +41,80 @@ def parse_arguments():
     parser.add_argument("-ffprobe", "--ffprobe", type=str, help="Path to the Ffprobe executable")
     parser.add_argument("-dir", "--dir_ffmpeg_ffprobe", type=str, help="Path to the directory containing both Ffmpeg "
                                                                        "and Ffprobe executables")
-    parser.add_argument("--no-frames-rm", dest="remove_frames_dir", action="store_false", help="If present, this option will "
-                        "NOT remove the directory with the extracted frames, if they were extracted (only for 'color' "
-                        "and 'flow' methods)")
+    parser.add_argument("--no-frames-rm", dest="remove_frames_dir", action="store_false", help="If present, all the frames "
+                        "are extracted to a directory that will NOT be removed, instead of being streamed in memory "
+                        "(only for 'color' and 'flow' methods)")
+    parser.add_argument("--extract-frames", dest="extract_all_frames", action="store_true", help="If present, all "
+                        "the frames are extracted to a directory, which is removed once the keyframes have been moved "
+                        "out of it, instead of being streamed in memory (only for 'color' and 'flow' methods)")
+    parser.add_argument("--background-rm", dest="background_remove", action="store_true", help="If present, the "
+                        "directory with all the frames is removed in the background, so the extraction finishes as "
+                        "soon as the keyframes are saved (only with --extract-frames)")
+    parser.add_argument("--fast-probe", dest="fast_probe", action="store_true", help="If present, the iframes are "
+                        "read from the keyframe flags of the video packets, without decoding the video")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Number of processes used to score the shot "
+                        "sequences, or to decode the frames, in parallel (only for 'color' and 'flow' methods)")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Maximum number of videos processed at the same "
+                        "time (only when extracting the keyframes of many videos)")
+    parser.add_argument("--no-cache", dest="use_cache", action="store_false", help="If present, the iframes and "
+                        "keyframes are not read from or saved to the persistent cache")
+    parser.add_argument("-s", "--analysis-size", dest="analysis_size", type=int, help="Maximum width of the frames "
+                        "used to score the shot sequences, eg.: 320 (only for 'color' and 'flow' methods). Keyframes "
+                        "are still saved at full resolution")
+    parser.add_argument("-p", "--profile", type=str, default="default", choices=list(DECODE_PROFILES), help="Decode "
+                        "profile, with the options of the decoder and of the format of the saved keyframes")
+    parser.add_argument("--segmenter", type=str, default="iframes", choices=VALID_SEGMENTERS, help="Where the shot "
+                        "sequences start: at every iframe, or at every cut detected from the content of the frames "
+                        "(only for 'color' and 'flow' methods)")
+    parser.add_argument("--start", type=parse_time, help="Start time of the part of the video to process, in seconds "
+                        "or as [HH:]MM:SS. Only that part is probed and decoded, and the keyframes are numbered from "
+                        "its first frame")
+    parser.add_argument("--end", type=parse_time, help="End time of the part of the video to process, in seconds or "
+                        "as [HH:]MM:SS")
+    parser.add_argument("--stride", type=int, default=1, help="Only one of every STRIDE frames (and every iframe) is "
+                        "decoded and scored, eg.: 5 (only for 'color' and 'flow' methods)")
+    parser.add_argument("--scene-threshold", dest="scene_threshold", type=float, help="If given, the frames whose "
+                        "scene change score (between 0 and 1) is higher are also scored, so the sampling is denser "
+                        "where the content changes, eg.: 0.1 (only for 'color' and 'flow' methods)")
+    parser.add_argument("--dedup", dest="dedup_threshold", type=int, help="If given, the keyframes whose perceptual "
+                        "hash differs in at most DEDUP_THRESHOLD bits (between 0 and 64) from a recently kept "
+                        "keyframe are dropped as near-duplicates, eg.: 6")
+    parser.add_argument("--features", type=str, help="File (.npz) where the color histogram, motion score and "
+                        "timestamp of every frame are saved, or read from if it was saved before, so the keyframes "
+                        "are selected without decoding the video again (only for 'color' and 'flow' methods). With "
+                        "many videos, it is a directory with one file per video")
+    parser.add_argument("--manifest", type=str, default="json", choices=MANIFEST_FORMATS + ["none"], help="Format "
+                        "of the manifest saved next to the keyframes, with the index, exact timestamp and picture "
+                        "type of every keyframe")
+    parser.add_argument("--timings", nargs="?", const="table", choices=["table", "json"], help="If present, the "
+                        "wall time, CPU time, frames processed, bytes written and peak memory of every stage of the "
+                        "extraction are printed at the end, as a table (default) or as JSON")
 
     return parser.parse_args()
 
 
 def main():
     args = parse_arguments()
-    extract_keyframes(args.video_file, args.method, args.output_dir_keyframes, args.dir_ffmpeg_ffprobe, args.ffmpeg,
-                      args.ffprobe, args.remove_frames_dir)
+    manifest = args.manifest if args.manifest != "none" else None
+    if args.timings:
+        enable_profiling()
+
+    # Many videos given by a directory, a glob pattern or a manifest file
+    video_files = find_videos(args.video_file)
+    if video_files != [args.video_file]:
+        summaries = extract_keyframes_many(video_files, args.method, args.output_dir_keyframes,
+                                           args.dir_ffmpeg_ffprobe, args.ffmpeg, args.ffprobe, args.fast_probe,
+                                           args.workers, args.jobs, args.use_cache, args.analysis_size,
+                                           args.profile, args.segmenter, args.start, args.end, args.stride,
+                                           args.scene_threshold, args.dedup_threshold, args.features, manifest)
+        n_errors = sum(summary["status"] != "ok" for summary in summaries)
+        print(f"Keyframes extracted from {len(summaries) - n_errors} of {len(summaries)} videos.")
+    else:
+        extract_keyframes(args.video_file, args.method, args.output_dir_keyframes, args.dir_ffmpeg_ffprobe,
+                          args.ffmpeg, args.ffprobe, args.remove_frames_dir, args.fast_probe, args.workers,
+                          args.use_cache, args.analysis_size, args.profile, args.segmenter, args.start, args.end,
+                          args.stride, args.scene_threshold, args.dedup_threshold, args.features, manifest,
+                          args.extract_all_frames, args.background_remove)
+
+    if args.timings:
+        print(format_stats(get_stats(), args.timings))
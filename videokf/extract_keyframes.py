@@ -1,9 +1,21 @@
+import json
+import time
+import traceback
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
 from videokf.ffmpeg_manager.check_ffmpeg import get_ff
-from videokf.keyframe_manager.keyframe_extractor import get_keyframes
+from videokf.keyframe_manager.keyframe_extractor import generate_keyframes, get_keyframes, get_keyframes_async
+from videokf.utils.lazy_import import lazy_import
+
+asyncio = lazy_import("asyncio")
 
 
 def extract_keyframes(video_file, method="iframes", output_dir_keyframes="keyframes", dir_exe=None, ffmpeg_exe=None,
-                      ffprobe_exe=None, remove_frames_dir=True):
+                      ffprobe_exe=None, remove_frames_dir=True, fast_probe=False, workers=1,
+                      use_cache=True, analysis_size=None, profile=None, segmenter="iframes", start=None,
+                      end=None, stride=1, scene_threshold=None, dedup_threshold=None, features_file=None,
+                      manifest="json", extract_all_frames=False, background_remove=False):
     """
 
     Args:
@@ -18,9 +30,59 @@ def extract_keyframes(video_file, method="iframes", output_dir_keyframes="keyfra
                        ffprobe_exe are given.
         ffmpeg_exe (str): Path to the ffmpeg executable.
         ffprobe_exe (str): Path to the ffprobe executable.
-        remove_frames_dir (bool): If True, it removes the folder containing all the frames, after it has been used.
+        remove_frames_dir (bool): If True, the frames are streamed in memory and no folder with all the frames is
+                                  created. If False, all the frames are extracted to a folder, which is not removed.
+        fast_probe (bool): If True, the iframes are read from the keyframe flags of the video packets, without decoding
+                           the video. It is much faster on long videos, but iframes not flagged as keyframes by the
+                           encoder are missed.
+        workers (int): Number of processes used to score the shot sequences in the "color" and "flow" methods. When
+                       the shots can't be scored in parallel (eg.: "content" segmenter, features or remove_frames_dir
+                       False), the frames are decoded by this number of ffmpeg processes instead, each of them
+                       decoding a range of frames that starts at an iframe. By default, 1 (no parallelism).
+        use_cache (bool): If True, the iframes and keyframes of the video are read from and saved to a persistent
+                          cache, so running again on the same video is almost instant.
+        analysis_size (int): Maximum width of the frames used to score the shot sequences in the "color" and "flow"
+                             methods (eg.: 320). It is much faster on high resolution videos, and the keyframes are
+                             still saved at full resolution. By default (None), the frames are scored at full
+                             resolution.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder and of the format of the
+                                            saved keyframes. Either the name of a preset ("default", "fast-preview",
+                                            "archival" or "analysis-only") or a DecodeProfile. By default (None),
+                                            the "default" profile (ffmpeg defaults and highest quality JPEG).
+        segmenter (str): Either "iframes", if the shot sequences of the "color" and "flow" methods start at every
+                         iframe, or "content", if they start at every cut detected from the content of the frames.
+                         Encoders usually place the iframes on a fixed interval instead of at the real cuts, so
+                         "content" gives one keyframe per real shot. By default, "iframes".
+        start (float): Start time of the part of the video to process, in seconds. Only the frames from this time on
+                       are probed and decoded, and the frame indices are counted from the first of them. By default
+                       (None), the start of the video.
+        end (float): End time (excluded) of the part of the video to process, in seconds. By default (None), the end
+                     of the video.
+        stride (int): Only one of every stride frames (and every iframe) is decoded and scored in the "color" and
+                      "flow" methods, eg.: 5. It is much faster on long shots of nearly identical frames (eg.: static
+                      cameras), and the keyframes are still given as indices of the frames in the video. By default,
+                      1 (all the frames).
+        scene_threshold (float): If given, the frames whose ffmpeg scene change score (between 0 and 1) is higher are
+                                 also scored, so the sampling is denser where the content changes (eg.: 0.1).
+        dedup_threshold (int): If given, the keyframes nearly identical to a recently kept keyframe are dropped. It is
+                               the maximum number of different bits, between 0 and 64, between the perceptual hashes
+                               of two near-duplicate keyframes, eg.: 6. By default (None), no keyframe is dropped.
+        features_file (str): Path of a file (.npz) where the color histogram, the motion score and the timestamp of
+                             every frame are saved, in columns, in the "color" and "flow" methods. If the file was
+                             already saved for the same video and parameters, the keyframes are selected from it
+                             without decoding the video again (see select_keyframes_from_features()).
+        manifest (str): Format of the manifest saved next to the keyframes, with the index, the exact timestamp
+                        (presentation timestamp and time base), the time and the picture type of every keyframe. Either
+                        "json" (default, 'keyframes.json') or "csv" ('keyframes.csv'). If None, no manifest is saved.
+        extract_all_frames (bool): If True, all the frames of the "color" and "flow" methods are extracted to a folder
+                                   (decoded by workers ffmpeg processes) instead of being streamed, and the keyframes
+                                   are moved out of it before it is removed. It needs space to save the frames. If
+                                   remove_frames_dir is False, the folder is always extracted and kept.
+        background_remove (bool): If True, the folder with all the frames is removed in a background thread, so the
+                                  function returns as soon as the keyframes are saved (only with extract_all_frames).
 
     Returns:
+        list: Indices of the keyframes of the video. None if the method is not valid.
 
     """
     # Get paths to ffmpeg and ffprobe executables
@@ -31,4 +93,267 @@ def extract_keyframes(video_file, method="iframes", output_dir_keyframes="keyfra
         ffprobe_exe = get_ff("ffprobe", dir_exe)
 
     # Extract frames
-    get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method, output_dir_keyframes, remove_frames_dir)
+    return get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method, output_dir_keyframes, remove_frames_dir,
+                         fast_probe, workers, use_cache, analysis_size, profile, segmenter, start, end, stride,
+                         scene_threshold, dedup_threshold, features_file, manifest, extract_all_frames,
+                         background_remove)
+
+
+async def extract_keyframes_async(video_file, method="iframes", output_dir_keyframes="keyframes", dir_exe=None,
+                                  ffmpeg_exe=None, ffprobe_exe=None, fast_probe=False, use_cache=True,
+                                  analysis_size=None, profile=None, segmenter="iframes", manifest="json"):
+    """Async version of extract_keyframes(), to be awaited from an event loop (eg.: inside an async web service).
+
+    ffmpeg and ffprobe run as async processes, so the event loop is never blocked. The number of processes running at
+    the same time, for all the extractions, is limited by videokf.utils.async_vidutils.set_max_processes(). If the
+    task is cancelled, the running processes are killed.
+
+    Args:
+        video_file (str): Path to the video file.
+        method (str): Flag to choose between the different methods to select the keyframes. The possible flags are
+                      "iframes", "color" and "flow".
+        output_dir_keyframes (str): It can be either a full directory path where the keyframes will be stored, or a
+                                    string, in which case, a folder with this name will be created in the same
+                                    directory of the video and the keyframes will be saved there.
+        dir_exe (str): Directory from where to read the executables or where to download them.
+        ffmpeg_exe (str): Path to the ffmpeg executable.
+        ffprobe_exe (str): Path to the ffprobe executable.
+        fast_probe (bool): If True, the iframes are read from the keyframe flags of the video packets, without decoding
+                           the video.
+        use_cache (bool): If True, the iframes and keyframes of the video are read from and saved to a persistent
+                          cache.
+        analysis_size (int): Maximum width of the frames used to score the shot sequences in the "color" and "flow"
+                             methods.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder and of the format of the
+                                            saved keyframes.
+        segmenter (str): Either "iframes" or "content" (see extract_keyframes()).
+        manifest (str): Format of the manifest saved next to the keyframes, either "json" (default) or "csv" (see
+                        extract_keyframes()). If None, no manifest is saved.
+
+    Returns:
+        list: Indices of the keyframes of the video.
+
+    """
+    # Get paths to ffmpeg and ffprobe executables. They might be downloaded, so it is done outside the event loop
+    loop = asyncio.get_running_loop()
+    if ffmpeg_exe is None:
+        ffmpeg_exe = await loop.run_in_executor(None, get_ff, "ffmpeg", dir_exe)
+
+    if ffprobe_exe is None:
+        ffprobe_exe = await loop.run_in_executor(None, get_ff, "ffprobe", dir_exe)
+
+    return await get_keyframes_async(ffmpeg_exe, ffprobe_exe, video_file, method, output_dir_keyframes, fast_probe,
+                                     use_cache, analysis_size, profile, segmenter, manifest)
+
+
+def iter_keyframes(video_file, method="iframes", dir_exe=None, ffmpeg_exe=None, ffprobe_exe=None, fast_probe=False,
+                   workers=1, use_cache=True, analysis_size=None, profile=None, segmenter="iframes", start=None,
+                   end=None, stride=1, scene_threshold=None, dedup_threshold=None, features_file=None):
+    """Yields the keyframes of a video as soon as they are found, without writing anything to disk.
+
+    The keyframes of the "color" and "flow" methods are yielded as soon as their shot sequence has been scored, and
+    the memory used doesn't depend on the length of the video.
+
+    Args:
+        video_file (str): Path to the video file.
+        method (str): Flag to choose between the different methods to select the keyframes. The possible flags are
+                      "iframes", "color" and "flow".
+        dir_exe (str): Directory from where to read the executables or where to download them.
+        ffmpeg_exe (str): Path to the ffmpeg executable.
+        ffprobe_exe (str): Path to the ffprobe executable.
+        fast_probe (bool): If True, the iframes are read from the keyframe flags of the video packets, without decoding
+                           the video.
+        workers (int): Number of processes used to score the shot sequences in the "color" and "flow" methods.
+        use_cache (bool): If True, the iframes and keyframes of the video are read from and saved to a persistent
+                          cache.
+        analysis_size (int): Maximum width of the frames used to score the shot sequences in the "color" and "flow"
+                             methods. The yielded keyframes are always at full resolution.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder.
+        segmenter (str): Either "iframes" or "content" (see extract_keyframes()).
+        start (float): Start time of the part of the video to process, in seconds (see extract_keyframes()).
+        end (float): End time of the part of the video to process, in seconds.
+        stride (int): Only one of every stride frames is scored (see extract_keyframes()).
+        scene_threshold (float): Minimum scene change score of the frames that are also scored.
+        dedup_threshold (int): Maximum Hamming distance between the perceptual hashes of two near-duplicate keyframes
+                               (see extract_keyframes()).
+        features_file (str): Path of the file where the features of every frame are saved or read from (see
+                             extract_keyframes()).
+
+    Yields:
+        tuple: Index of the keyframe, its time in seconds (from the start of the video) and its image (array), in BGR
+               format.
+
+    """
+    # Get paths to ffmpeg and ffprobe executables
+    if ffmpeg_exe is None:
+        ffmpeg_exe = get_ff("ffmpeg", dir_exe)
+
+    if ffprobe_exe is None:
+        ffprobe_exe = get_ff("ffprobe", dir_exe)
+
+    yield from generate_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method, fast_probe, workers, use_cache,
+                                  analysis_size, profile, segmenter, start, end, stride, scene_threshold,
+                                  dedup_threshold, features_file)
+
+
+def extract_keyframes_many(video_files, method="iframes", output_dir_keyframes="keyframes", dir_exe=None,
+                           ffmpeg_exe=None, ffprobe_exe=None, fast_probe=False, workers=1, jobs=4,
+                           use_cache=True, analysis_size=None, profile=None, segmenter="iframes", start=None,
+                           end=None, stride=1, scene_threshold=None, dedup_threshold=None, features_dir=None,
+                           manifest="json"):
+    """Extracts the keyframes of many videos in a single process.
+
+    The ffmpeg and ffprobe executables are resolved only once, for all the videos. Several videos are processed
+    concurrently by a pool of threads: every video runs its ffmpeg and ffprobe processes one after another, so there
+    are at most as many ffmpeg processes in flight as jobs (times workers, if the shots are scored in parallel).
+
+    The keyframes of every video are saved in a folder named as the video file, with its extension (see
+    get_output_name()), inside output_dir_keyframes, next to a JSON summary of the video (status, timings, keyframes
+    and, if dedup_threshold is given, the near-duplicate keyframes suppressed). A video that fails (eg.: a corrupt
+    file) is reported in its summary and does not stop the rest of the batch.
+
+    The frames are always streamed in memory, since videos in the same directory would share the same frames folder.
+
+    Args:
+        video_files (list[str]): Paths to the video files (see find_videos() to get them from a directory, a glob
+                                 pattern or a manifest file).
+        method (str): Flag to choose between the different methods to select the keyframes. The possible flags are
+                      "iframes", "color" and "flow".
+        output_dir_keyframes (str): It can be either a full directory path where the keyframes folders will be created,
+                                    or a string, in which case, a folder with this name will be created in the same
+                                    directory of every video.
+        dir_exe (str): Directory from where to read the executables or where to download them.
+        ffmpeg_exe (str): Path to the ffmpeg executable.
+        ffprobe_exe (str): Path to the ffprobe executable.
+        fast_probe (bool): If True, the iframes are read from the keyframe flags of the video packets, without decoding
+                           the video.
+        workers (int): Number of processes used to score the shot sequences of every video in the "color" and "flow"
+                       methods.
+        jobs (int): Maximum number of videos processed at the same time.
+        use_cache (bool): If True, the iframes and keyframes of every video are read from and saved to a persistent
+                          cache.
+        analysis_size (int): Maximum width of the frames used to score the shot sequences in the "color" and "flow"
+                             methods.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder and of the format of the
+                                            saved keyframes.
+        segmenter (str): Either "iframes" or "content" (see extract_keyframes()).
+        start (float): Start time of the part of the video to process, in seconds (see extract_keyframes()).
+        end (float): End time of the part of the video to process, in seconds.
+        stride (int): Only one of every stride frames is scored (see extract_keyframes()).
+        scene_threshold (float): Minimum scene change score of the frames that are also scored.
+        dedup_threshold (int): Maximum Hamming distance between the perceptual hashes of two near-duplicate keyframes
+                               (see extract_keyframes()).
+        features_dir (str): If given, the features of every frame of every video are saved in this directory, in a
+                            file named as the keyframes folder (.npz) (see extract_keyframes()).
+        manifest (str): Format of the manifest saved next to the keyframes of every video (see extract_keyframes()).
+
+    Returns:
+        list[dict]: Summary of every video, in the same order as video_files.
+
+    Raises:
+        ValueError: If two videos would be saved in the same keyframes folder or features file (eg.: the same video
+                    given twice, or videos with the same name in different directories and a full directory path as
+                    output_dir_keyframes), before any video is processed.
+
+    """
+    output_dirs = get_output_dirs(video_files, output_dir_keyframes)
+    features_files = [str(Path(features_dir) / f"{output_dir.name}.npz") if features_dir else None
+                      for output_dir in output_dirs]
+    check_unique_outputs(video_files, output_dirs, "keyframes folder")
+    if features_dir:
+        check_unique_outputs(video_files, features_files, "features file")
+
+    # Get paths to ffmpeg and ffprobe executables only once
+    if ffmpeg_exe is None:
+        ffmpeg_exe = get_ff("ffmpeg", dir_exe)
+
+    if ffprobe_exe is None:
+        ffprobe_exe = get_ff("ffprobe", dir_exe)
+
+    def extract_video_keyframes(video_file, output_dir, features_file):
+        output_dir.parent.mkdir(parents=True, exist_ok=True)
+
+        summary = {"video_file": str(video_file), "method": method, "output_dir": str(output_dir)}
+        suppressed = [] if dedup_threshold is not None else None
+        start_time = time.perf_counter()
+        try:
+            keyframes = get_keyframes(ffmpeg_exe, ffprobe_exe, str(video_file), method, str(output_dir),
+                                      True, fast_probe, workers, use_cache, analysis_size, profile, segmenter, start,
+                                      end, stride, scene_threshold, dedup_threshold, features_file, manifest,
+                                      suppressed=suppressed)
+            summary.update({"status": "ok" if keyframes is not None else "error", "keyframes": keyframes})
+            if suppressed is not None:
+                summary["suppressed"] = suppressed
+        except Exception as e:
+            print(f"!!! Keyframes could not be extracted from '{video_file}': {e} !!!")
+            summary.update({"status": "error", "error": traceback.format_exception_only(type(e), e)[-1].strip()})
+        summary["time"] = time.perf_counter() - start_time
+
+        # Save the summary next to the keyframes folder
+        (output_dir.parent / f"{output_dir.name}.json").write_text(json.dumps(summary, indent=2))
+
+        return summary
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(extract_video_keyframes, video_files, output_dirs, features_files))
+
+
+def get_output_name(video_file):
+    """Gets the name of the keyframes folder of a video in a batch (see extract_keyframes_many()): the name of the video
+    file, with the dot of its extension replaced by an underscore (eg.: 'My_video_mp4' for 'My_video.mp4'), so that
+    videos with the same name and different extensions don't share the folder.
+
+    Args:
+        video_file (str): Path to the video file.
+
+    Returns:
+        str: Name of the keyframes folder.
+
+    """
+    video_path = Path(video_file)
+
+    return f"{video_path.stem}_{video_path.suffix[1:]}" if video_path.suffix else video_path.name
+
+
+def get_output_dirs(video_files, output_dir_keyframes):
+    """Gets the keyframes folder of every video in a batch (see extract_keyframes_many()).
+
+    Args:
+        video_files (list[str]): Paths to the video files.
+        output_dir_keyframes (str): Either a full directory path where the keyframes folders are created, or a string,
+                                    in which case, the folders are created inside a folder with this name in the same
+                                    directory of every video.
+
+    Returns:
+        list[Path]: Keyframes folder of every video, in the same order as video_files.
+
+    """
+    output_dirs = []
+    for video_file in video_files:
+        output_dir = Path(output_dir_keyframes) / get_output_name(video_file)
+        if not output_dir.is_absolute():
+            output_dir = Path(video_file).parent / output_dir
+        output_dirs.append(output_dir)
+
+    return output_dirs
+
+
+def check_unique_outputs(video_files, outputs, description):
+    """Checks that no two videos in a batch are saved in the same output (eg.: keyframes folder or features file).
+
+    Args:
+        video_files (list[str]): Paths to the video files.
+        outputs (list): Output of every video, in the same order as video_files.
+        description (str): Description of the outputs, used in the error message.
+
+    Raises:
+        ValueError: If two videos have the same output.
+
+    """
+    videos_by_output = {}
+    for video_file, output in zip(video_files, outputs):
+        key = Path(output).resolve()
+        if key in videos_by_output:
+            raise ValueError(f"The videos '{videos_by_output[key]}' and '{video_file}' would be saved in the same "
+                             f"{description} '{output}'")
+        videos_by_output[key] = video_file
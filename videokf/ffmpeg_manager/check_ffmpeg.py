@@ -1,16 +1,27 @@
 import os
 import stat
 import re
+import shutil
+from functools import lru_cache
 from pathlib import Path
-import requests
 import zipfile
 import platform
 
 from videokf.utils.all_utils import make_dir, url_retrieve
+from videokf.utils.lazy_import import lazy_import
 
+requests = lazy_import("requests")
 
+
+# Url of the api with the download urls of the ffmpeg and ffprobe executables
+FFBINARIES_API_URL = "https://ffbinaries.com/api/v1/version/latest"
+
+
+@lru_cache(maxsize=None)
 def get_ff(type, dir=None):
-    """Gets ffmpeg or ffprobe executables, either from an env var, from dir or downloading it.
+    """Gets ffmpeg or ffprobe executables, either from an env var, from dir, from the PATH or downloading it.
+
+    The resolved path is memoized, so the executable is only searched once per process.
 
     Args:
         type (str): Choose what url file to return. Either 'ffmpeg' or 'ffprobe'.
@@ -22,29 +33,26 @@ def get_ff(type, dir=None):
     """
     save_dir = get_default_dir(dir)
 
-    # Get urls
-    url = choose_url(type)
-
     # Get files or download them
-    ff = get_executable(type, save_dir, url)
+    ff = get_executable(type, save_dir)
 
     # Allow executing program for Ubuntu and OSX
-    allow_executing_as_program(str(ff))
+    if not os.access(ff, os.X_OK):
+        allow_executing_as_program(str(ff))
 
     return str(ff)
 
 
-def get_executable(file_name, dir, url):
-    """Gets an executable file after checking if it's an env variable and if it's in dir.
+def get_executable(file_name, dir):
+    """Gets an executable file after checking if it's an env variable, if it's in dir and if it's in the PATH.
 
     First, it will be checked if file_name is an environmental variable.
-    If that it False, it will be checked if the file is in dir.
-    If this fails, the file will be downloaded and saved in dir.
+    If that it False, it will be checked if the file is in dir, and then if it is in the PATH.
+    If this fails, the file will be downloaded and saved in dir. Only in this case, the download url is requested.
 
     Args:
         file_name (str): File to check.
         dir (str): Directory to check and where to save the file in case of download.
-        url (str): Url from where to download the file.
 
     Returns:
         str: Full path of the file.
@@ -52,7 +60,8 @@ def get_executable(file_name, dir, url):
     """
     return check_environ_var(file_name.upper()) or \
            check_if_file_exists(file_name, dir) or \
-           download_and_unzip(url, dir, file_name)
+           shutil.which(file_name) or \
+           download_and_unzip(choose_url(file_name), make_dir(dir.name, dir.parent, parents=True), file_name)
 
 
 def check_environ_var(var):
@@ -138,7 +147,7 @@ def choose_url(type):
 
     """
     # Download urls information
-    url_api = "https://ffbinaries.com/api/v1/version/latest"
+    url_api = FFBINARIES_API_URL
     headers = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) "
                              "Chrome/50.0.2661.102 Safari/537.36"}
     result = requests.get(url_api, headers=headers).json()["bin"]
@@ -176,7 +185,7 @@ def set_default_dir():
 def get_default_dir(dir=None):
     """Gets the path of the default directory where ffmpeg and ffprobe will be searched and donwload, if not found.
 
-    It will create the directory, if it doesn't exist.
+    The directory is not created here, but only when the executables have to be downloaded.
 
     Args:
           dir(str): Directory from where to read the executable or where to download it.
@@ -185,7 +194,7 @@ def get_default_dir(dir=None):
     if dir is None:
         dir = set_default_dir()
 
-    return make_dir("Ffmpeg", dir)
+    return Path(dir) / "Ffmpeg"
 
 
 def allow_executing_as_program(file):
@@ -0,0 +1,157 @@
+from itertools import islice
+from functools import lru_cache
+
+from videokf.utils.lazy_import import lazy_import
+from videokf.utils.profiling import stage
+from videokf.utils.vidutils import SEEK_BATCH_SIZE, decode_thumbnails
+
+np = lazy_import("numpy")
+
+
+# Number of recently kept keyframes compared with every new keyframe
+DEDUP_WINDOW = 64
+
+
+class HashIndex:
+
+    def __init__(self, window=DEDUP_WINDOW):
+        """Initializes instance of class HashIndex, the perceptual hashes of the most recently kept keyframes.
+
+        The hashes are stored bit-packed in a ring buffer of uint64, so every new hash is compared with all of them at
+        once.
+
+        Args:
+            window (int): Maximum number of hashes stored. When it is full, the oldest hash is replaced.
+
+        """
+        self.hashes = np.zeros(window, dtype=np.uint64)
+        self.n_hashes = 0
+        self.pos = 0
+
+    def add(self, image_hash):
+        """Adds a hash to the index, replacing the oldest one if the index is full.
+
+        Args:
+            image_hash (uint64): Perceptual hash.
+
+        """
+        self.hashes[self.pos] = image_hash
+        self.pos = (self.pos + 1) % len(self.hashes)
+        self.n_hashes = min(self.n_hashes + 1, len(self.hashes))
+
+    def min_distance(self, image_hash):
+        """Computes the minimum Hamming distance between a hash and the hashes of the index.
+
+        Args:
+            image_hash (uint64): Perceptual hash.
+
+        Returns:
+            int: Minimum number of different bits. 65 if the index is empty.
+
+        """
+        if self.n_hashes == 0:
+            return 65
+
+        return int(hamming_distances(self.hashes[:self.n_hashes], image_hash).min())
+
+
+def calculate_dhashes(ims):
+    """Calculates the difference hash (dHash) of a batch of grayscale images.
+
+    Every bit of the hash is 1 if a pixel is brighter than its left neighbour, so the hash only depends on the
+    gradients of the image, and nearly identical images (eg.: different compression artifacts) get the same or very
+    similar hashes.
+
+    Args:
+        ims (array): Grayscale images of 8 rows and 9 columns (images x 8 x 9) (see decode_thumbnails()).
+
+    Returns:
+        array: Hashes of the images, as uint64.
+
+    """
+    ims = np.asarray(ims, dtype=np.int16)
+    bits = (ims[:, :, 1:] > ims[:, :, :-1]).reshape(len(ims), 64)
+
+    return np.packbits(bits, axis=1).view(np.uint64).ravel()
+
+
+def hamming_distances(hashes, image_hash):
+    """Computes the Hamming distance (number of different bits) between every hash of an array and a hash.
+
+    Args:
+        hashes (array): Hashes, as uint64.
+        image_hash (uint64): Hash to compare with.
+
+    Returns:
+        array: Distance of every hash, between 0 and 64.
+
+    """
+    xor = np.bitwise_xor(hashes, np.uint64(image_hash))
+
+    return get_popcount_table()[xor.view(np.uint8)].reshape(len(hashes), 8).sum(axis=1)
+
+
+@lru_cache(maxsize=None)
+def get_popcount_table():
+    """Gets the number of bits set in every byte, as a lookup table.
+
+    Returns:
+        array: Number of bits set in every value from 0 to 255.
+
+    """
+    return np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def iter_unique_keyframes(ffmpeg_exe, video_file, keyframes, frame_times, threshold, window=DEDUP_WINDOW,
+                          profile=None, keyframes_only=False, batch_size=SEEK_BATCH_SIZE, suppressed=None):
+    """Filters out the keyframes that are nearly identical to a recently kept keyframe, as they are given.
+
+    Every keyframe is decoded as a small grayscale image (see decode_thumbnails()) and its perceptual hash (see
+    calculate_dhashes()) is compared with the hashes of the last kept keyframes (see HashIndex). The keyframes are
+    decoded in batches, so they can be given by an iterator that is consumed lazily. The number of suppressed keyframes
+    is printed at the end, and added to the "deduplicate" stage of the profiling statistics (see get_stats()).
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        video_file (str): Path of the video.
+        keyframes (iterable): Indices of the keyframes, in order.
+        frame_times (list): Time of every frame in the video, in seconds (see get_frame_times()).
+        threshold (int): Maximum Hamming distance between the hashes of two nearly identical keyframes (eg.: 6). 0
+                         only removes the keyframes with exactly the same hash.
+        window (int): Number of recently kept keyframes compared with every keyframe.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile).
+        keyframes_only (bool): If True, all the keyframes are keyframes of the video (see DecodeProfile.skip_frame).
+        batch_size (int): Maximum number of keyframes decoded by a single ffmpeg process.
+        suppressed (list): If given, the indices of the suppressed keyframes are appended to it, as they are found.
+
+    Yields:
+        int: Index of every keyframe kept, in order.
+
+    """
+    index = HashIndex(window)
+    keyframes = iter(keyframes)
+    n_suppressed = 0
+    for batch in iter(lambda: list(islice(keyframes, batch_size)), []):
+        with stage("deduplicate") as s:
+            thumbnails = decode_thumbnails(ffmpeg_exe, video_file, batch, frame_times, profile=profile,
+                                           keyframes_only=keyframes_only)
+            # If some keyframe could not be decoded, the images can't be matched with the keyframes, so all are kept
+            hashes = calculate_dhashes(thumbnails) if len(thumbnails) == len(batch) else None
+
+            kept = []
+            for k, idx in enumerate(batch):
+                if hashes is not None:
+                    if index.min_distance(hashes[k]) <= threshold:
+                        if suppressed is not None:
+                            suppressed.append(idx)
+                        continue
+                    index.add(hashes[k])
+
+                kept.append(idx)
+
+            n_suppressed += len(batch) - len(kept)
+            s.add(frames=len(batch), dropped=len(batch) - len(kept))
+
+        yield from kept
+
+    print(f"{n_suppressed} near-duplicate keyframes suppressed.")
@@ -0,0 +1,290 @@
+import os
+import json
+import zipfile
+from itertools import islice
+from pathlib import Path
+
+from videokf.keyframe_manager.frame_manager import Frame, calculate_histograms, calculate_stillness, \
+    compare_histograms
+from videokf.keyframe_manager.shot_detector import ShotDetector
+from videokf.utils.cache import video_fingerprint
+from videokf.utils.decode_profile import get_decode_profile
+from videokf.utils.lazy_import import lazy_import
+from videokf.utils.profiling import stage
+from videokf.utils.vidutils import HISTOGRAM_BATCH_SIZE, get_shot_starts, stream_frames, stream_frames_chunked
+
+np = lazy_import("numpy")
+
+
+# Version of the features files. Increasing it makes the files written by previous versions of the library be
+# computed again
+FEATURES_VERSION = 3
+
+# Columns of the features (see compute_features())
+FEATURES_COLUMNS = ("pts", "pict_type", "time_base", "frame_times", "is_iframe", "iframes", "histograms", "motion")
+
+
+def compute_features(ffmpeg_exe, ffprobe_exe, video_file, frame_index, analysis_size=None, profile=None, window=None,
+                     workers=1):
+    """Computes the per-frame signals used to select the keyframes of a video, decoding all its frames only once.
+
+    For every frame, it computes the color histogram used by the "color" method (see select_keyframe_color()) and the
+    motion score used by the "flow" method (the optical flow error against the previous frame, see
+    calculate_stillness()).
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+        frame_index (obj FrameIndex): Index of the frames of the video, with their timestamps, picture types and
+                                      times (see probe_frame_index()).
+        analysis_size (int): Maximum width of the frames used to compute the features (see get_analysis_size()).
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile).
+        window (tuple): Start and end times of the window of the video to decode, in seconds. The frame index must be
+                        the one of the window.
+        workers (int): Number of ffmpeg processes that decode the frames in parallel (see stream_frames_chunked()).
+
+    Returns:
+        dict: Columns of the features, one row per frame:
+            - pts (array): Presentation timestamp of every frame, in units of the time base.
+            - pict_type (array): Picture type of every frame ("I", "P", "B" or "?" if it is not known, eg.: with fast
+                                 probing), as bytes.
+            - time_base (array): Numerator and denominator of the time base of the timestamps (a single row).
+            - frame_times (array): Time of every frame, in seconds.
+            - is_iframe (array): True for the iframes.
+            - iframes (array): Indices of the iframes.
+            - histograms (array): Color histogram of every frame (frames x 512), with the exact pixel counts, as
+                                  uint32.
+            - motion (array): Motion score of every frame against the previous one. NaN for the first frame and for
+                              the frames whose previous frame has no features (eg.: black frames).
+
+    """
+    iframes, frame_times = frame_index.iframes, frame_index.frame_times
+    n_frames = len(frame_times)
+    if workers > 1 and n_frames:
+        frames = stream_frames_chunked(ffmpeg_exe, ffprobe_exe, video_file, iframes, frame_times, workers,
+                                       analysis_size=analysis_size, profile=profile)
+    elif window is None:
+        frames = stream_frames(ffmpeg_exe, ffprobe_exe, video_file, analysis_size=analysis_size, profile=profile)
+    elif n_frames:
+        frames = stream_frames(ffmpeg_exe, ffprobe_exe, video_file, start_time=frame_times[0], n_frames=n_frames,
+                               analysis_size=analysis_size, profile=profile)
+    else:
+        frames = iter([])
+
+    histograms = np.empty((n_frames, 512), dtype=np.uint32)
+    motion = np.full(n_frames, np.nan, dtype=np.float32)
+    frame_prev = None
+    idx = 0
+    for batch in iter(lambda: list(islice(frames, HISTOGRAM_BATCH_SIZE)), []):
+        # Frames decoded after the last frame time (eg.: a wrong frame count) are ignored
+        batch = batch[:n_frames - idx]
+        if not batch:
+            break
+
+        with stage("color histograms") as s:
+            histograms[idx:idx + len(batch)] = calculate_histograms(batch)
+            s.add(frames=len(batch))
+
+        for j, im in enumerate(batch, idx):
+            with stage("optical flow") as s:
+                frame = Frame(j, im, extract_features=True)
+                if frame_prev is not None:
+                    score = calculate_stillness(frame, frame_prev)
+                    if score is not None:
+                        motion[j] = score
+                s.add(frames=1)
+
+            frame_prev = frame
+
+        idx += len(batch)
+
+    records, _ = frame_index.to_arrays()
+
+    return {"pts": records["pts"][:idx],
+            "pict_type": records["pict_type"][:idx],
+            "time_base": np.array([frame_index.time_base.numerator, frame_index.time_base.denominator], dtype=np.int64),
+            "frame_times": np.asarray(frame_times, dtype=np.float64)[:idx],
+            "is_iframe": np.isin(np.arange(idx), iframes),
+            "iframes": np.asarray([i for i in iframes if i < idx], dtype=np.int64),
+            "histograms": histograms[:idx],
+            "motion": motion[:idx]}
+
+
+def get_features_params(video_file, fast_probe=False, analysis_size=None, profile=None, window=None):
+    """Gets the parameters the features of a video depend on, to check if a features file can be reused.
+
+    Returns:
+        str: Parameters, as JSON.
+
+    """
+    return json.dumps({"version": FEATURES_VERSION, "fingerprint": video_fingerprint(video_file),
+                       "fast_probe": fast_probe, "analysis_size": analysis_size,
+                       "decoder": get_decode_profile(profile).decoder_args(), "window": window}, sort_keys=True)
+
+
+def save_features(features_file, features, params=""):
+    """Saves the features of a video in a columnar file (.npz), with one array per column.
+
+    The file is first written to a temporary file, so that other processes never read a partial file.
+
+    Args:
+        features_file (str): Path of the features file.
+        features (dict): Columns of the features (see compute_features()).
+        params (str): Parameters used to compute the features (see get_features_params()).
+
+    """
+    features_file = Path(features_file)
+    features_file.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp_file = features_file.with_suffix(f".{os.getpid()}.tmp")
+    with tmp_file.open("wb") as f:
+        np.savez(f, params=np.array(params), **features)
+    tmp_file.replace(features_file)
+
+
+def load_features(features_file, params=None):
+    """Loads the features of a video from a columnar file (see save_features()).
+
+    Args:
+        features_file (str): Path of the features file.
+        params (str): If given, the features are only returned if they were computed with these parameters (see
+                      get_features_params()).
+
+    Returns:
+        dict or None: Columns of the features (see compute_features()). None if the file can't be read (eg.: it is
+                      truncated), it misses any column or it was computed with other parameters.
+
+    """
+    try:
+        with np.load(features_file, allow_pickle=False) as f:
+            features = {name: f[name] for name in f.files}
+    except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile):
+        return None
+
+    if any(name not in features for name in FEATURES_COLUMNS):
+        return None
+
+    if params is not None and ("params" not in features or str(features["params"]) != params):
+        return None
+
+    return features
+
+
+def get_features(ffmpeg_exe, ffprobe_exe, video_file, features_file, frame_index, fast_probe=False,
+                 analysis_size=None, profile=None, window=None, workers=1):
+    """Gets the features of a video from a features file or, if it doesn't exist or it was computed for another
+    version of the video or with other parameters, computes them (see compute_features()) and saves them in the file.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+        features_file (str): Path of the features file (.npz).
+        frame_index (obj FrameIndex): Index of the frames of the video (see probe_frame_index()).
+        fast_probe (bool): If True, the iframes were read from the keyframe flags of the video packets.
+        analysis_size (int): Maximum width of the frames used to compute the features.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder.
+        window (tuple): Start and end times of the window of the video, in seconds.
+        workers (int): Number of ffmpeg processes that decode the frames in parallel.
+
+    Returns:
+        dict: Columns of the features.
+
+    """
+    params = get_features_params(video_file, fast_probe, analysis_size, profile, window)
+    features = load_features(features_file, params)
+    if features is not None:
+        print(f"Features read from '{features_file}'.")
+        return features
+
+    features = compute_features(ffmpeg_exe, ffprobe_exe, video_file, frame_index, analysis_size, profile, window,
+                                workers)
+    try:
+        save_features(features_file, features, params)
+    except OSError as e:
+        # The features are still valid if the file can't be written
+        print(f"!!! The features could not be saved in '{features_file}': {e} !!!")
+
+    return features
+
+
+def select_keyframes_from_features(features, method="color", segmenter="iframes"):
+    """Selects the keyframes of a video from its features, without decoding the video.
+
+    The keyframes are the same ones selected while decoding the frames (see select_keyframe_color() and
+    select_keyframe_flow()), except with the "content" segmenter, whose cuts are detected from the histograms of the
+    whole frames instead of a subsample of their pixels.
+
+    Args:
+        features (dict or str): Columns of the features (see compute_features()) or path of a features file.
+        method (str): Either "iframes", "color" or "flow".
+        segmenter (str): Either "iframes" or "content" (see iter_shot_keyframes()).
+
+    Returns:
+        list: Indices of the keyframes, one for each shot sequence.
+
+    """
+    if not isinstance(features, dict):
+        path = features
+        features = load_features(path)
+        if features is None:
+            raise ValueError(f"The features file '{path}' can't be read")
+
+    if method == "iframes":
+        return features["iframes"].tolist()
+
+    n_frames = len(features["frame_times"])
+    if segmenter == "content":
+        # The detector is run on every frame, and the first frame always starts a shot
+        detector = ShotDetector()
+        starts = [idx for idx, histogram in enumerate(features["histograms"])
+                  if detector.is_cut_histogram(histogram) or idx == 0]
+    else:
+        starts = get_shot_starts(features["iframes"].tolist()) if n_frames else []
+
+    select_keyframe = select_keyframe_color_features if method == "color" else select_keyframe_flow_features
+
+    return [select_keyframe(features, start, end) for start, end in zip(starts, starts[1:] + [n_frames])]
+
+
+def select_keyframe_color_features(features, start, end):
+    """Selects the keyframe of a shot sequence from the color histograms of its frames (see select_keyframe_color()).
+
+    Args:
+        features (dict): Columns of the features (see compute_features()).
+        start (int): Index of the first frame of the shot sequence.
+        end (int): Index of the frame after the last one of the shot sequence.
+
+    Returns:
+        int: Index of the keyframe in the video. The first frame if the shot sequence has no features.
+
+    """
+    histograms = features["histograms"][start:end]
+    if len(histograms) == 0:
+        return start
+
+    corr = compare_histograms(histograms, histograms.mean(axis=0, dtype=np.float64))
+
+    # In case of a tie, the last frame is selected
+    return start + len(corr) - 1 - int(np.argmax(corr[::-1]))
+
+
+def select_keyframe_flow_features(features, start, end):
+    """Selects the keyframe of a shot sequence from the motion scores of its frames (see select_keyframe_flow()).
+
+    Args:
+        features (dict): Columns of the features (see compute_features()).
+        start (int): Index of the first frame of the shot sequence.
+        end (int): Index of the frame after the last one of the shot sequence.
+
+    Returns:
+        int: Index of the keyframe in the video. The first frame if no frame has a motion score.
+
+    """
+    # The first frame of the shot is not compared with the last frame of the previous shot
+    motion = features["motion"][start + 1:end]
+    if np.isnan(motion).all():
+        return start
+
+    return start + 1 + int(np.nanargmin(motion))
@@ -1,30 +1,37 @@
-from pathlib import Path
-import numpy as np
-import cv2
+from videokf.utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
 
 
 class Frame:
 
-    def __init__(self, idx, frames_dir, extract_features=False):
+    def __init__(self, idx, im, extract_features=False):
         """Initializes instance of class Frame.
 
         Args:
             idx (int): Index of the frame.
-            frames_dir (str): Directory containing all frames.
+            im (array): Image of the frame, in BGR format.
             extract_features (bool): If True, it extracts the frame features when instance is initialized.
 
         """
         self.idx = idx
-        self.frames_dir = frames_dir
-        self.im = cv2.imread(str((Path(self.frames_dir) / str(self.idx + 1)).with_suffix(".jpg")))
+        self.im = im
         self.im_gray = cv2.cvtColor(self.im, cv2.COLOR_BGR2GRAY)
         self.features = None
+        self._histogram = None
 
         # Call the extract features method
         if extract_features:
             self.extract_features()
 
-        self.histogram = calculate_histogram(self.im)
+    @property
+    def histogram(self):
+        """array: Color histogram of the frame. It is only calculated the first time it is used."""
+        if self._histogram is None:
+            self._histogram = calculate_histogram(self.im)
+
+        return self._histogram
 
     def extract_features(self):
         """Extracts features from the frame."""
@@ -52,6 +59,63 @@ def calculate_histogram(im):
     return cv2.calcHist([im], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256])
 
 
+def calculate_histograms(ims):
+    """Calculates the color histograms of a batch of images, stacked into a matrix.
+
+    Every histogram is calculated with OpenCV (see calculate_histogram()), which counts the pixels of an image in place,
+    so no copy of the images is made. Only the comparison of the histograms is vectorized (see compare_histograms()).
+
+    Args:
+        ims (list[array]): Images, in BGR format.
+
+    Returns:
+        array: Color histograms of the images, one per row (images x 512), flattened as calculate_histogram().
+
+    """
+    histograms = np.empty((len(ims), 512), dtype=np.float32)
+    for i, im in enumerate(ims):
+        histograms[i] = calculate_histogram(im).ravel()
+
+    return histograms
+
+
+def compare_histograms(histograms, histogram):
+    """Computes the correlation between every row of a matrix of histograms and a single histogram.
+
+    It is the vectorized equivalent of calling cv2.compareHist(h, histogram, cv2.HISTCMP_CORREL) for every histogram h,
+    using the same formula as OpenCV.
+
+    Args:
+        histograms (array): Matrix of histograms, one per row (eg.: frames x 512 for color histograms).
+        histogram (array): Histogram to compare with, flattened.
+
+    Returns:
+        array: Correlation of every histogram with the given histogram, between -1 and 1.
+
+    """
+    histograms = np.asarray(histograms, dtype=np.float64)
+    histogram = np.asarray(histogram, dtype=np.float64)
+    scale = 1. / histogram.size
+
+    # The sums of products are computed without temporary matrices, so only the histograms converted to float64 are
+    # allocated
+    s1 = histograms.sum(axis=1)
+    s11 = np.einsum("ij,ij->i", histograms, histograms)
+    s12 = histograms @ histogram
+    s2 = histogram.sum()
+    s22 = (histogram * histogram).sum()
+
+    num = s12 - s1 * s2 * scale
+    denom2 = (s11 - s1 * s1 * scale) * (s22 - s2 * s2 * scale)
+
+    # Constant histograms are considered fully correlated, as in OpenCV
+    corr = np.ones(len(histograms))
+    valid = np.abs(denom2) > np.finfo(np.float64).eps
+    corr[valid] = num[valid] / np.sqrt(denom2[valid])
+
+    return corr
+
+
 def calculate_stillness(frame, prev_frame):
     """Calculates if a frame is still or if it has motion in it.
 
@@ -70,7 +134,9 @@ def calculate_stillness(frame, prev_frame):
 
     # If no feature found for a frame, just return None
     if prev_frame.features is not None:
-        _, _, err = cv2.calcOpticalFlowPyrLK(prev_frame.im, frame.im, prev_frame.features, None, **lk_params)
+        # The flow is calculated on the grayscale images, where the features were found
+        _, _, err = cv2.calcOpticalFlowPyrLK(prev_frame.im_gray, frame.im_gray, prev_frame.features, None,
+                                             **lk_params)
 
         # Get average of errors as a final difference metric
         return np.nanmean(err)
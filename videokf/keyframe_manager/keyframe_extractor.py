@@ -1,5 +1,21 @@
+from functools import partial
+
+from videokf.keyframe_manager.dedup import iter_unique_keyframes
+from videokf.keyframe_manager.features import get_features, select_keyframes_from_features
+from videokf.keyframe_manager.shot_detector import VALID_SEGMENTERS
 from videokf.utils.all_utils import copy_keyframes_from_frames
-from videokf.utils.vidutils import extract_frames, get_iframes, get_keyframes_color, get_keyframes_flow
+from videokf.utils.async_vidutils import extract_frames_seeking_async, get_keyframe_indices_async, \
+    probe_frame_index_async
+from videokf.utils.cache import HAS_NUMPY, VideoCache, get_cached_async, iter_cached
+from videokf.utils.decode_profile import get_decode_profile
+from videokf.utils.frame_index import MANIFEST_FORMATS, FrameIndex, probe_frame_index, write_manifest
+from videokf.utils.lazy_import import lazy_import
+from videokf.utils.vidutils import decode_frame, extract_frames, get_keyframes_color, get_keyframes_flow, \
+    get_output_dir, get_video_size, iter_keyframes_parallel, iter_sampled_shot_keyframes, iter_shot_keyframes, \
+    read_frames, select_keyframe_color, select_keyframe_flow, stream_frames, stream_frames_chunked, \
+    stream_sampled_frames
+
+asyncio = lazy_import("asyncio")
 
 
 # Valid extraction methods
@@ -7,7 +23,10 @@ VALID_METHODS = ["iframes", "color", "flow"]
 
 
 def get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method="iframes", output_dir="keyframes",
-                  remove_frames_dir=True):
+                  remove_frames_dir=True, fast_probe=False, workers=1, use_cache=True, analysis_size=None,
+                  profile=None, segmenter="iframes", start=None, end=None, stride=1, scene_threshold=None,
+                  dedup_threshold=None, features_file=None, manifest="json", extract_all_frames=False,
+                  background_remove=False, suppressed=None):
     """Computes the indices of the most relevant frames (keyframes) of the video.
 
     There are 3 available methods to compute the keyframes:
@@ -17,11 +36,38 @@ def get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method="iframes", output_
         - flow: the keyframes are selected as the most still frames, compared with the previous one, in each
                 sequence (each sequence starts at each iframe).
 
-    The "iframes" method is the fastest one and the only one that doesn't require the extraction of all the frames
+    The "iframes" method is the fastest one and the only one that doesn't require the decoding of all the frames
     in the video. Instead, only the frames corresponding to the iframes will be extracted.
 
-    For the rest of the methods (currently "color" and "flow"), it is necessary to extract all frames of the video
-    because they make use of image information.
+    For the rest of the methods (currently "color" and "flow"), it is necessary to decode all frames of the video
+    because they make use of image information. The frames are streamed from ffmpeg directly into memory and only
+    the selected keyframes are saved to disk, in batches, as soon as they are found (see iter_keyframe_indices()). If
+    remove_frames_dir is False or extract_all_frames is True, all the frames are extracted to a folder instead (see
+    extract_frames_chunked()). If remove_frames_dir is False, the folder is kept and the keyframes are hardlinked from
+    it, otherwise they are moved out of it and the folder is removed, optionally in the background (see
+    copy_keyframes_from_frames()). When the frames are streamed, the shot sequences can be scored in parallel by
+    several processes (see get_keyframes_parallel()).
+
+    Encoders usually place the iframes on a fixed interval instead of at the real cuts of the video, so the shot
+    sequences of the "color" and "flow" methods can also start at the cuts detected from the content of the frames,
+    while they are streamed (segmenter "content", see iter_content_shots()).
+
+    The iframes, the frame times and the keyframes of the video are stored in a persistent cache (see VideoCache), so
+    running again on the same video, even with a different method, skips the probing and the scoring of the frames.
+
+    If start or end are given, only the frames inside that time window are probed and decoded, and the frame indices
+    are counted from the first frame of the window.
+
+    In long shot sequences of nearly identical frames (eg.: static cameras), scoring only a sample of the frames gives
+    almost the same keyframes. The frames are sampled by ffmpeg while decoding, with a fixed stride or, if
+    scene_threshold is given, also wherever the content changes (see stream_sampled_frames()).
+
+    If dedup_threshold is given, the keyframes nearly identical to a recently kept keyframe are dropped before being
+    extracted, comparing their perceptual hashes (see iter_unique_keyframes()). The dropped keyframes are not cached.
+
+    If features_file is given, the per-frame signals of the "color" and "flow" methods are saved to it (see
+    compute_features()), and the keyframes are selected from them. Running again with the same file, with any of
+    these methods, selects the keyframes without decoding the video again.
 
     Args:
         ffmpeg_exe (str): ffmpeg executable.
@@ -32,9 +78,55 @@ def get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method="iframes", output_
         output_dir (str): It can be either a full directory path where the keyframes will be stored, or a string, in
                           which case, a folder with this name will be created in the same directory of the video and
                           the keyframes will be saved there.
-        remove_frames_dir (bool): If True, it removes the folder containing all the frames, after it has been used.
+        remove_frames_dir (bool): If True, the frames are streamed in memory and no folder with all the frames is
+                                  created. If False, all the frames are extracted to a folder, which is not removed,
+                                  unless the decode profile saves no images (eg.: "analysis-only").
+        fast_probe (bool): If True, the iframes are read from the keyframe flags of the video packets, without decoding
+                           the video (see get_keyframe_packets()).
+        workers (int): Number of processes used to score the shot sequences in the "color" and "flow" methods. If
+                       the shots can't be scored in parallel (eg.: "content" segmenter) or all the frames are
+                       extracted to a folder, it is the number of ffmpeg processes that decode the frames in parallel
+                       (see stream_frames_chunked() and extract_frames_chunked()).
+        use_cache (bool): If True, the results are read from and saved to the persistent cache (only if NumPy is
+                          installed).
+        analysis_size (int): Maximum width of the frames used to score the shot sequences in the "color" and "flow"
+                             methods. The keyframes are still saved at full resolution. Only used if
+                             remove_frames_dir is True.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder and of the format of the
+                                            saved keyframes. Either the name of a preset ("default", "fast-preview",
+                                            "archival" or "analysis-only") or a DecodeProfile.
+        segmenter (str): Either "iframes", if the shot sequences start at every iframe, or "content", if they start at
+                         every cut detected from the content of the frames. Only used in the "color" and "flow"
+                         methods. With "content", the shots are always scored by a single process.
+        start (float): Start time of the window of the video to process, in seconds. By default (None), the start of
+                       the video.
+        end (float): End time (excluded) of the window of the video to process, in seconds. By default (None), the
+                     end of the video. With a window, the frames are always streamed.
+        stride (int): Only one of every stride frames (and every iframe) is scored in the "color" and "flow" methods.
+                      By default, 1 (all the frames). With a stride, the frames are always streamed by a single
+                      process.
+        scene_threshold (float): If given, the frames whose ffmpeg scene change score (between 0 and 1) is higher are
+                                 also scored, so the sampling is denser where the content changes (eg.: 0.1).
+        dedup_threshold (int): If given, maximum Hamming distance, between 0 and 64, between the perceptual hashes of
+                               two near-duplicate keyframes (eg.: 6). By default (None), no keyframe is dropped.
+        features_file (str): Path of the file (.npz) where the features of every frame are saved or, if it was saved
+                             for the same video and parameters, read from (see get_features()). Only used in the
+                             "color" and "flow" methods. All the frames are decoded, without stride.
+        manifest (str): Format of the manifest of the keyframes (see write_manifest()), saved next to the images with
+                        the index, timestamp, time base, time and picture type of every keyframe. Either "json" or
+                        "csv". If None, no manifest is saved.
+        extract_all_frames (bool): If True, all the frames are extracted to a folder, which is removed once the
+                                   keyframes have been moved out of it (if remove_frames_dir is True), instead of being
+                                   streamed. Only used in the "color" and "flow" methods, without window, stride or
+                                   features.
+        background_remove (bool): If True, the folder with all the frames is removed in a background thread, so the
+                                  function returns as soon as the keyframes are saved. Only used if extract_all_frames
+                                  and remove_frames_dir are True.
+        suppressed (list): If given, the indices of the keyframes dropped as near-duplicates (see dedup_threshold) are
+                           appended to it.
 
     Returns:
+        list: Indices of the keyframes of the video. None if the method or the segmenter are not valid.
 
     """
     if method not in VALID_METHODS:
@@ -44,22 +136,396 @@ def get_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method="iframes", output_
 
         return
 
-    # Calculate the iframe indices of the video
-    iframes = get_iframes(ffprobe_exe, video_file)
+    if segmenter not in VALID_SEGMENTERS:
+        print(f"Invalid segmenter! Please select one of the following: {', '.join(VALID_SEGMENTERS)}")
+        return
+
+    if manifest is not None and manifest not in MANIFEST_FORMATS:
+        print(f"Invalid manifest format! Please select one of the following: {', '.join(MANIFEST_FORMATS)}")
+        return
+
+    profile = get_decode_profile(profile)
+    cache = VideoCache(video_file) if use_cache and HAS_NUMPY else None
+    window = get_window(start, end)
+
+    # A profile that saves no images never extracts all the frames to a folder either
+    if profile.image_format is None and method != "iframes" and (not remove_frames_dir or extract_all_frames):
+        print(f"The decode profile '{profile.name}' doesn't save frames. The frames are streamed instead of being "
+              f"extracted to a folder.")
+        remove_frames_dir, extract_all_frames = True, False
+
+    # Calculate the iframe indices of the video and the time of every frame, used to seek directly to the keyframes
+    # when extracting them, with a single ffprobe pass
+    frame_index = probe_video(ffprobe_exe, video_file, fast_probe, profile, cache, window)
+    iframes, frame_times = frame_index.iframes, frame_index.frame_times
 
     # Compute the keyframe indices using the selected method
     if method=="iframes":
-        extract_frames(ffmpeg_exe, video_file, frames_selected=iframes, output_dir=output_dir, frame_type=method)
+        keyframes = iframes
+        if dedup_threshold is not None:
+            keyframes = list(iter_unique_keyframes(ffmpeg_exe, video_file, iframes, frame_times, dedup_threshold,
+                                                   profile=profile, keyframes_only=fast_probe, suppressed=suppressed))
+        # The keyframes flagged in the packets are the only ones that the decoder can jump to without decoding
+        # the previous frames
+        keyframes_dir = extract_frames(ffmpeg_exe, video_file, frames_selected=keyframes, output_dir=output_dir,
+                                       frame_type=method, frame_times=frame_times, profile=profile,
+                                       keyframes_only=fast_probe)
+    elif features_file is not None:
+        # Select the keyframes from the features of every frame, decoding the video only if they were not saved
+        features = get_features(ffmpeg_exe, ffprobe_exe, video_file, features_file, frame_index, fast_probe,
+                                analysis_size, profile, window, workers)
+        keyframes = select_keyframes_from_features(features, method, segmenter)
+        if dedup_threshold is not None:
+            keyframes = list(iter_unique_keyframes(ffmpeg_exe, video_file, keyframes, frame_times, dedup_threshold,
+                                                   profile=profile, suppressed=suppressed))
+
+        keyframes_dir = extract_frames(ffmpeg_exe, video_file, frames_selected=keyframes, output_dir=output_dir,
+                                       frame_type="keyframes", frame_times=frame_times, profile=profile)
+    elif (remove_frames_dir and not extract_all_frames) or window is not None or stride > 1 or \
+            scene_threshold is not None:
+        # For the rest of the methods it is necessary to decode all the frames in the video. Stream them from ffmpeg,
+        # without writing them to disk, and extract the keyframes while they are found
+        keyframes = []
+
+        def iter_and_keep(indices):
+            for idx in indices:
+                keyframes.append(idx)
+                yield idx
+
+        keyframes_iter = iter_cached(cache, "keyframes",
+                                     lambda: iter_keyframe_indices(ffmpeg_exe, ffprobe_exe, video_file, method,
+                                                                   iframes, frame_times, workers, analysis_size,
+                                                                   profile, segmenter, window, stride,
+                                                                   scene_threshold),
+                                     method=method, fast_probe=fast_probe, analysis_size=analysis_size,
+                                     decoder=profile.decoder_args(), segmenter=segmenter, window=window,
+                                     stride=stride, scene_threshold=scene_threshold)
+        if dedup_threshold is not None:
+            keyframes_iter = iter_unique_keyframes(ffmpeg_exe, video_file, keyframes_iter, frame_times,
+                                                   dedup_threshold, profile=profile, suppressed=suppressed)
+        keyframes_iter = iter_and_keep(keyframes_iter)
+
+        keyframes_dir = extract_frames(ffmpeg_exe, video_file, frames_selected=keyframes_iter, output_dir=output_dir,
+                                       frame_type="keyframes", frame_times=frame_times, profile=profile)
+
+        # Compute the rest of the keyframes, if they were not extracted (eg.: the output directory is not empty)
+        for _ in keyframes_iter:
+            pass
     else:
-        # For the rest of the methods it is necessary to extract all the frames in the video
         # Extract the frames and store the directory where the frames are saved as a variable
-        frames_dir = extract_frames(ffmpeg_exe, video_file)
+        frames_dir = extract_frames(ffmpeg_exe, video_file, frame_times=frame_times, profile=profile, iframes=iframes,
+                                    workers=workers)
+        frames = read_frames(frames_dir, profile.suffix)
 
         # Extract the keyframes indices
         if method=="color":
-            keyframes = get_keyframes_color(iframes, frames_dir)
+            keyframes = get_keyframes_color(iframes, frames, segmenter)
         elif method == "flow":
-            keyframes = get_keyframes_flow(iframes, frames_dir)
+            keyframes = get_keyframes_flow(iframes, frames, segmenter)
+
+        if dedup_threshold is not None:
+            keyframes = list(iter_unique_keyframes(ffmpeg_exe, video_file, keyframes, frame_times, dedup_threshold,
+                                                   profile=profile, suppressed=suppressed))
+
+        # Move (or link, if the frames directory is kept) the selected keyframes from the frames directory
+        keyframes_dir = copy_keyframes_from_frames(frames_dir, keyframes, name_dir=output_dir,
+                                                   remove_frames_dir=remove_frames_dir, suffix=profile.suffix,
+                                                   background_remove=background_remove)
+
+    # Write the exact timestamp of every keyframe next to the images
+    if manifest is not None and keyframes_dir is not None:
+        write_manifest(keyframes_dir, keyframes, frame_index, profile.suffix, manifest)
+
+    return keyframes
+
+
+async def get_keyframes_async(ffmpeg_exe, ffprobe_exe, video_file, method="iframes", output_dir="keyframes",
+                              fast_probe=False, use_cache=True, analysis_size=None, profile=None,
+                              segmenter="iframes", manifest="json"):
+    """Async version of get_keyframes(), which never blocks the event loop.
+
+    ffprobe and ffmpeg run as async processes, limited by a global semaphore (see set_max_processes()), and the frames
+    are scored in a separate thread (see get_keyframe_indices_async()). If the task is cancelled, the running
+    processes are killed. The frames are always streamed in memory. The fingerprint of the video, the results of the
+    cache and the manifest are read and written in the default executor of the event loop.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path to the video file.
+        method (str): Either "iframes", "color" or "flow".
+        output_dir (str): It can be either a full directory path where the keyframes will be stored, or a string, in
+                          which case, a folder with this name will be created in the same directory of the video and
+                          the keyframes will be saved there.
+        fast_probe (bool): If True, the iframes are read from the keyframe flags of the video packets.
+        use_cache (bool): If True, the results are read from and saved to the persistent cache.
+        analysis_size (int): Maximum width of the frames used to score the shot sequences.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder and of the format of the
+                                            saved keyframes.
+        segmenter (str): Either "iframes" or "content" (see get_keyframes()).
+        manifest (str): Format of the manifest of the keyframes, either "json" or "csv" (see get_keyframes()). If
+                        None, no manifest is saved.
+
+    Returns:
+        list: Indices of the keyframes of the video.
+
+    """
+    if method not in VALID_METHODS:
+        raise ValueError(f"Invalid method '{method}'. Valid methods: {', '.join(VALID_METHODS)}")
+
+    if segmenter not in VALID_SEGMENTERS:
+        raise ValueError(f"Invalid segmenter '{segmenter}'. Valid segmenters: {', '.join(VALID_SEGMENTERS)}")
+
+    if manifest is not None and manifest not in MANIFEST_FORMATS:
+        raise ValueError(f"Invalid manifest format '{manifest}'. Valid formats: {', '.join(MANIFEST_FORMATS)}")
+
+    profile = get_decode_profile(profile)
+    loop = asyncio.get_running_loop()
+    cache = None
+    if use_cache and HAS_NUMPY:
+        # The fingerprint of the video reads the start and the end of the file
+        cache = await loop.run_in_executor(None, VideoCache, video_file)
+
+    # The iframes and the time of every frame come from a single ffprobe pass, as in get_keyframes()
+    frame_index = await probe_video_async(ffprobe_exe, video_file, fast_probe, profile, cache)
+    iframes, frame_times = frame_index.iframes, frame_index.frame_times
+
+    if method == "iframes":
+        keyframes = iframes
+    else:
+        keyframes = await get_cached_async(cache, "keyframes",
+                                           lambda: get_keyframe_indices_async(ffmpeg_exe, ffprobe_exe, video_file,
+                                                                              method, iframes, analysis_size, profile,
+                                                                              segmenter),
+                                           method=method, fast_probe=fast_probe, analysis_size=analysis_size,
+                                           decoder=profile.decoder_args(), segmenter=segmenter, window=None, stride=1,
+                                           scene_threshold=None)
+
+    # Extract the keyframes, only if the output directory is empty
+    if profile.image_format is None:
+        print(f"The decode profile '{profile.name}' doesn't save frames. No keyframes were extracted.")
+        return keyframes
+
+    keyframes_dir = get_output_dir(output_dir, video_file)
+    if any(keyframes_dir.iterdir()):
+        print(f"!!! The output directory '{keyframes_dir.name}' is not empty. No keyframes were extracted. !!!")
+    else:
+        await extract_frames_seeking_async(ffmpeg_exe, video_file, keyframes, frame_times, keyframes_dir, profile,
+                                           keyframes_only=method == "iframes" and fast_probe)
+
+    # Write the exact timestamp of every keyframe next to the images
+    if manifest is not None:
+        await loop.run_in_executor(None, write_manifest, keyframes_dir, keyframes, frame_index, profile.suffix,
+                                   manifest)
+
+    return keyframes
+
+
+def generate_keyframes(ffmpeg_exe, ffprobe_exe, video_file, method="iframes", fast_probe=False, workers=1,
+                       use_cache=True, analysis_size=None, profile=None, segmenter="iframes", start=None,
+                       end=None, stride=1, scene_threshold=None, dedup_threshold=None, features_file=None):
+    """Computes the most relevant frames (keyframes) of the video and yields them as soon as they are found.
+
+    Nothing is written to disk. Every keyframe is decoded at full resolution, seeking directly to it, after its shot
+    sequence has been scored, so the memory used doesn't depend on the length of the video. See get_keyframes() for
+    the description of the methods and the arguments.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path to the video file.
+        method (str): Either "iframes", "color" or "flow".
+        fast_probe (bool): If True, the iframes are read from the keyframe flags of the video packets.
+        workers (int): Number of processes used to score the shot sequences in the "color" and "flow" methods.
+        use_cache (bool): If True, the results are read from and saved to the persistent cache.
+        analysis_size (int): Maximum width of the frames used to score the shot sequences.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder.
+        segmenter (str): Either "iframes" or "content" (see get_keyframes()).
+        start (float): Start time of the window of the video to process, in seconds (see get_keyframes()).
+        end (float): End time of the window of the video to process, in seconds.
+        stride (int): Only one of every stride frames is scored (see get_keyframes()).
+        scene_threshold (float): Minimum scene change score of the frames that are also scored.
+        dedup_threshold (int): Maximum Hamming distance between the perceptual hashes of two near-duplicate keyframes
+                               (see get_keyframes()). By default (None), no keyframe is dropped.
+        features_file (str): Path of the file where the features of every frame are saved or read from (see
+                             get_keyframes()).
+
+    Yields:
+        tuple: Index of the keyframe, its time in seconds (from the start of the video) and its image, in BGR format.
+
+    """
+    if method not in VALID_METHODS:
+        raise ValueError(f"Invalid method '{method}'. Valid methods: {', '.join(VALID_METHODS)}")
+
+    if segmenter not in VALID_SEGMENTERS:
+        raise ValueError(f"Invalid segmenter '{segmenter}'. Valid segmenters: {', '.join(VALID_SEGMENTERS)}")
+
+    profile = get_decode_profile(profile)
+    cache = VideoCache(video_file) if use_cache and HAS_NUMPY else None
+    window = get_window(start, end)
+    frame_index = probe_video(ffprobe_exe, video_file, fast_probe, profile, cache, window)
+    iframes, frame_times = frame_index.iframes, frame_index.frame_times
+    size = get_video_size(ffprobe_exe, video_file)
+
+    if features_file is not None and method != "iframes":
+        features = get_features(ffmpeg_exe, ffprobe_exe, video_file, features_file, frame_index, fast_probe,
+                                analysis_size, profile, window, workers)
+        keyframes = select_keyframes_from_features(features, method, segmenter)
+    else:
+        keyframes = iter_cached(cache, "keyframes",
+                                lambda: iter_keyframe_indices(ffmpeg_exe, ffprobe_exe, video_file, method, iframes,
+                                                              frame_times, workers, analysis_size, profile,
+                                                              segmenter, window, stride, scene_threshold),
+                                method=method, fast_probe=fast_probe, analysis_size=analysis_size,
+                                decoder=profile.decoder_args(), segmenter=segmenter, window=window, stride=stride,
+                                scene_threshold=scene_threshold)
+    if dedup_threshold is not None:
+        keyframes = iter_unique_keyframes(ffmpeg_exe, video_file, keyframes, frame_times, dedup_threshold,
+                                          profile=profile, keyframes_only=method == "iframes" and fast_probe)
+
+    for idx in keyframes:
+        im = decode_frame(ffmpeg_exe, ffprobe_exe, video_file, frame_times[idx], size=size, profile=profile)
+        yield idx, frame_times[idx], im
+
+
+def probe_video(ffprobe_exe, video_file, fast_probe=False, profile=None, cache=None, window=None):
+    """Gets the index of the frames of the video (see probe_frame_index()), from the cache if possible.
+
+    Args:
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path to the video file.
+        fast_probe (bool): If True, the iframes are read from the keyframe flags of the video packets.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder.
+        cache (obj VideoCache): Cache of the video. If None, the results are always computed.
+        window (tuple): Start and end times of the window of the video to probe, in seconds (see get_window()). By
+                        default (None), the whole video.
+
+    Returns:
+        obj FrameIndex: Index of the frames of the video, with their timestamps and picture types.
+
+    """
+    if cache is not None:
+        records = cache.load("frame_index", fast_probe=fast_probe, window=window)
+        header = cache.load("frame_index_header", fast_probe=fast_probe, window=window)
+        if records is not None and header is not None:
+            return FrameIndex.from_arrays(records, header)
+
+    frame_index = probe_frame_index(ffprobe_exe, video_file, fast_probe, profile, window)
+
+    if cache is not None:
+        records, header = frame_index.to_arrays()
+        cache.try_save("frame_index", records, fast_probe=fast_probe, window=window)
+        cache.try_save("frame_index_header", header, fast_probe=fast_probe, window=window)
+
+    return frame_index
+
+
+async def probe_video_async(ffprobe_exe, video_file, fast_probe=False, profile=None, cache=None):
+    """Async version of probe_video(), for the whole video. The results of the cache are read and saved in the
+    default executor of the event loop.
+
+    Returns:
+        obj FrameIndex: Index of the frames of the video, with their timestamps and picture types.
+
+    """
+    loop = asyncio.get_running_loop()
+    if cache is not None:
+        records = await loop.run_in_executor(None, partial(cache.load, "frame_index", fast_probe=fast_probe,
+                                                           window=None))
+        header = await loop.run_in_executor(None, partial(cache.load, "frame_index_header", fast_probe=fast_probe,
+                                                          window=None))
+        if records is not None and header is not None:
+            return FrameIndex.from_arrays(records, header)
+
+    frame_index = await probe_frame_index_async(ffprobe_exe, video_file, fast_probe, profile)
+
+    if cache is not None:
+        records, header = frame_index.to_arrays()
+        await loop.run_in_executor(None, partial(cache.try_save, "frame_index", records, fast_probe=fast_probe,
+                                                 window=None))
+        await loop.run_in_executor(None, partial(cache.try_save, "frame_index_header", header,
+                                                 fast_probe=fast_probe, window=None))
+
+    return frame_index
+
+
+def iter_keyframe_indices(ffmpeg_exe, ffprobe_exe, video_file, method, iframes, frame_times, workers=1,
+                          analysis_size=None, profile=None, segmenter="iframes", window=None, stride=1,
+                          scene_threshold=None):
+    """Computes the indices of the keyframes of the video, streaming the frames, and yields them as soon as every shot
+    sequence has been scored.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path to the video file.
+        method (str): Either "iframes", "color" or "flow".
+        iframes (list): List with all the iframes in the video.
+        frame_times (list): Time of every frame in the video, in seconds.
+        workers (int): Number of processes used to score the shot sequences.
+        analysis_size (int): Maximum width of the frames used to score the shot sequences (see get_analysis_size()).
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile).
+        segmenter (str): Either "iframes" or "content" (see iter_shot_keyframes()). The cuts of the "content"
+                         segmenter are only known while the frames are streamed, so its shots are never scored in
+                         parallel, but the frames are decoded by workers processes (see stream_frames_chunked()).
+        window (tuple): Start and end times of the window of the video to decode, in seconds. The frame times must be
+                        the ones of the window.
+        stride (int): Only one of every stride frames (and every iframe) is decoded and scored (see
+                      stream_sampled_frames()). The sampled frames are never scored in parallel.
+        scene_threshold (float): Minimum scene change score of the frames that are also decoded and scored.
+
+    Yields:
+        int: Index of every keyframe of the video, in order.
+
+    """
+    if method == "iframes":
+        yield from iframes
+        return
+
+    select_keyframe = select_keyframe_color if method == "color" else select_keyframe_flow
+
+    sampled = stride > 1 or scene_threshold is not None
+
+    if workers > 1 and segmenter == "iframes" and not sampled:
+        # Stream the frames of every shot sequence in its own process
+        yield from iter_keyframes_parallel(select_keyframe, ffmpeg_exe, ffprobe_exe, video_file, iframes, frame_times,
+                                           workers, analysis_size, profile)
+    elif sampled:
+        frames = stream_sampled_frames(ffmpeg_exe, ffprobe_exe, video_file, frame_times, stride, scene_threshold,
+                                       window is not None, analysis_size=analysis_size, profile=profile)
+        yield from iter_sampled_shot_keyframes(select_keyframe, iframes, frames, segmenter)
+    else:
+        if workers > 1 and frame_times:
+            # The shots are scored in order, while the frames are decoded by several processes
+            frames = stream_frames_chunked(ffmpeg_exe, ffprobe_exe, video_file, iframes, frame_times, workers,
+                                           analysis_size=analysis_size, profile=profile)
+        elif window is None:
+            frames = stream_frames(ffmpeg_exe, ffprobe_exe, video_file, analysis_size=analysis_size, profile=profile)
+        elif frame_times:
+            # Seek directly to the first frame of the window and decode only the frames of the window
+            frames = stream_frames(ffmpeg_exe, ffprobe_exe, video_file, start_time=frame_times[0],
+                                   n_frames=len(frame_times), analysis_size=analysis_size, profile=profile)
+        else:
+            return
+
+        yield from iter_shot_keyframes(select_keyframe, iframes, frames, segmenter)
+
+
+def get_window(start=None, end=None):
+    """Gets the time window of a video to process.
+
+    Args:
+        start (float): Start time of the window, in seconds. None for the start of the video.
+        end (float): End time of the window, in seconds. None for the end of the video.
+
+    Returns:
+        tuple or None: Start and end times of the window. None if both are None (the whole video).
+
+    """
+    if start is None and end is None:
+        return None
+
+    if start is not None and end is not None and end <= start:
+        raise ValueError(f"The end of the window ({end}) must be after its start ({start})")
 
-        # Copy selected keyframes and remove frames directory (if selected)
-        copy_keyframes_from_frames(frames_dir, keyframes, name_dir=output_dir, remove_frames_dir=remove_frames_dir)
+    return (float(start) if start is not None else None, float(end) if end is not None else None)
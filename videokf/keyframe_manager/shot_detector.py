@@ -0,0 +1,133 @@
+from collections import deque
+
+from videokf.keyframe_manager.frame_manager import calculate_histograms
+from videokf.utils.lazy_import import lazy_import
+
+np = lazy_import("numpy")
+
+
+# Valid segmenters, which split the video into the shot sequences scored by the "color" and "flow" methods
+VALID_SEGMENTERS = ["iframes", "content"]
+
+
+class ShotDetector:
+
+    def __init__(self, window=30, min_threshold=0.3, sensitivity=4., min_shot_length=10, pixel_step=4):
+        """Initializes instance of class ShotDetector, a content-based detector of cuts between shots.
+
+        Every frame is summarized by the color histogram of a subsample of its pixels, and a cut is detected when the
+        distance between the histograms of two consecutive frames is much higher than the usual distance in the
+        current shot. The threshold adapts to the content: it is the mean plus sensitivity times the standard
+        deviation of the distances in the last window frames, and never lower than min_threshold.
+
+        Args:
+            window (int): Number of previous frames used to compute the adaptive threshold.
+            min_threshold (float): Minimum distance between histograms to detect a cut, between 0 and 1.
+            sensitivity (float): Number of standard deviations above the mean distance needed to detect a cut. The
+                                 lower, the more cuts are detected.
+            min_shot_length (int): Minimum number of frames of a shot. Cuts closer to the previous one are ignored
+                                   (eg.: flashes).
+            pixel_step (int): Only one of every pixel_step pixels, in both directions, is used to compute the
+                              histograms.
+
+        """
+        self.min_threshold = min_threshold
+        self.sensitivity = sensitivity
+        self.min_shot_length = min_shot_length
+        self.pixel_step = pixel_step
+        self.distances = deque(maxlen=window)
+        self.prev_histogram = None
+        self.shot_length = 0
+
+    def is_cut(self, im):
+        """Checks if a frame is the first frame of a new shot. The frames must be given in order.
+
+        Args:
+            im (array): Image of the frame, in BGR format.
+
+        Returns:
+            bool: True if there is a cut between the previous frame and this one.
+
+        """
+        return self.is_cut_histogram(calculate_histograms([im[::self.pixel_step, ::self.pixel_step]])[0])
+
+    def is_cut_histogram(self, histogram):
+        """Checks if a frame, given by its color histogram, is the first frame of a new shot (see is_cut()).
+
+        Args:
+            histogram (array): Color histogram of the frame (see calculate_histograms()), with any scale.
+
+        Returns:
+            bool: True if there is a cut between the previous frame and this one.
+
+        """
+        histogram = np.asarray(histogram, dtype=np.float64)
+        histogram = histogram / max(histogram.sum(), 1)
+        prev_histogram, self.prev_histogram = self.prev_histogram, histogram
+
+        if prev_histogram is None:
+            self.shot_length = 1
+            return False
+
+        # Total variation distance, between 0 (same colors) and 1 (no color in common)
+        distance = 0.5 * float(np.abs(histogram - prev_histogram).sum())
+
+        threshold = self.min_threshold
+        if len(self.distances) > 1:
+            threshold = max(threshold, np.mean(self.distances) + self.sensitivity * np.std(self.distances))
+
+        if distance > threshold and self.shot_length >= self.min_shot_length:
+            # The distances of the new shot are not compared with the ones of the previous shot
+            self.distances.clear()
+            self.shot_length = 1
+            return True
+
+        self.distances.append(distance)
+        self.shot_length += 1
+
+        return False
+
+
+def iter_content_shots(frames, detector=None):
+    """Splits a sequence of frames into shot sequences, which start at every cut detected from the content of the
+    frames (see ShotDetector).
+
+    The cuts are detected while the frames are consumed, in a single pass, so, as in iter_shots(), every shot is
+    yielded as a lazy iterator over its frames and only the frames being processed are kept in memory. The frames of
+    a shot that are not consumed are skipped before yielding the next shot.
+
+    Args:
+        frames (iterable): All the frames of the video, in order.
+        detector (obj ShotDetector): Detector of the cuts. By default (None), a detector with the default parameters.
+
+    Yields:
+        tuple: Index of the first frame of the shot and iterator over the frames of the shot.
+
+    """
+    frames = iter(frames)
+    detector = detector or ShotDetector()
+
+    # First frame of the next shot and index of the last frame read
+    state = {"first": next(frames, None), "idx": 0}
+    if state["first"] is not None:
+        detector.is_cut(state["first"])
+
+    def iter_shot():
+        yield state["first"]
+        state["first"] = None
+
+        for im in frames:
+            state["idx"] += 1
+            if detector.is_cut(im):
+                # The frame is the first one of the next shot
+                state["first"] = im
+                return
+
+            yield im
+
+    while state["first"] is not None:
+        shot = iter_shot()
+        yield state["idx"], shot
+
+        for _ in shot:
+            pass
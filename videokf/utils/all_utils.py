@@ -1,7 +1,24 @@
 import os
+import glob
 import shutil
+import threading
 from pathlib import Path
-import requests
+from concurrent.futures import ThreadPoolExecutor
+
+from videokf.utils.lazy_import import lazy_import
+from videokf.utils.profiling import get_files_size, is_profiling, stage
+
+requests = lazy_import("requests")
+
+
+# Extensions of the files considered videos when searching a directory
+VIDEO_EXTENSIONS = [".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v", ".mpg", ".mpeg", ".ts", ".flv", ".wmv"]
+
+# Extensions of the manifest files, which list one video path per line
+MANIFEST_EXTENSIONS = [".txt", ".lst"]
+
+# Number of threads used to copy the keyframes when they can't be linked or moved (eg.: different file systems)
+COPY_WORKERS = 8
 
 
 def make_dir(new_dir, path, exist_ok=True, parents=False):
@@ -23,6 +40,37 @@ def make_dir(new_dir, path, exist_ok=True, parents=False):
     return new_path
 
 
+def find_videos(source):
+    """Finds the videos given by a directory, a glob pattern or a manifest file.
+
+    - Directory: all the files with a video extension (see VIDEO_EXTENSIONS) directly inside the directory.
+    - Manifest file (see MANIFEST_EXTENSIONS): one video path per line. Empty lines and lines starting with '#' are
+      ignored, and relative paths are relative to the directory of the manifest.
+    - Glob pattern: all the files matching the pattern (eg.: 'videos/**/*.mp4').
+    - Any other path is considered a single video.
+
+    Args:
+        source (str): Directory, glob pattern, manifest file or video file.
+
+    Returns:
+        list[str]: Sorted list of video paths (in the manifest order for manifest files).
+
+    """
+    source_path = Path(source)
+
+    if source_path.is_dir():
+        return sorted(str(f) for f in source_path.iterdir() if f.is_file() and f.suffix.lower() in VIDEO_EXTENSIONS)
+
+    if source_path.is_file() and source_path.suffix.lower() in MANIFEST_EXTENSIONS:
+        lines = [line.strip() for line in source_path.read_text().splitlines()]
+        return [str(source_path.parent / line) for line in lines if line and not line.startswith("#")]
+
+    if glob.has_magic(source):
+        return sorted(f for f in glob.glob(source, recursive=True) if Path(f).is_file())
+
+    return [str(source)]
+
+
 def make_frames_list(frames):
     """Creates a string list in the appropriate format for ffmpeg to extract a specific set of frames.
 
@@ -40,10 +88,13 @@ def make_frames_list(frames):
     return f"select='{aux}'"
 
 
-def copy_keyframes_from_frames(frames_dir, keyframes, name_dir="keyframes", remove_frames_dir=True):
+def copy_keyframes_from_frames(frames_dir, keyframes, name_dir="keyframes", remove_frames_dir=True, suffix=".jpg",
+                               copy_workers=COPY_WORKERS, background_remove=False):
     """Copy a set of frames from a folder containing all the frames in a video to a new location.
 
-    The new directory will be located in the same folder of the frames folder.
+    The new directory will be located in the same folder of the frames folder. If the frames folder is removed, the
+    keyframes are moved instead of copied, otherwise they are hardlinked. When that isn't possible (eg.: the
+    directories are in different file systems), the keyframes are copied by a pool of threads.
 
     Args:
         frames_dir (str): Directory containing all the frames of the video (previously extracted).
@@ -51,6 +102,11 @@ def copy_keyframes_from_frames(frames_dir, keyframes, name_dir="keyframes", remo
         name_dir (str): Name of the new directory that will be created to store the keyframes (if it doesn't already
                         exist). By default, it's called "keyframes".
         remove_frames_dir (bool): If True, it removes the folder containing all the frames, after it has been used.
+        suffix (str): Suffix of the frame files.
+        copy_workers (int): Number of threads used to copy the keyframes.
+        background_remove (bool): If True, the folder containing all the frames is removed in a background thread, so
+                                  the function returns as soon as the keyframes are saved. The files that can't be
+                                  removed are reported instead of raising an error (see remove_frames_dir_quietly()).
 
     Returns:
          Directory where the keyframes have been copied.
@@ -61,9 +117,24 @@ def copy_keyframes_from_frames(frames_dir, keyframes, name_dir="keyframes", remo
 
     # Copy keyframes from frames directory, only if destiny directory is empty
     if len(os.listdir(keyframes_dir)) == 0:
-        for i in keyframes:
-            filename = Path(str(i)).with_suffix(".jpg")
-            shutil.copyfile(frames_dir / filename, keyframes_dir / filename)
+        transfer = os.replace if remove_frames_dir else os.link
+
+        def save_keyframe(i):
+            # Frames and keyframes are both saved with their index
+            src = frames_dir / Path(str(i)).with_suffix(suffix)
+            dst = keyframes_dir / Path(str(i)).with_suffix(suffix)
+            try:
+                transfer(src, dst)
+            except OSError:
+                shutil.copyfile(src, dst)
+
+        # A frame can only be moved once, so repeated keyframes are saved once
+        with stage("copy keyframes") as s, ThreadPoolExecutor(max_workers=copy_workers) as executor:
+            keyframes = sorted(set(keyframes))
+            list(executor.map(save_keyframe, keyframes))
+            if is_profiling():
+                s.add(frames=len(keyframes), bytes_written=get_files_size(
+                    keyframes_dir / Path(str(i)).with_suffix(suffix) for i in keyframes))
 
         print("Keyframes successfully extracted.")
     else:
@@ -72,7 +143,28 @@ def copy_keyframes_from_frames(frames_dir, keyframes, name_dir="keyframes", remo
     # Remove frames folder
     if remove_frames_dir:
         print("Removing frames ...")
+        if background_remove:
+            # Not a daemon thread, so the interpreter waits for the removal to finish before exiting
+            threading.Thread(target=remove_frames_dir_quietly, args=(frames_dir,)).start()
+        else:
+            with stage("remove frames"):
+                shutil.rmtree(frames_dir)
+
+    return keyframes_dir
+
+
+def remove_frames_dir_quietly(frames_dir):
+    """Removes the folder containing all the frames of a video, printing the error if it can't be removed, instead of
+    raising it. It is run in a background thread (see copy_keyframes_from_frames()).
+
+    Args:
+        frames_dir (str): Directory containing all the frames of the video.
+
+    """
+    try:
         shutil.rmtree(frames_dir)
+    except OSError as e:
+        print(f"!!! The frames folder '{frames_dir}' could not be removed: {e} !!!")
 
 
 def url_retrieve(url, output_file):
@@ -0,0 +1,291 @@
+import os
+import queue
+import threading
+import subprocess
+import weakref
+from contextlib import asynccontextmanager
+
+from videokf.utils.decode_profile import get_decode_profile
+from videokf.utils.frame_index import FrameIndex, get_frame_index_args, parse_frame_index
+from videokf.utils.lazy_import import lazy_import
+from videokf.utils.vidutils import SEEK_BATCH_SIZE, get_iframes_args, get_packets_args, get_seeking_args, \
+    get_stream_args, get_video_size_args, iter_shot_keyframes, parse_iframes, parse_packets, parse_video_size, \
+    select_keyframe_color, select_keyframe_flow
+
+asyncio = lazy_import("asyncio")
+np = lazy_import("numpy")
+
+
+# Maximum number of ffmpeg and ffprobe processes running at the same time, for all the async extractions
+MAX_PROCESSES = os.cpu_count() or 1
+
+# Maximum number of decoded frames waiting to be scored by get_keyframe_indices_async()
+FRAMES_QUEUE_SIZE = 16
+
+# Semaphore of every event loop that limits the number of processes running at the same time
+_semaphores = weakref.WeakKeyDictionary()
+
+
+def set_max_processes(max_processes):
+    """Sets the maximum number of ffmpeg and ffprobe processes running at the same time in the async functions.
+
+    It only applies to the event loops that haven't started any process yet.
+
+    Args:
+        max_processes (int): Maximum number of processes.
+
+    """
+    global MAX_PROCESSES
+    MAX_PROCESSES = max_processes
+
+
+def get_semaphore():
+    """Gets the semaphore that limits the number of processes running at the same time in the current event loop.
+
+    Returns:
+        obj asyncio.Semaphore: Semaphore of the running event loop.
+
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(MAX_PROCESSES)
+
+    return _semaphores[loop]
+
+
+@asynccontextmanager
+async def open_process(args):
+    """Starts a process with its standard output piped, once the number of running processes is below the limit.
+
+    If the task is cancelled (or fails) while the process is running, the process is killed, and the rest of its
+    output is discarded, so it can be waited for.
+
+    Args:
+        args (list[str]): Arguments of the process.
+
+    Yields:
+        obj asyncio.subprocess.Process: Running process.
+
+    """
+    async with get_semaphore():
+        process = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE)
+        try:
+            yield process
+
+            if await process.wait() != 0:
+                raise subprocess.CalledProcessError(process.returncode, args)
+        finally:
+            if process.returncode is None:
+                process.kill()
+
+                # The pipe is only closed once all the output has been read, and the process can't be waited for
+                # until then
+                await process.stdout.read()
+                await process.wait()
+
+
+async def run_process(args):
+    """Runs a process and returns its standard output (async equivalent of subprocess.check_output()).
+
+    Args:
+        args (list[str]): Arguments of the process.
+
+    Returns:
+        bytes: Standard output of the process.
+
+    """
+    async with open_process(args) as process:
+        output = await process.stdout.read()
+
+    return output
+
+
+async def read_lines(process):
+    """Reads the lines of the standard output of a process as they are written.
+
+    Args:
+        process (obj asyncio.subprocess.Process): Running process.
+
+    Returns:
+        list[str]: Lines of the standard output.
+
+    """
+    lines = []
+    async for line in process.stdout:
+        lines.append(line.decode("utf8"))
+
+    return lines
+
+
+async def get_video_size_async(ffprobe_exe, video_file):
+    """Async version of get_video_size()."""
+    return parse_video_size((await run_process(get_video_size_args(ffprobe_exe, video_file))).decode("utf8"))
+
+
+async def get_iframes_async(ffprobe_exe, video_file, fast=False, profile=None):
+    """Async version of get_iframes(). The output of ffprobe is read while it is running.
+
+    Args:
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video from which to get the iframe indices.
+        fast (bool): If True, the iframes are read from the keyframe flags of the packets, without decoding the video.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder. Only used if fast is False.
+
+    Returns:
+        list: List of iframes in the video.
+
+    """
+    if fast:
+        packets, _, _ = await probe_packets_async(ffprobe_exe, video_file)
+        return [i for i, (_, is_keyframe) in enumerate(packets) if is_keyframe]
+
+    async with open_process(get_iframes_args(ffprobe_exe, video_file, profile)) as process:
+        lines = await read_lines(process)
+
+    return parse_iframes(lines)
+
+
+async def probe_packets_async(ffprobe_exe, video_file):
+    """Async version of probe_packets(). The output of ffprobe is read while it is running."""
+    async with open_process(get_packets_args(ffprobe_exe, video_file)) as process:
+        lines = await read_lines(process)
+
+    return parse_packets(lines)
+
+
+async def probe_frame_index_async(ffprobe_exe, video_file, fast=False, profile=None):
+    """Async version of probe_frame_index(), for the whole video. The output of ffprobe is read while it is running.
+
+    Args:
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+        fast (bool): If True, only the packets of the video are read, without decoding it.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder. Only used if fast is False.
+
+    Returns:
+        obj FrameIndex: Index of the frames.
+
+    """
+    if fast:
+        packets, time_base, start_time = await probe_packets_async(ffprobe_exe, video_file)
+        return FrameIndex([timestamp for timestamp, _ in packets],
+                          ["I" if is_keyframe else "?" for _, is_keyframe in packets], time_base, start_time)
+
+    async with open_process(get_frame_index_args(ffprobe_exe, video_file, profile)) as process:
+        lines = await read_lines(process)
+
+    frames, time_base, start_time = parse_frame_index(lines)
+
+    return FrameIndex([timestamp for timestamp, _ in frames], [pict_type for _, pict_type in frames], time_base,
+                      start_time)
+
+
+async def get_frame_times_async(ffprobe_exe, video_file):
+    """Async version of get_frame_times()."""
+    packets, time_base, start_time = await probe_packets_async(ffprobe_exe, video_file)
+
+    return [float(timestamp * time_base) - start_time for timestamp, _ in packets]
+
+
+async def extract_frames_seeking_async(ffmpeg_exe, video_file, frames_selected, frame_times, frames_dir, profile=None,
+                                       keyframes_only=False, batch_size=SEEK_BATCH_SIZE):
+    """Async version of extract_frames_seeking(). Every batch of frames is extracted by its own ffmpeg process, and
+    the batches run concurrently (up to the maximum number of processes).
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        video_file (str): Path of the video from which to extract the frames.
+        frames_selected (list): Indices of the frames to extract.
+        frame_times (list): Time of every frame in the video, in seconds (see get_frame_times()).
+        frames_dir (Path): Directory where the frames will be stored.
+        profile (str or obj DecodeProfile): Decode profile (see DecodeProfile).
+        keyframes_only (bool): If True, all the selected frames are keyframes.
+        batch_size (int): Maximum number of frames extracted by a single ffmpeg process.
+
+    """
+    profile = get_decode_profile(profile)
+    frames_selected = sorted(set(frames_selected))
+
+    await asyncio.gather(*[run_process(get_seeking_args(ffmpeg_exe, video_file, frames_selected[b:b + batch_size],
+                                                        frame_times, frames_dir, profile, keyframes_only))
+                           for b in range(0, len(frames_selected), batch_size)])
+
+
+async def get_keyframe_indices_async(ffmpeg_exe, ffprobe_exe, video_file, method, iframes, analysis_size=None,
+                                     profile=None, segmenter="iframes"):
+    """Async version of get_keyframes_color() and get_keyframes_flow(), streaming the frames from ffmpeg.
+
+    The frames are read from ffmpeg in the event loop and scored in a separate thread, so the event loop is never
+    blocked. If the task is cancelled, or the scoring fails, ffmpeg is killed and the scoring stops.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path to the video file.
+        method (str): Either "color" or "flow".
+        iframes (list): List with all the iframes in the video.
+        analysis_size (int): Maximum width of the frames used to score the shot sequences (see get_analysis_size()).
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile).
+        segmenter (str): Either "iframes" or "content" (see iter_shot_keyframes()).
+
+    Returns:
+        list: Indices of the keyframes of the video.
+
+    """
+    select_keyframe = select_keyframe_color if method == "color" else select_keyframe_flow
+    size = await get_video_size_async(ffprobe_exe, video_file)
+    ffmpeg_args, (width, height) = get_stream_args(ffmpeg_exe, video_file, size, analysis_size=analysis_size,
+                                                   profile=profile)
+    frame_size = width * height * 3
+
+    frames_queue = queue.Queue(maxsize=FRAMES_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def iter_queued_frames():
+        while True:
+            try:
+                frame = frames_queue.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return
+                continue
+
+            yield frame
+
+    def score_frames():
+        frames = iter_queued_frames()
+        keyframes = list(iter_shot_keyframes(select_keyframe, iframes, frames, segmenter))
+
+        # Consume the frames after the last shot until the reading stops (at the end of the video, or when the task is
+        # cancelled), so that the reading of the frames is never blocked by a full queue
+        for _ in frames:
+            pass
+
+        return keyframes
+
+    loop = asyncio.get_running_loop()
+    scoring = loop.run_in_executor(None, score_frames)
+    try:
+        async with open_process(ffmpeg_args) as process:
+            while True:
+                try:
+                    buffer = await process.stdout.readexactly(frame_size)
+                except asyncio.IncompleteReadError:
+                    break
+
+                frame = np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+                while frames_queue.full() and not scoring.done():
+                    # Wait for the scoring thread, without blocking the event loop
+                    await asyncio.sleep(0.005)
+
+                if scoring.done():
+                    # The scoring stopped before the last frame, so it failed. Its error is raised here, inside the
+                    # context of the process, so that ffmpeg (blocked writing the next frames) is killed instead of
+                    # waited for
+                    scoring.result()
+                frames_queue.put_nowait(frame)
+    finally:
+        # Let the scoring thread finish, either after the last frame or because the task was cancelled
+        stop.set()
+
+    return await scoring
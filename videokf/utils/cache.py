@@ -0,0 +1,302 @@
+import os
+import json
+import hashlib
+import importlib.util
+from functools import partial
+from pathlib import Path
+
+from videokf.utils.lazy_import import lazy_import
+
+asyncio = lazy_import("asyncio")
+np = lazy_import("numpy")
+
+
+# Maximum total size of the cache, in bytes. The least recently used entries are removed when it is exceeded
+CACHE_MAX_SIZE = 256 * 1024 ** 2
+
+# Number of bytes read from the start and the end of a video to compute its fingerprint
+FINGERPRINT_CHUNK_SIZE = 1024 ** 2
+
+# The results are stored as NumPy files, so there is no cache if NumPy is not installed
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+# Version of the results. Increasing it invalidates the results computed by previous versions of the library, so it
+# must be increased whenever the keyframes selected for the same video and parameters change
+CACHE_VERSION = 3
+
+
+class VideoCache:
+
+    def __init__(self, video_file, cache_dir=None, max_size=CACHE_MAX_SIZE):
+        """Initializes instance of class VideoCache, the persistent cache of the results computed for a video.
+
+        Every result is stored in its own binary file (.npy), named by a hash of the fingerprint of the video (see
+        video_fingerprint()), the name of the result and the parameters used to compute it. Modifying the video
+        changes its fingerprint, so results of previous versions of the video are never returned.
+
+        Args:
+            video_file (str): Path of the video.
+            cache_dir (str): Directory where the results are stored. By default (None), it is the directory given by
+                             the environmental variable VIDEOKF_CACHE_DIR or, if it doesn't exist, a folder called
+                             'videokf' in the user cache directory.
+            max_size (int): Maximum total size of the cache directory, in bytes.
+
+        """
+        self.cache_dir = Path(cache_dir or get_default_cache_dir())
+        self.max_size = max_size
+        self.fingerprint = video_fingerprint(video_file)
+
+    def get_file(self, name, **params):
+        """Gets the file where a result is stored.
+
+        Args:
+            name (str): Name of the result (eg.: 'iframes').
+            **params: Parameters used to compute the result.
+
+        Returns:
+            Path: File of the result.
+
+        """
+        key = json.dumps([CACHE_VERSION, self.fingerprint, name, sorted(params.items())])
+
+        return (self.cache_dir / hashlib.sha1(key.encode("utf8")).hexdigest()).with_suffix(".npy")
+
+    def load(self, name, **params):
+        """Loads a result from the cache.
+
+        Args:
+            name (str): Name of the result.
+            **params: Parameters used to compute the result.
+
+        Returns:
+            array or None: Result stored in the cache. None if it is not in the cache.
+
+        """
+        cache_file = self.get_file(name, **params)
+        try:
+            with cache_file.open("rb") as f:
+                result = np.load(f, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+        # Mark the result as recently used
+        try:
+            os.utime(cache_file)
+        except OSError:
+            pass
+
+        return result
+
+    def save(self, name, result, **params):
+        """Saves a result in the cache, removing the least recently used results if the cache is too big.
+
+        Args:
+            name (str): Name of the result.
+            result (array or list): Result to save.
+            **params: Parameters used to compute the result.
+
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        cache_file = self.get_file(name, **params)
+
+        # Write the result to a temporary file first, so that other processes never read a partial result
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+        with tmp_file.open("wb") as f:
+            np.save(f, np.asarray(result), allow_pickle=False)
+        tmp_file.replace(cache_file)
+
+        evict_cache(self.cache_dir, self.max_size)
+
+    def get(self, name, compute, **params):
+        """Gets a result from the cache or, if it is not there, computes it and saves it in the cache.
+
+        Args:
+            name (str): Name of the result.
+            compute (function): Function without arguments that computes the result, as a list.
+            **params: Parameters used to compute the result.
+
+        Returns:
+            list: Result.
+
+        """
+        result = self.load(name, **params)
+        if result is not None:
+            return result.tolist()
+
+        result = compute()
+        self.try_save(name, result, **params)
+
+        return result
+
+    def iter(self, name, compute, **params):
+        """Yields the elements of a result from the cache or, if it is not there, computes them lazily and saves the
+        whole result in the cache once all of them have been computed.
+
+        Args:
+            name (str): Name of the result.
+            compute (function): Function without arguments that returns an iterator over the elements of the result.
+            **params: Parameters used to compute the result.
+
+        Yields:
+            Elements of the result, in order.
+
+        """
+        result = self.load(name, **params)
+        if result is not None:
+            yield from result.tolist()
+            return
+
+        result = []
+        for element in compute():
+            result.append(element)
+            yield element
+
+        self.try_save(name, result, **params)
+
+    def try_save(self, name, result, **params):
+        """Saves a result in the cache (see save()), only printing a message if it can't be saved.
+
+        Args:
+            name (str): Name of the result.
+            result (array or list): Result to save.
+            **params: Parameters used to compute the result.
+
+        """
+        try:
+            self.save(name, result, **params)
+        except OSError as e:
+            # The results are still valid if the cache can't be written (eg.: read only file system)
+            print(f"!!! The result '{name}' could not be saved in the cache: {e} !!!")
+
+
+def get_cached(cache, name, compute, **params):
+    """Gets a result from a cache, or computes it if there is no cache (see VideoCache.get()).
+
+    Args:
+        cache (obj VideoCache or None): Cache of the video. If None, the result is always computed.
+        name (str): Name of the result.
+        compute (function): Function without arguments that computes the result, as a list.
+        **params: Parameters used to compute the result.
+
+    Returns:
+        list: Result.
+
+    """
+    if cache is None:
+        return compute()
+
+    return cache.get(name, compute, **params)
+
+
+async def get_cached_async(cache, name, compute, **params):
+    """Async version of get_cached(), where compute is a function without arguments that returns an awaitable.
+
+    The result is read from and saved to the cache in the default executor of the event loop, so the event loop is
+    never blocked by the file system.
+
+    Args:
+        cache (obj VideoCache or None): Cache of the video. If None, the result is always computed.
+        name (str): Name of the result.
+        compute (function): Function without arguments that returns an awaitable with the result, as a list.
+        **params: Parameters used to compute the result.
+
+    Returns:
+        list: Result.
+
+    """
+    loop = asyncio.get_running_loop()
+    if cache is not None:
+        result = await loop.run_in_executor(None, partial(cache.load, name, **params))
+        if result is not None:
+            return result.tolist()
+
+    result = await compute()
+    if cache is not None:
+        await loop.run_in_executor(None, partial(cache.try_save, name, result, **params))
+
+    return result
+
+
+def iter_cached(cache, name, compute, **params):
+    """Yields the elements of a result from a cache, or computes them if there is no cache (see VideoCache.iter()).
+
+    Args:
+        cache (obj VideoCache or None): Cache of the video. If None, the result is always computed.
+        name (str): Name of the result.
+        compute (function): Function without arguments that returns an iterator over the elements of the result.
+        **params: Parameters used to compute the result.
+
+    Returns:
+        iterator: Elements of the result, in order.
+
+    """
+    if cache is None:
+        return iter(compute())
+
+    return cache.iter(name, compute, **params)
+
+
+def video_fingerprint(video_file):
+    """Computes a fingerprint that identifies the content of a video, without reading the whole file.
+
+    The fingerprint is a hash of the size and the modification time of the file and of its first and last bytes.
+
+    Args:
+        video_file (str): Path of the video.
+
+    Returns:
+        str: Fingerprint of the video.
+
+    """
+    st = os.stat(video_file)
+    fingerprint = hashlib.sha1(f"{st.st_size},{st.st_mtime_ns}".encode("utf8"))
+
+    with open(video_file, "rb") as f:
+        fingerprint.update(f.read(FINGERPRINT_CHUNK_SIZE))
+        f.seek(max(st.st_size - FINGERPRINT_CHUNK_SIZE, 0))
+        fingerprint.update(f.read(FINGERPRINT_CHUNK_SIZE))
+
+    return fingerprint.hexdigest()
+
+
+def evict_cache(cache_dir, max_size):
+    """Removes the least recently used files of a cache directory until its total size is not bigger than max_size.
+
+    Args:
+        cache_dir (Path): Cache directory.
+        max_size (int): Maximum total size of the cache directory, in bytes.
+
+    """
+    cache_files = []
+    for cache_file in Path(cache_dir).glob("*.npy"):
+        try:
+            cache_files.append((cache_file.stat(), cache_file))
+        except OSError:
+            # Removed by another process
+            continue
+
+    total_size = sum(st.st_size for st, _ in cache_files)
+    for st, cache_file in sorted(cache_files, key=lambda item: item[0].st_mtime):
+        if total_size <= max_size:
+            break
+
+        try:
+            cache_file.unlink()
+        except OSError:
+            pass
+        total_size -= st.st_size
+
+
+def get_default_cache_dir():
+    """Gets the default directory of the cache.
+
+    Returns:
+        Path: Directory given by the environmental variable VIDEOKF_CACHE_DIR or, if it doesn't exist, a folder called
+              'videokf' in the user cache directory.
+
+    """
+    cache_dir = os.environ.get("VIDEOKF_CACHE_DIR")
+    if cache_dir:
+        return Path(cache_dir)
+
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "videokf"
@@ -0,0 +1,108 @@
+class DecodeProfile:
+
+    def __init__(self, name="custom", threads=None, skip_loop_filter=None, skip_frame=None, image_format="jpg",
+                 quality=1):
+        """Initializes instance of class DecodeProfile, the set of ffmpeg options used to decode and save frames.
+
+        Args:
+            name (str): Name of the profile.
+            threads (int): Number of threads used by the decoder (-threads). 0 lets the decoder choose it. By default
+                           (None), the ffmpeg default is used.
+            skip_loop_filter (str): Frames for which the decoder skips the loop (deblocking) filter (-skip_loop_filter),
+                                    eg.: 'all' or 'nokey'. It speeds up the decoding at the cost of blocking artifacts.
+            skip_frame (str): Frames that the decoder skips (-skip_frame), eg.: 'nokey'. It is only applied when
+                              extracting frames that are known to be keyframes, since it changes which frames are
+                              decoded.
+            image_format (str): Format of the saved frames: 'jpg', 'png' or 'webp'. If None, no frames are saved (only
+                                the keyframe indices are computed).
+            quality (int): Quality of the saved frames. For 'jpg', the lower the number, the higher the quality (1 to
+                           31). For 'webp', the higher the number, the higher the quality (0 to 100). For 'png', which
+                           is lossless, it is the compression level (0 to 9).
+
+        """
+        self.name = name
+        self.threads = threads
+        self.skip_loop_filter = skip_loop_filter
+        self.skip_frame = skip_frame
+        self.image_format = image_format
+        self.quality = quality
+
+    def __repr__(self):
+        return f"DecodeProfile(name={self.name!r}, threads={self.threads!r}, " \
+               f"skip_loop_filter={self.skip_loop_filter!r}, skip_frame={self.skip_frame!r}, " \
+               f"image_format={self.image_format!r}, quality={self.quality!r})"
+
+    @property
+    def suffix(self):
+        """str: Suffix of the saved frames (eg.: '.jpg'). Frames are saved as .jpg if image_format is None."""
+        return f".{self.image_format or 'jpg'}"
+
+    def decoder_args(self, keyframes_only=False):
+        """Gets the ffmpeg (or ffprobe) options of the decoder. They must be placed before the input (-i).
+
+        Args:
+            keyframes_only (bool): If True, the frames to decode are keyframes, so skip_frame is also applied.
+
+        Returns:
+            list[str]: Options of the decoder.
+
+        """
+        args = []
+        if self.threads is not None:
+            args += ["-threads", str(self.threads)]
+        if self.skip_loop_filter is not None:
+            args += ["-skip_loop_filter", self.skip_loop_filter]
+        if keyframes_only and self.skip_frame is not None:
+            args += ["-skip_frame", self.skip_frame]
+
+        return args
+
+    def encoder_args(self):
+        """Gets the ffmpeg options of the encoder of the saved frames. They must be placed before the output file.
+
+        Returns:
+            list[str]: Options of the encoder.
+
+        """
+        if self.image_format == "png":
+            return ["-compression_level", str(self.quality)]
+        elif self.image_format == "webp":
+            return ["-quality", str(self.quality)]
+
+        return ["-q:v", str(self.quality)]
+
+
+# Preset profiles
+DECODE_PROFILES = {
+    # ffmpeg defaults and the highest quality JPEG
+    "default": DecodeProfile("default"),
+    # Fastest decoding and small JPEG files, for quick previews
+    "fast-preview": DecodeProfile("fast-preview", threads=0, skip_loop_filter="all", skip_frame="nokey", quality=5),
+    # Lossless PNG files
+    "archival": DecodeProfile("archival", threads=0, image_format="png", quality=3),
+    # Fastest decoding and no saved frames, when only the keyframe indices are needed
+    "analysis-only": DecodeProfile("analysis-only", threads=0, skip_loop_filter="all", image_format=None),
+}
+
+
+def get_decode_profile(profile=None):
+    """Gets a decode profile from its name.
+
+    Args:
+        profile (str or obj DecodeProfile): Name of a preset profile (see DECODE_PROFILES) or a profile. By default
+                                            (None), the 'default' profile.
+
+    Returns:
+        obj DecodeProfile: Decode profile.
+
+    """
+    if profile is None:
+        return DECODE_PROFILES["default"]
+
+    if isinstance(profile, DecodeProfile):
+        return profile
+
+    if profile not in DECODE_PROFILES:
+        raise ValueError(f"Invalid decode profile '{profile}'. Valid profiles: {', '.join(DECODE_PROFILES)}")
+
+    return DECODE_PROFILES[profile]
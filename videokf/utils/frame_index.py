@@ -0,0 +1,197 @@
+import csv
+import json
+import subprocess
+from array import array
+from fractions import Fraction
+from pathlib import Path
+
+from videokf.utils.decode_profile import get_decode_profile
+from videokf.utils.lazy_import import lazy_import
+from videokf.utils.profiling import timed
+from videokf.utils.vidutils import crop_packets, get_read_intervals_args, get_video_start_time, probe_packets
+
+np = lazy_import("numpy")
+
+
+# Formats of the keyframe manifest (see write_manifest())
+MANIFEST_FORMATS = ["json", "csv"]
+
+
+class FrameIndex:
+
+    def __init__(self, pts, pict_types, time_base=Fraction(1), start_time=0.0):
+        """Initializes instance of class FrameIndex, the index of every frame of a video, in presentation order.
+
+        Every frame is identified by its index, its presentation timestamp (in units of the time base of the stream)
+        and its picture type, stored in compact arrays of the standard library (8 bytes per timestamp and 1 byte per
+        picture type), so the index doesn't need NumPy. The time of every frame, used to seek directly to it, is
+        derived from its timestamp, so the frames are correct in variable frame rate videos.
+
+        Args:
+            pts (iterable[int]): Presentation timestamp of every frame.
+            pict_types (iterable[str or bytes]): Picture type of every frame ("I", "P", "B" or "?" if it is not
+                                                 known).
+            time_base (Fraction): Time base of the timestamps, in seconds.
+            start_time (float): Start time of the video, in seconds. The times of the frames are relative to it.
+
+        """
+        self.pts = array("q", (int(timestamp) for timestamp in pts))
+        self.pict_types = b"".join((pict_type if isinstance(pict_type, bytes) else str(pict_type).encode("ascii"))[:1]
+                                   or b"?" for pict_type in pict_types)
+        self.time_base = Fraction(time_base)
+        self.start_time = float(start_time)
+        self.times = array("d", (float(timestamp * self.time_base) - self.start_time for timestamp in self.pts))
+
+    def __len__(self):
+        return len(self.pts)
+
+    @property
+    def iframes(self):
+        """list: Indices of the iframes."""
+        return [i for i, pict_type in enumerate(self.pict_types) if pict_type == ord("I")]
+
+    @property
+    def frame_times(self):
+        """list: Time of every frame, relative to the start of the video, in seconds."""
+        return self.times.tolist()
+
+    def to_arrays(self):
+        """Converts the index to NumPy arrays, to be stored in the cache (see from_arrays()).
+
+        Returns:
+            tuple(array): Timestamp and picture type of every frame (structured array) and the numerator and
+                          denominator of the time base and the start time of the video.
+
+        """
+        records = np.empty(len(self), dtype=[("pts", np.int64), ("pict_type", "S1")])
+        records["pts"] = np.frombuffer(self.pts, dtype=np.int64) if len(self) else []
+        records["pict_type"] = np.frombuffer(self.pict_types, dtype="S1") if len(self) else []
+        header = np.array([self.time_base.numerator, self.time_base.denominator, self.start_time], dtype=np.float64)
+
+        return records, header
+
+    @classmethod
+    def from_arrays(cls, records, header):
+        """Creates an index from the arrays returned by to_arrays().
+
+        Returns:
+            obj FrameIndex: Index of the frames.
+
+        """
+        time_base = Fraction(int(header[0]), int(header[1]))
+
+        return cls(records["pts"].tolist(), records["pict_type"].tolist(), time_base, float(header[2]))
+
+
+@timed("probe frames")
+def probe_frame_index(ffprobe_exe, video_file, fast=False, profile=None, window=None):
+    """Gets the index of every frame of a video (timestamp and picture type) with a single ffprobe pass.
+
+    By default, all the frames of the video are decoded by ffprobe to read their timestamp and picture type. If fast
+    is True, only the packets of the video are read (see probe_packets()): the frames flagged as keyframes are given
+    the picture type "I" and the rest of them "?".
+
+    Args:
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+        fast (bool): If True, only the packets of the video are read, without decoding it.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile). Only
+                                            used if fast is False.
+        window (tuple): Start and end times of the window, in seconds (any of them can be None). By default (None),
+                        the whole video. The frames are indexed from the first frame of the window.
+
+    Returns:
+        obj FrameIndex: Index of the frames.
+
+    """
+    if fast:
+        packets, time_base, start_time = probe_packets(ffprobe_exe, video_file, window)
+        return FrameIndex([timestamp for timestamp, _ in packets],
+                          ["I" if is_keyframe else "?" for _, is_keyframe in packets], time_base, start_time)
+
+    read_intervals_args = None
+    if window is not None:
+        read_intervals_args = get_read_intervals_args(window, get_video_start_time(ffprobe_exe, video_file))
+
+    ffprobe_output = subprocess.check_output(get_frame_index_args(ffprobe_exe, video_file, profile,
+                                                                  read_intervals_args))
+    frames, time_base, start_time = parse_frame_index(ffprobe_output.decode("utf8").splitlines())
+
+    if window is not None:
+        # ffprobe starts reading at the keyframe preceding the window
+        frames = crop_packets(frames, time_base, start_time, window)
+
+    return FrameIndex([timestamp for timestamp, _ in frames], [pict_type for _, pict_type in frames], time_base,
+                      start_time)
+
+
+def get_frame_index_args(ffprobe_exe, video_file, profile=None, read_intervals_args=None):
+    """Gets the ffprobe arguments to read the timestamp and the picture type of every frame of a video (see
+    probe_frame_index())."""
+    return [ffprobe_exe] + get_decode_profile(profile).decoder_args() + ["-i", video_file] + \
+           (read_intervals_args or []) + \
+           ["-loglevel", "error", "-select_streams", "v:0", "-show_frames", "-show_entries",
+            "frame=best_effort_timestamp,pict_type:stream=time_base:format=start_time", "-of", "csv"]
+
+
+def parse_frame_index(lines):
+    """Parses the frames of a video from the output of ffprobe (see get_frame_index_args()).
+
+    Args:
+        lines (iterable[str]): Lines of the ffprobe output.
+
+    Returns:
+        tuple: List of frames, in presentation order, as tuples (timestamp, picture type), the time base of the
+               timestamps (Fraction) and the start time of the video, in seconds.
+
+    """
+    frames = []
+    time_base = Fraction(1)
+    start_time = 0.0
+    for line in lines:
+        section, *fields = line.strip().split(",")
+        if section == "stream":
+            time_base = Fraction(fields[0])
+        elif section == "format":
+            start_time = float(fields[0]) if fields[0] != "N/A" else 0.0
+        elif section == "frame" and len(fields) >= 2:
+            # Frames without timestamp are placed after the previous frame
+            timestamp = int(fields[0]) if fields[0] != "N/A" else (frames[-1][0] + 1 if frames else 0)
+            frames.append((timestamp, fields[1].strip() or "?"))
+
+    return frames, time_base, start_time
+
+
+def write_manifest(keyframes_dir, keyframes, frame_index, suffix=".jpg", manifest_format="json"):
+    """Writes a manifest of the keyframes next to their images, with the exact timestamp of every keyframe.
+
+    Args:
+        keyframes_dir (str): Directory where the keyframes are saved.
+        keyframes (list): Indices of the keyframes.
+        frame_index (obj FrameIndex): Index of the frames of the video.
+        suffix (str): Suffix of the keyframe files.
+        manifest_format (str): Either "json" or "csv".
+
+    Returns:
+        Path: Manifest file ('keyframes.json' or 'keyframes.csv').
+
+    """
+    keyframes_dir = Path(keyframes_dir)
+    rows = []
+    for idx in sorted(set(keyframes)):
+        keyframe_file = Path(str(idx)).with_suffix(suffix)
+        rows.append({"index": idx, "pts": int(frame_index.pts[idx]), "time_base": str(frame_index.time_base),
+                     "time": float(frame_index.times[idx]),
+                     "pict_type": chr(frame_index.pict_types[idx]),
+                     "file": keyframe_file.name if (keyframes_dir / keyframe_file).is_file() else None})
+
+    manifest_file = keyframes_dir / f"keyframes.{manifest_format}"
+    if manifest_format == "csv":
+        with manifest_file.open("w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["index", "pts", "time_base", "time", "pict_type", "file"])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        manifest_file.write_text(json.dumps(rows, indent=2))
+
+    return manifest_file
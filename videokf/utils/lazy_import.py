@@ -0,0 +1,44 @@
+import importlib
+
+
+class LazyModule:
+
+    def __init__(self, name):
+        """Initializes instance of class LazyModule, a module that is only imported the first time one of its
+        attributes is used.
+
+        Heavy modules (eg.: numpy or cv2) are imported this way, so importing videokf is fast and the code paths that
+        don't need them (eg.: the "iframes" method) work with only the standard library.
+
+        Args:
+            name (str): Name of the module.
+
+        """
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        status = "imported" if self._module is not None else "not imported yet"
+        return f"<lazy module '{self._name}' ({status})>"
+
+
+def lazy_import(name):
+    """Gets a module that is only imported the first time one of its attributes is used (see LazyModule).
+
+    Example:
+        np = lazy_import("numpy")
+
+    Args:
+        name (str): Name of the module.
+
+    Returns:
+        obj LazyModule: Module.
+
+    """
+    return LazyModule(name)
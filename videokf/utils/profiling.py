@@ -0,0 +1,272 @@
+import sys
+import json
+import time
+import threading
+from pathlib import Path
+from functools import wraps
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where the CPU time of the child processes and the peak memory are not measured
+    resource = None
+
+
+# If False, the stages are not measured (see enable_profiling())
+_enabled = False
+
+# Statistics of every stage, by name
+_stats = {}
+_lock = threading.Lock()
+
+
+class StageStats:
+
+    def __init__(self):
+        """Initializes instance of class StageStats, the accumulated statistics of a stage of the extraction."""
+        self.calls = 0
+        self.wall_time = 0.
+        self.cpu_time = 0.
+        self.frames = 0
+        self.dropped = 0
+        self.bytes_written = 0
+        self.peak_rss = None
+
+    def to_dict(self):
+        """Gets the statistics as a dictionary.
+
+        Returns:
+            dict: Statistics of the stage.
+
+        """
+        return {"calls": self.calls, "wall_time": self.wall_time, "cpu_time": self.cpu_time, "frames": self.frames,
+                "dropped": self.dropped, "bytes_written": self.bytes_written, "peak_rss": self.peak_rss}
+
+
+class Stage:
+
+    def __init__(self, name):
+        """Initializes instance of class Stage, a context manager that measures one run of a stage of the extraction.
+
+        It measures the wall time, the CPU time (including the child processes that finished during the stage, eg.:
+        ffmpeg) and the peak memory of the process. The number of frames processed, of frames dropped (eg.:
+        near-duplicate keyframes) and of bytes written are given with add().
+
+        Args:
+            name (str): Name of the stage.
+
+        """
+        self.name = name
+        self.frames = 0
+        self.dropped = 0
+        self.bytes_written = 0
+
+    def __enter__(self):
+        self.start_wall = time.perf_counter()
+        self.start_cpu = get_cpu_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        wall_time = time.perf_counter() - self.start_wall
+        cpu_time = get_cpu_time() - self.start_cpu
+        peak_rss = get_peak_rss()
+
+        with _lock:
+            stats = _stats.setdefault(self.name, StageStats())
+            stats.calls += 1
+            stats.wall_time += wall_time
+            stats.cpu_time += cpu_time
+            stats.frames += self.frames
+            stats.dropped += self.dropped
+            stats.bytes_written += self.bytes_written
+            if peak_rss is not None:
+                stats.peak_rss = max(stats.peak_rss or 0, peak_rss)
+
+    def add(self, frames=0, bytes_written=0, dropped=0):
+        """Adds frames processed, bytes written and frames dropped to the stage.
+
+        Args:
+            frames (int): Number of frames processed.
+            bytes_written (int): Number of bytes written.
+            dropped (int): Number of frames dropped (eg.: near-duplicate keyframes).
+
+        """
+        self.frames += frames
+        self.bytes_written += bytes_written
+        self.dropped += dropped
+
+
+class NullStage:
+    """Stage that measures nothing, used when profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def add(self, frames=0, bytes_written=0, dropped=0):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+def stage(name):
+    """Gets a context manager that measures a stage of the extraction, if profiling is enabled.
+
+    Example:
+        with stage("decode frames") as s:
+            ...
+            s.add(frames=1)
+
+    Args:
+        name (str): Name of the stage. The runs of stages with the same name are accumulated.
+
+    Returns:
+        obj Stage or obj NullStage: Context manager of the stage. If profiling is disabled, a shared stage that does
+                                    nothing.
+
+    """
+    return Stage(name) if _enabled else NULL_STAGE
+
+
+def timed(name):
+    """Decorator that measures every call to a function as a stage of the extraction, if profiling is enabled.
+
+    For generator functions, only the creation of the generator is measured, so use stage() inside them instead.
+
+    Args:
+        name (str): Name of the stage.
+
+    Returns:
+        function: Decorator.
+
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            with Stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enable_profiling(enabled=True):
+    """Enables (or disables) the measurement of the stages of the extraction.
+
+    Only the stages run by the current process are measured (eg.: not the shots scored by the worker processes).
+
+    Args:
+        enabled (bool): If True, the stages are measured.
+
+    """
+    global _enabled
+    _enabled = enabled
+
+
+def is_profiling():
+    """Checks if the stages of the extraction are being measured.
+
+    Returns:
+        bool: True if profiling is enabled.
+
+    """
+    return _enabled
+
+
+def get_stats():
+    """Gets the statistics of all the stages measured.
+
+    Returns:
+        dict: Statistics of every stage (see StageStats.to_dict()), by name, in the order they were first run.
+
+    """
+    with _lock:
+        return {name: stats.to_dict() for name, stats in _stats.items()}
+
+
+def reset_stats():
+    """Removes the statistics of all the stages measured."""
+    with _lock:
+        _stats.clear()
+
+
+def format_stats(stats, output_format="table"):
+    """Formats the statistics of the stages to be printed.
+
+    Args:
+        stats (dict): Statistics of every stage (see get_stats()).
+        output_format (str): Either "table" or "json".
+
+    Returns:
+        str: Formatted statistics.
+
+    """
+    if output_format == "json":
+        return json.dumps(stats, indent=2)
+
+    lines = [f"{'stage':<20}{'calls':>7}{'wall (s)':>10}{'cpu (s)':>10}{'frames':>9}{'dropped':>9}{'written (MB)':>14}"
+             f"{'peak rss (MB)':>15}"]
+    for name, s in stats.items():
+        peak_rss = f"{s['peak_rss'] / 1e6:.1f}" if s["peak_rss"] is not None else "-"
+        lines.append(f"{name:<20}{s['calls']:>7}{s['wall_time']:>10.2f}{s['cpu_time']:>10.2f}{s['frames']:>9}"
+                     f"{s['dropped']:>9}{s['bytes_written'] / 1e6:>14.2f}{peak_rss:>15}")
+
+    return "\n".join(lines)
+
+
+def get_cpu_time():
+    """Gets the CPU time of the process and of its finished child processes.
+
+    Returns:
+        float: CPU time, in seconds.
+
+    """
+    cpu_time = time.process_time()
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu_time += usage.ru_utime + usage.ru_stime
+
+    return cpu_time
+
+
+def get_peak_rss():
+    """Gets the peak resident memory of the process.
+
+    Returns:
+        int or None: Peak resident memory, in bytes. None if it can't be measured.
+
+    """
+    if resource is None:
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # It is given in bytes on macOS and in kilobytes on Linux
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def get_files_size(files):
+    """Gets the total size of a set of files, ignoring the files that don't exist.
+
+    Args:
+        files (iterable): Paths of the files.
+
+    Returns:
+        int: Total size, in bytes.
+
+    """
+    size = 0
+    for f in files:
+        try:
+            size += Path(f).stat().st_size
+        except OSError:
+            continue
+
+    return size
@@ -1,55 +1,136 @@
 import os
+import re
+import math
+import queue
+import bisect
+import threading
 from pathlib import Path
 import subprocess
-import numpy as np
-import cv2
+from fractions import Fraction
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, groupby, islice
+from collections import deque
 
 from videokf.utils.all_utils import make_dir, make_frames_list
-from videokf.keyframe_manager.frame_manager import Frame, calculate_stillness
+from videokf.utils.decode_profile import DecodeProfile, get_decode_profile
+from videokf.utils.lazy_import import lazy_import
+from videokf.utils.profiling import get_files_size, is_profiling, stage, timed
+from videokf.keyframe_manager.frame_manager import Frame, calculate_histograms, calculate_stillness, \
+    compare_histograms
+from videokf.keyframe_manager.shot_detector import iter_content_shots
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+
+
+# Maximum number of frames extracted by a single ffmpeg process when seeking to every frame
+SEEK_BATCH_SIZE = 32
+
+# Number of frames whose color histograms are computed at once by get_keyframes_color()
+HISTOGRAM_BATCH_SIZE = 8
+
+# Memory used by the histograms of a batch of frames (float32) and their sum (float64), in bytes
+HISTOGRAM_BATCH_MEMORY = (HISTOGRAM_BATCH_SIZE * 4 + 2 * 8) * 512
+
+# Maximum memory used to score the color histograms of a shot sequence in select_keyframe_color(), in bytes
+SHOT_MEMORY_LIMIT = 32 * 1024 ** 2
+
+# Number of ranges of frames decoded by every process in chunked decoding (see split_gop_ranges())
+RANGES_PER_WORKER = 4
+
+# Maximum memory used to buffer the frames decoded ahead by stream_frames_chunked(), in bytes
+DECODE_BUFFER_SIZE = 256 * 1024 ** 2
+
+# Timestamp of every frame logged by the showinfo filter of ffmpeg (see stream_sampled_frames())
+SHOWINFO_PTS_TIME = re.compile(r"\bpts_time:\s*(\S+)")
 
 
 def extract_frames(ffmpeg_exe, video_file, frames_selected=None, output_dir="frames", frame_quality=1,
-                   frame_type="frames"):
+                   frame_type="frames", frame_times=None, profile=None, keyframes_only=False, iframes=None, workers=1):
     """Extracts the frames in a video and saves them in a (possibly) new directory.
 
-    It can extract only some specific frames specified by their index.
+    It can extract only some specific frames specified by their index. If the times of the frames are given, ffmpeg
+    seeks directly to every selected frame, so only the frames needed to decode them are decoded (see
+    extract_frames_seeking()). Otherwise, all the frames of the video are decoded and filtered.
+
+    When all the frames are extracted, they can be decoded by several ffmpeg processes in parallel, each of them
+    decoding a range of frames that starts at an iframe (see extract_frames_chunked()).
+
+    All frames and selected frames are saved with their index as name.
 
     Args:
         ffmpeg_exe (str): ffmpeg executable.
         video_file (str): Path of the video from which to extract the frames.
-        frames_selected (list): Select which frames to extract. By default (None), it extracts all frames in the video.
+        frames_selected (iterable): Select which frames to extract. By default (None), it extracts all frames in the
+                                    video. If frame_times is given, it can be an iterator (eg.: a generator of
+                                    keyframes), and the frames are extracted in batches while it is consumed.
         output_dir (str): It can be either a full directory path where the frames will be stored, or a string, in which
                           case, a folder with this name will be created in the same directory of the video and the
                           frames will be saved there.
         frame_quality (str or int): Quality in which the frames will be saved. The lower the number, the higher the
                                     quality (and the heavier the file). By default 1, which is the highest quality
-                                    (negative numbers are equivalent to 1).
+                                    (negative numbers are equivalent to 1). Only used if profile is None.
         frame_type (str): Name of the type of frame extracted. Used for printing purposes.
+        frame_times (list): Time of every frame in the video, in seconds (see get_frame_times()). Used to seek to
+                            the selected frames or, if all the frames are extracted by several processes, to the start
+                            of every range.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder and of the format of the
+                                            saved frames (see DecodeProfile). If its image format is None, the selected
+                                            frames are not saved. By default (None), the frames are saved as JPEG with
+                                            frame_quality.
+        keyframes_only (bool): If True, all the selected frames are keyframes, so the decoder can skip the rest of the
+                               frames (see DecodeProfile.skip_frame).
+        iframes (list): List with all the iframes in the video. Only used if all the frames are extracted by several
+                        processes.
+        workers (int): Number of ffmpeg processes that extract all the frames in parallel. Only used if
+                       frames_selected is None and iframes and frame_times are given.
 
     Returns:
         str: Directory where the frames have been stored.
 
     """
-    if Path(output_dir).is_dir():
-        frames_dir = Path(output_dir)
-    else:
-        frames_dir = make_dir(output_dir, Path(video_file).parent, parents=True)
+    profile = DecodeProfile(quality=frame_quality) if profile is None else get_decode_profile(profile)
+    if frames_selected is not None and profile.image_format is None:
+        print(f"The decode profile '{profile.name}' doesn't save frames. No {frame_type} were extracted.")
+        return
 
+    frames_dir = get_output_dir(output_dir, video_file)
 
     # Extract frames only if directory is empty
     if len(os.listdir(frames_dir)) == 0:
-        if frames_selected is None:
-            # Extract all frames
-            ffmpeg_args = [ffmpeg_exe, "-hide_banner", "-i", video_file, "-q:v", str(frame_quality),
-                           str((frames_dir / "%d").with_suffix(".jpg"))]
-        else:
-            # Extract only selected frames
-            ffmpeg_args = [ffmpeg_exe, "-i", video_file, "-vf", make_frames_list(frames_selected), "-vsync", "0",
-                           "-q:v", str(frame_quality), "-frame_pts", "1", str((frames_dir / "%d").with_suffix(".jpg"))]
-
         print("Downloading frames ...")
 
-        subprocess.check_output(ffmpeg_args)
+        if frames_selected is None and workers > 1 and iframes is not None and frame_times is not None:
+            # Extract all frames, decoding ranges of frames in parallel
+            extract_frames_chunked(ffmpeg_exe, video_file, frames_dir, iframes, frame_times, workers, profile)
+        elif frames_selected is None:
+            # Extract all frames, named with their index. Every decoded frame is written once (no frames are
+            # duplicated or dropped to a constant frame rate), so the names match the index of the frames
+            ffmpeg_args = [ffmpeg_exe, "-hide_banner"] + profile.decoder_args() + ["-i", video_file, "-vsync", "0"] + \
+                          profile.encoder_args() + ["-start_number", "0",
+                                                    str((frames_dir / "%d").with_suffix(profile.suffix))]
+            with stage("extract frames") as s:
+                subprocess.check_output(ffmpeg_args)
+                if is_profiling():
+                    frame_files = list(frames_dir.iterdir())
+                    s.add(frames=len(frame_files), bytes_written=get_files_size(frame_files))
+        elif frame_times is None:
+            # Extract only selected frames. They are written with a temporary sequential name and renamed afterwards
+            # with their frame index
+            frames_selected = list(frames_selected)
+            ffmpeg_args = [ffmpeg_exe] + profile.decoder_args() + ["-i", video_file, "-vf",
+                           make_frames_list(frames_selected), "-vsync", "0"] + profile.encoder_args() + \
+                          [str((frames_dir / "_%d").with_suffix(profile.suffix))]
+            with stage("extract frames") as s:
+                subprocess.check_output(ffmpeg_args)
+                rename_selected_frames(frames_dir, frames_selected, profile.suffix)
+                if is_profiling():
+                    frame_files = list(frames_dir.iterdir())
+                    s.add(frames=len(frame_files), bytes_written=get_files_size(frame_files))
+        else:
+            # Extract only selected frames, seeking to each of them
+            extract_frames_seeking(ffmpeg_exe, video_file, frames_selected, frame_times, frames_dir, profile=profile,
+                                   keyframes_only=keyframes_only)
 
         print(f"{frame_type.capitalize()} successfully extracted.")
     else:
@@ -58,122 +139,1367 @@ def extract_frames(ffmpeg_exe, video_file, frames_selected=None, output_dir="fra
     return frames_dir
 
 
-def get_iframes(ffprobe_exe, video_file):
+def get_output_dir(output_dir, video_file):
+    """Gets the directory where the frames of a video will be stored, creating it if it doesn't exist.
+
+    Args:
+        output_dir (str): It can be either a full directory path, or a string, in which case, a folder with this name
+                          will be created in the same directory of the video.
+        video_file (str): Path of the video.
+
+    Returns:
+        Path: Directory where the frames will be stored.
+
+    """
+    if Path(output_dir).is_dir():
+        return Path(output_dir)
+
+    return make_dir(output_dir, Path(video_file).parent, parents=True)
+
+
+def extract_frames_seeking(ffmpeg_exe, video_file, frames_selected, frame_times, frames_dir, frame_quality=1,
+                           batch_size=SEEK_BATCH_SIZE, profile=None, keyframes_only=False):
+    """Extracts a set of frames from a video seeking directly to each of them.
+
+    Every selected frame is opened as a separate ffmpeg input, seeking (-ss before -i) to the time of the frame, so
+    that the first frame output after the seek is exactly the selected one. ffmpeg only decodes from the keyframe
+    preceding every selected frame, instead of the whole video (a single frame if the selected frame is a keyframe).
+    The frames are extracted in batches of inputs, to run a small number of ffmpeg processes. Every batch is extracted
+    as soon as its frames are known, so the selected frames can be given by an iterator that is consumed lazily.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        video_file (str): Path of the video from which to extract the frames.
+        frames_selected (iterable): Indices of the frames to extract.
+        frame_times (list): Time of every frame in the video, in seconds (see get_frame_times()).
+        frames_dir (Path): Directory where the frames will be stored.
+        frame_quality (str or int): Quality in which the frames will be saved. Only used if profile is None.
+        batch_size (int): Maximum number of frames extracted by a single ffmpeg process.
+        profile (str or obj DecodeProfile): Decode profile (see DecodeProfile).
+        keyframes_only (bool): If True, all the selected frames are keyframes.
+
+    """
+    profile = DecodeProfile(quality=frame_quality) if profile is None else get_decode_profile(profile)
+    # Skip repeated frames, without consuming the selected frames in advance
+    seen = set()
+    frames_selected = (idx for idx in frames_selected if not (idx in seen or seen.add(idx)))
+
+    for batch in iter(lambda: list(islice(frames_selected, batch_size)), []):
+        with stage("extract frames") as s:
+            subprocess.check_output(get_seeking_args(ffmpeg_exe, video_file, batch, frame_times, frames_dir, profile,
+                                                     keyframes_only))
+            if is_profiling():
+                s.add(frames=len(batch), bytes_written=get_files_size(
+                    (Path(frames_dir) / str(idx)).with_suffix(profile.suffix) for idx in batch))
+
+
+def get_seeking_args(ffmpeg_exe, video_file, frames_selected, frame_times, frames_dir, profile, keyframes_only=False):
+    """Gets the ffmpeg arguments to extract a batch of frames seeking directly to each of them (see
+    extract_frames_seeking()).
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        video_file (str): Path of the video from which to extract the frames.
+        frames_selected (list): Indices of the frames to extract.
+        frame_times (list): Time of every frame in the video, in seconds.
+        frames_dir (Path): Directory where the frames will be stored.
+        profile (obj DecodeProfile): Decode profile.
+        keyframes_only (bool): If True, all the selected frames are keyframes.
+
+    Returns:
+        list[str]: ffmpeg arguments.
+
+    """
+    input_args = []
+    output_args = []
+    for k, idx in enumerate(frames_selected):
+        input_args += profile.decoder_args(keyframes_only) + ["-ss", format_seek_time(frame_times[idx]),
+                                                              "-i", video_file]
+        output_args += ["-map", f"{k}:v:0", "-frames:v", "1"] + profile.encoder_args() + \
+                       [str((Path(frames_dir) / str(idx)).with_suffix(profile.suffix))]
+
+    return [ffmpeg_exe, "-hide_banner", "-loglevel", "error"] + input_args + output_args
+
+
+def decode_thumbnails(ffmpeg_exe, video_file, frames_selected, frame_times, size=(9, 8), profile=None,
+                      keyframes_only=False):
+    """Decodes a set of frames of a video as small grayscale images, seeking directly to each of them.
+
+    All the frames are decoded by a single ffmpeg process: every frame is a separate input, seeking to its time as in
+    extract_frames_seeking(), and the frames are downscaled and joined by ffmpeg (concat filter) before being piped.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        video_file (str): Path of the video.
+        frames_selected (list): Indices of the frames to decode.
+        frame_times (list): Time of every frame in the video, in seconds (see get_frame_times()).
+        size (tuple(int)): Width and height of the images.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile).
+        keyframes_only (bool): If True, all the selected frames are keyframes.
+
+    Returns:
+        array: Images of the frames, in the same order (frames x height x width). It has less images than frames if
+               some of the frames could not be decoded.
+
+    """
+    if not frames_selected:
+        return np.empty((0, size[1], size[0]), dtype=np.uint8)
+
+    # The images decoded before an error are still returned
+    ffmpeg_output = subprocess.run(get_thumbnails_args(ffmpeg_exe, video_file, frames_selected, frame_times, size,
+                                                       profile, keyframes_only), stdout=subprocess.PIPE).stdout
+    width, height = size
+    n_images = len(ffmpeg_output) // (width * height)
+
+    return np.frombuffer(ffmpeg_output[:n_images * width * height], dtype=np.uint8).reshape(n_images, height, width)
+
+
+def get_thumbnails_args(ffmpeg_exe, video_file, frames_selected, frame_times, size=(9, 8), profile=None,
+                        keyframes_only=False):
+    """Gets the ffmpeg arguments to decode a set of frames as small grayscale images (see decode_thumbnails())."""
+    profile = get_decode_profile(profile)
+    width, height = size
+
+    input_args = []
+    filters = []
+    for k, idx in enumerate(frames_selected):
+        input_args += profile.decoder_args(keyframes_only) + ["-ss", format_seek_time(frame_times[idx]),
+                                                              "-i", video_file]
+        filters.append(f"[{k}:v:0]trim=end_frame=1,scale={width}:{height},setsar=1,format=gray[v{k}]")
+    inputs = "".join(f"[v{k}]" for k in range(len(frames_selected)))
+    filters.append(f"{inputs}concat=n={len(frames_selected)}:v=1:a=0[out]")
+
+    return [ffmpeg_exe, "-hide_banner", "-loglevel", "error"] + input_args + \
+           ["-filter_complex", ";".join(filters), "-map", "[out]", "-vsync", "0", "-f", "rawvideo", "-pix_fmt", "gray",
+            "-"]
+
+
+def extract_frames_chunked(ffmpeg_exe, video_file, frames_dir, iframes, frame_times, workers, profile=None):
+    """Extracts all the frames of a video, decoding ranges of frames in parallel.
+
+    The video is split into ranges of frames that start at an iframe (see split_gop_ranges()), and every range is
+    decoded by its own ffmpeg process, which seeks to the first frame of the range (-ss before -i) and outputs exactly
+    the frames of the range (-frames:v), numbered from the index of its first frame (-start_number). The frames are
+    saved with the same names as when the whole video is decoded by a single process.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        video_file (str): Path of the video from which to extract the frames.
+        frames_dir (Path): Directory where the frames will be stored.
+        iframes (list): List with all the iframes in the video.
+        frame_times (list): Time of every frame in the video, in seconds (see get_frame_times()).
+        workers (int): Number of ffmpeg processes run at the same time.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder and of the format of the
+                                            saved frames (see DecodeProfile).
+
+    """
+    profile = get_decode_profile(profile)
+
+    def extract_range(frames_range):
+        start, end = frames_range
+        ffmpeg_args = [ffmpeg_exe, "-hide_banner", "-loglevel", "error"] + profile.decoder_args() + \
+                      ["-ss", format_seek_time(frame_times[start]), "-i", video_file, "-map", "0:v:0", "-vsync", "0",
+                       "-frames:v", str(end - start)] + profile.encoder_args() + \
+                      ["-start_number", str(start), str((Path(frames_dir) / "%d").with_suffix(profile.suffix))]
+        subprocess.check_output(ffmpeg_args)
+
+    with stage("extract frames") as s:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(extract_range, split_gop_ranges(iframes, len(frame_times),
+                                                              RANGES_PER_WORKER * workers)))
+        if is_profiling():
+            frame_files = list(Path(frames_dir).iterdir())
+            s.add(frames=len(frame_files), bytes_written=get_files_size(frame_files))
+
+
+def format_seek_time(frame_time):
+    """Formats the time of a frame to be used as seeking position by ffmpeg (-ss option).
+
+    ffmpeg works with microseconds, so the time is rounded down to not skip the frame.
+
+    Args:
+        frame_time (float): Time of the frame, in seconds.
+
+    Returns:
+        str: Seeking position, in seconds.
+
+    """
+    return f"{math.floor(max(frame_time, 0) * 1e6) / 1e6:.6f}"
+
+
+def rename_selected_frames(frames_dir, frames_selected, suffix=".jpg"):
+    """Renames the frames extracted with a temporary sequential name to the index of the frame in the video.
+
+    Args:
+        frames_dir (Path): Directory where the frames have been stored.
+        frames_selected (list): Indices of the frames extracted.
+        suffix (str): Suffix of the frame files.
+
+    """
+    for n, idx in enumerate(sorted(set(frames_selected)), 1):
+        tmp_file = (frames_dir / f"_{n}").with_suffix(suffix)
+        if tmp_file.is_file():
+            tmp_file.replace((frames_dir / str(idx)).with_suffix(suffix))
+
+
+@timed("probe size")
+def get_video_size(ffprobe_exe, video_file):
+    """Gets the width and height of the first video stream of a video using ffprobe.
+
+    Args:
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+
+    Returns:
+        tuple(int): Width and height of the video frames.
+
+    """
+    ffprobe_output = subprocess.check_output(get_video_size_args(ffprobe_exe, video_file))
+
+    return parse_video_size(ffprobe_output.decode("utf8"))
+
+
+def get_video_size_args(ffprobe_exe, video_file):
+    """Gets the ffprobe arguments to read the size of the first video stream of a video (see get_video_size())."""
+    return [ffprobe_exe, "-i", video_file, "-loglevel", "error", "-select_streams", "v:0",
+            "-show_entries", "stream=width,height", "-of", "csv=print_section=0"]
+
+
+def parse_video_size(ffprobe_output):
+    """Parses the width and height of a video from the output of ffprobe (see get_video_size_args())."""
+    width, height = ffprobe_output.strip().split(",")[:2]
+
+    return int(width), int(height)
+
+
+def stream_frames(ffmpeg_exe, ffprobe_exe, video_file, start_time=None, n_frames=None, size=None,
+                  analysis_size=None, profile=None):
+    """Decodes the frames of a video and yields them one by one, without writing anything to disk.
+
+    The frames are piped from ffmpeg as raw BGR images, the same format returned by cv2.imread. Autorotation is
+    disabled so that the size of the frames matches the one reported by ffprobe.
+
+    Only a range of frames can be decoded giving the time of its first frame, to which ffmpeg seeks directly, and its
+    number of frames. The frames can also be downscaled by ffmpeg, to speed up their analysis (see
+    get_analysis_size()).
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video from which to decode the frames.
+        start_time (float): Time of the first frame to decode, in seconds (see get_frame_times()). By default (None),
+                            the frames are decoded from the start of the video.
+        n_frames (int): Maximum number of frames to decode. By default (None), the frames are decoded until the end of
+                        the video.
+        size (tuple(int)): Width and height of the video frames. If None, they are read with ffprobe.
+        analysis_size (int): Maximum width of the frames. Wider frames are downscaled, keeping their aspect ratio. By
+                             default (None), the frames are not downscaled.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile).
+
+    Yields:
+        array: Frame of the video, in order.
+
+    """
+    video_size = size or get_video_size(ffprobe_exe, video_file)
+    ffmpeg_args, (width, height) = get_stream_args(ffmpeg_exe, video_file, video_size, start_time, n_frames,
+                                                   analysis_size, profile)
+    frame_size = width * height * 3
+
+    process = subprocess.Popen(ffmpeg_args, stdout=subprocess.PIPE)
+
+    try:
+        while True:
+            with stage("decode frames") as s:
+                buffer = process.stdout.read(frame_size)
+                if len(buffer) < frame_size:
+                    break
+                s.add(frames=1)
+
+            yield np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, ffmpeg_args)
+    finally:
+        # Stop ffmpeg if the frames were not consumed until the end
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+def get_stream_args(ffmpeg_exe, video_file, size, start_time=None, n_frames=None, analysis_size=None, profile=None,
+                    select=None):
+    """Gets the ffmpeg arguments to decode the frames of a video as raw BGR images to the standard output (see
+    stream_frames()).
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        video_file (str): Path of the video from which to decode the frames.
+        size (tuple(int)): Width and height of the video frames.
+        start_time (float): Time of the first frame to decode, in seconds.
+        n_frames (int): Maximum number of decoded frames. If select is given, it is the number of frames read from the
+                        video, before selecting them.
+        analysis_size (int): Maximum width of the frames (see get_analysis_size()).
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder.
+        select (str): Expression of the ffmpeg select filter, to output only some of the frames (see
+                      get_sampling_expression()). The timestamp of every output frame is logged to the standard error
+                      by the showinfo filter.
+
+    Returns:
+        tuple: ffmpeg arguments and size (width, height) of the decoded frames.
+
+    """
+    width, height = get_analysis_size(size, analysis_size)
+
+    filters = []
+    if n_frames is not None and select is not None:
+        # The frames are selected after limiting the frames read from the video
+        filters.append(f"trim=end_frame={n_frames}")
+    if select is not None:
+        filters.append(f"select='{select}'")
+    if (width, height) != tuple(size):
+        filters.append(f"scale={width}:{height}")
+    if select is not None:
+        filters.append("showinfo")
+
+    seek_args = ["-ss", format_seek_time(start_time)] if start_time is not None else []
+    frames_args = ["-frames:v", str(n_frames)] if n_frames is not None and select is None else []
+    filter_args = ["-vf", ",".join(filters)] if filters else []
+    loglevel = "info" if select is not None else "error"
+    ffmpeg_args = [ffmpeg_exe, "-hide_banner", "-nostats", "-loglevel", loglevel, "-noautorotate"] + \
+                  get_decode_profile(profile).decoder_args() + seek_args + \
+                  ["-i", video_file, "-map", "0:v:0", "-vsync", "0"] + frames_args + filter_args + \
+                  ["-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+
+    return ffmpeg_args, (width, height)
+
+
+def split_gop_ranges(iframes, n_frames, n_ranges):
+    """Splits the frames of a video into consecutive ranges of similar length that start at an iframe, so that every
+    range can be decoded independently from the rest.
+
+    The first range always starts at the first frame, even if it is not an iframe (eg.: in a time window), since
+    ffmpeg can seek accurately to any frame, decoding from the previous keyframe.
+
+    Args:
+        iframes (list): List with all the iframes in the video.
+        n_frames (int): Number of frames in the video.
+        n_ranges (int): Maximum number of ranges. There are less ranges if there are not enough iframes.
+
+    Returns:
+        list[tuple]: First frame (included) and last frame (excluded) of every range, in order.
+
+    """
+    if n_frames <= 0:
+        return []
+
+    target = n_frames / max(n_ranges, 1)
+    ranges = []
+    start = 0
+    for iframe in sorted(set(iframes)):
+        # Start a new range at the first iframe after the target length
+        if start < iframe < n_frames and iframe - start >= target:
+            ranges.append((start, iframe))
+            start = iframe
+    ranges.append((start, n_frames))
+
+    return ranges
+
+
+def stream_frames_chunked(ffmpeg_exe, ffprobe_exe, video_file, iframes, frame_times, workers, size=None,
+                          analysis_size=None, profile=None, buffer_size=DECODE_BUFFER_SIZE):
+    """Decodes all the frames of a video with several ffmpeg processes in parallel and yields them one by one, in
+    order, as stream_frames().
+
+    The video is split into ranges of frames that start at an iframe (see split_gop_ranges()), and every range is
+    decoded by its own ffmpeg process (see stream_frames()), read by its own thread. The ranges are yielded in order,
+    while the next ranges are decoded ahead into bounded buffers, so there are at most workers ffmpeg processes
+    running and the memory used doesn't depend on the length of the video.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video from which to decode the frames.
+        iframes (list): List with all the iframes in the video.
+        frame_times (list): Time of every frame in the video, in seconds (see get_frame_times()).
+        workers (int): Number of ffmpeg processes run at the same time.
+        size (tuple(int)): Width and height of the video frames. If None, they are read with ffprobe.
+        analysis_size (int): Maximum width of the frames (see get_analysis_size()).
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile).
+        buffer_size (int): Maximum memory used to buffer the frames decoded ahead, in bytes.
+
+    Yields:
+        array: Frame of the video, in order.
+
+    """
+    video_size = size or get_video_size(ffprobe_exe, video_file)
+    width, height = get_analysis_size(video_size, analysis_size)
+    max_buffered = max(1, buffer_size // (width * height * 3 * workers))
+
+    ranges = iter(split_gop_ranges(iframes, len(frame_times), RANGES_PER_WORKER * workers))
+    stop = threading.Event()
+    pending = deque()
+
+    def put(frames_queue, item):
+        # Wait for space in the buffer, unless the frames are not consumed anymore
+        while not stop.is_set():
+            try:
+                frames_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def decode_range(start, end, frames_queue):
+        frames = stream_frames(ffmpeg_exe, ffprobe_exe, video_file, start_time=frame_times[start],
+                               n_frames=end - start, size=video_size, analysis_size=analysis_size, profile=profile)
+        try:
+            for im in frames:
+                if not put(frames_queue, im):
+                    return
+        except Exception as e:
+            put(frames_queue, e)
+        finally:
+            # Stop ffmpeg if the range was not decoded until the end
+            frames.close()
+        put(frames_queue, None)
+
+    def start_next_range():
+        frames_range = next(ranges, None)
+        if frames_range is not None:
+            frames_queue = queue.Queue(maxsize=max_buffered)
+            threading.Thread(target=decode_range, args=(*frames_range, frames_queue), daemon=True).start()
+            pending.append((frames_range, frames_queue))
+
+    try:
+        for _ in range(workers):
+            start_next_range()
+
+        while pending:
+            (start, end), frames_queue = pending.popleft()
+            n_frames = 0
+            while True:
+                # The end of the range is compared by identity, since the frames are arrays
+                item = frames_queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                n_frames += 1
+                yield item
+
+            # The indices of the next frames would be wrong if a range had a different number of frames
+            if n_frames != end - start:
+                raise RuntimeError(f"The frames {start}-{end - 1} of '{video_file}' could not be decoded "
+                                   f"({n_frames} of {end - start} frames)")
+
+            start_next_range()
+    finally:
+        stop.set()
+
+
+def stream_sampled_frames(ffmpeg_exe, ffprobe_exe, video_file, frame_times, stride=1, scene_threshold=None,
+                          window=False, size=None, analysis_size=None, profile=None):
+    """Decodes a sample of the frames of a video and yields them one by one, with their index in the video.
+
+    The frames are selected by ffmpeg while decoding (select filter), so the rest of the frames are never converted,
+    scaled or piped (see get_sampling_expression()). The index of every selected frame is found from its timestamp,
+    logged by the showinfo filter, so the sampling can also depend on the content of the frames.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video from which to decode the frames.
+        frame_times (list): Time of every frame in the video, in seconds (see get_frame_times()).
+        stride (int): One of every stride frames is selected.
+        scene_threshold (float): If given, the frames whose scene change score is higher are also selected (see
+                                 get_sampling_expression()).
+        window (bool): If True, frame_times are the times of a window of the video (see get_frame_times()), and only
+                       the frames of the window are decoded.
+        size (tuple(int)): Width and height of the video frames. If None, they are read with ffprobe.
+        analysis_size (int): Maximum width of the frames (see get_analysis_size()).
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile).
+
+    Yields:
+        tuple: Index of the frame (in frame_times) and frame, in order.
+
+    """
+    if not frame_times:
+        return
+
+    start_time = frame_times[0] if window else None
+    n_frames = len(frame_times) if window else None
+    video_size = size or get_video_size(ffprobe_exe, video_file)
+    ffmpeg_args, (width, height) = get_stream_args(ffmpeg_exe, video_file, video_size, start_time, n_frames,
+                                                   analysis_size, profile,
+                                                   select=get_sampling_expression(stride, scene_threshold))
+    frame_size = width * height * 3
+
+    process = subprocess.Popen(ffmpeg_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # The standard error is read by a thread, so that ffmpeg is never blocked writing to it
+    times = queue.Queue()
+
+    def read_times():
+        for line in process.stderr:
+            match = SHOWINFO_PTS_TIME.search(line.decode("utf8", errors="replace"))
+            if match and match.group(1) != "NOPTS":
+                times.put(float(match.group(1)))
+        times.put(None)
+
+    reader = threading.Thread(target=read_times, daemon=True)
+    reader.start()
+
+    # Timestamps start at 0 at the seeking position
+    time_offset = start_time or 0.
+    try:
+        while True:
+            with stage("decode frames") as s:
+                buffer = process.stdout.read(frame_size)
+                if len(buffer) < frame_size:
+                    break
+                s.add(frames=1)
+
+            frame_time = times.get()
+            if frame_time is None:
+                raise RuntimeError(f"The timestamps of the frames of '{video_file}' could not be read from ffmpeg")
+
+            yield get_closest_frame(frame_times, frame_time + time_offset), \
+                np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, ffmpeg_args)
+    finally:
+        # Stop ffmpeg if the frames were not consumed until the end
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        reader.join()
+        process.stderr.close()
+
+
+def get_sampling_expression(stride=1, scene_threshold=None):
+    """Gets the expression of the ffmpeg select filter that samples the frames of a video.
+
+    One of every stride frames is selected, together with all the iframes, so every shot sequence keeps its first
+    frame. If scene_threshold is given, the sampling is adaptive: the frames that change a lot from the previous one
+    (ffmpeg scene change score, between 0 and 1, higher than scene_threshold) are also selected, so the sampling is
+    denser where the content changes.
+
+    Args:
+        stride (int): One of every stride frames is selected.
+        scene_threshold (float): Minimum scene change score of the frames that are also selected.
+
+    Returns:
+        str: Expression of the select filter.
+
+    """
+    expression = f"not(mod(n\\,{stride}))+eq(pict_type\\,PICT_TYPE_I)"
+    if scene_threshold is not None:
+        expression += f"+gt(scene\\,{scene_threshold})"
+
+    return expression
+
+
+def get_closest_frame(frame_times, frame_time):
+    """Gets the index of the frame closest to a time.
+
+    Args:
+        frame_times (list): Time of every frame, in seconds, sorted.
+        frame_time (float): Time, in seconds.
+
+    Returns:
+        int: Index of the closest frame.
+
+    """
+    idx = bisect.bisect_left(frame_times, frame_time)
+    if idx > 0 and (idx == len(frame_times) or frame_time - frame_times[idx - 1] < frame_times[idx] - frame_time):
+        idx -= 1
+
+    return idx
+
+
+def decode_frame(ffmpeg_exe, ffprobe_exe, video_file, frame_time, size=None, profile=None):
+    """Decodes a single frame of a video, seeking directly to it.
+
+    Args:
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+        frame_time (float): Time of the frame, in seconds (see get_frame_times()).
+        size (tuple(int)): Width and height of the video frames. If None, they are read with ffprobe.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile).
+
+    Returns:
+        array or None: Frame, in BGR format. None if the video has no frame at that time.
+
+    """
+    frames = list(stream_frames(ffmpeg_exe, ffprobe_exe, video_file, start_time=frame_time, n_frames=1, size=size,
+                                profile=profile))
+
+    return frames[0] if frames else None
+
+
+def get_analysis_size(size, analysis_size=None):
+    """Gets the size of the frames used to analyze a video.
+
+    Scoring the frames at a low resolution gives almost the same keyframes as at full resolution, in a fraction of the
+    time. The frames are only downscaled, never upscaled, and their height is rounded to an even number, as required
+    by most pixel formats.
+
+    Args:
+        size (tuple(int)): Width and height of the video frames.
+        analysis_size (int): Maximum width of the frames used for the analysis. If None, the frames are not resized.
+
+    Returns:
+        tuple(int): Width and height of the frames used for the analysis.
+
+    """
+    width, height = size
+    if analysis_size is None or analysis_size >= width:
+        return width, height
+
+    return analysis_size, max(2, round(height * analysis_size / width / 2) * 2)
+
+
+def read_frames(frames_dir, suffix=".jpg"):
+    """Reads the frames previously extracted to a directory and yields them one by one, in order.
+
+    Args:
+        frames_dir (str): Directory where all the frames of the video are stored (extracted previously).
+        suffix (str): Suffix of the frame files.
+
+    Yields:
+        array: Frame of the video, in order.
+
+    """
+    for i in range(len(os.listdir(frames_dir))):
+        with stage("load frames") as s:
+            im = cv2.imread(str((Path(frames_dir) / str(i)).with_suffix(suffix)))
+            s.add(frames=1)
+
+        yield im
+
+
+def get_shot_starts(iframes):
+    """Gets the first frame of every shot sequence, which start at every iframe.
+
+    The first frame always starts a shot sequence, even if it is not an iframe (eg.: in a time window that starts in
+    the middle of a GOP, or that falls inside a single GOP), so no frame is left out of the shot sequences.
+
+    Args:
+        iframes (list): List with all the iframes in the video.
+
+    Returns:
+        list: Index of the first frame of every shot sequence, in order.
+
+    """
+    iframes = list(iframes)
+    if not iframes or iframes[0] > 0:
+        return [0] + iframes
+
+    return iframes
+
+
+def iter_shots(frames, iframes):
+    """Splits a sequence of frames into shot sequences, which start at every iframe (and at the first frame, see
+    get_shot_starts()). The last shot sequence goes from the last iframe to the end of the video.
+
+    Every shot is yielded as a lazy iterator over its frames, so only the frames being processed are kept in memory.
+    The frames of a shot that are not consumed are skipped before yielding the next shot.
+
+    Args:
+        frames (iterable): All the frames of the video, in order.
+        iframes (list): List with all the iframes in the video.
+
+    Yields:
+        tuple: Index of the first frame of the shot and iterator over the frames of the shot.
+
+    """
+    frames = iter(frames)
+    starts = get_shot_starts(iframes)
+
+    for start, end in zip(starts[:-1], starts[1:]):
+        shot = islice(frames, end - start)
+        yield start, shot
+
+        for _ in shot:
+            pass
+
+    # Last shot, only if there are frames after the last iframe
+    first = next(frames, None)
+    if first is not None:
+        yield starts[-1], chain([first], frames)
+
+
+@timed("probe iframes")
+def get_iframes(ffprobe_exe, video_file, fast=False, profile=None, window=None):
     """Get the iframe indices of a video using ffprobe.
 
+    By default, all the frames of the video are decoded by ffprobe to read their picture type. If fast is True, only
+    the packets of the video are read (without decoding them) and the frames flagged as keyframes are returned
+    instead (see get_keyframe_packets()).
+
+    If a time window is given, only the frames inside it are read and decoded, and the indices are counted from the
+    first frame of the window (see probe_packets()).
+
     Args:
         ffprobe_exe (str): ffprobe executable.
         video_file (str): Path of the video from which to get the iframe indices.
+        fast (bool): If True, the iframes are read from the keyframe flags of the packets, without decoding the video.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile). Only
+                                            used if fast is False.
+        window (tuple): Start and end times of the window, in seconds (any of them can be None). By default (None),
+                        the whole video.
 
     Returns:
         list: List of iframes in the video.
 
     """
-    # Run ffprobe
-    ffprobe_args = [ffprobe_exe, "-i", video_file, "-loglevel", "error", "-select_streams", "v",
-                    "-show_frames", "-show_entries", "frame=pict_type", "-of", "csv=print_section=0"]
-    ffprobe_output = subprocess.check_output(ffprobe_args)
+    if fast:
+        return get_keyframe_packets(ffprobe_exe, video_file, window)
+
+    if window is None:
+        # Run ffprobe
+        ffprobe_output = subprocess.check_output(get_iframes_args(ffprobe_exe, video_file, profile))
+
+        return parse_iframes(ffprobe_output.decode("utf8").splitlines())
+
+    # Decode only the frames of the window, and match their timestamps with the frames of the window
+    video_start_time = get_video_start_time(ffprobe_exe, video_file)
+    frame_times = get_frame_times(ffprobe_exe, video_file, window)
+    ffprobe_output = subprocess.check_output(get_iframes_args(ffprobe_exe, video_file, profile,
+                                                              get_read_intervals_args(window, video_start_time)))
+
+    return parse_window_iframes(ffprobe_output.decode("utf8").splitlines(), frame_times, video_start_time)
+
+
+def get_iframes_args(ffprobe_exe, video_file, profile=None, read_intervals_args=None):
+    """Gets the ffprobe arguments to read the picture type of every frame of a video (see get_iframes()).
+
+    If the arguments of the intervals to read are given, the timestamp of every frame is also read, before its picture
+    type (see parse_window_iframes()).
+    """
+    entries = "frame=best_effort_timestamp_time,pict_type" if read_intervals_args else "frame=pict_type"
+
+    return [ffprobe_exe] + get_decode_profile(profile).decoder_args() + \
+           ["-i", video_file] + (read_intervals_args or []) + \
+           ["-loglevel", "error", "-select_streams", "v:0", "-show_frames", "-show_entries", entries,
+            "-of", "csv=print_section=0"]
+
+
+def parse_iframes(lines):
+    """Parses the iframe indices of a video from the output of ffprobe (see get_iframes_args()).
+
+    Args:
+        lines (iterable[str]): Lines of the ffprobe output. They can be consumed while ffprobe is running.
+
+    Returns:
+        list: List of iframes in the video.
+
+    """
+    # Frames with side data (eg.: SEI messages) are followed by an empty line, and the side data is printed after the
+    # picture type, so only the first field of the non empty lines is read
+    pict_types = (line.split(",")[0] for line in lines if line.strip())
 
     # Count the number of type I (iframes) and save their indices
     iframes = []
-    for i, line in enumerate(ffprobe_output.decode("utf8").splitlines()):
-        if line == "I":
+    for i, pict_type in enumerate(pict_types):
+        if pict_type.strip() == "I":
             iframes.append(i)
 
     return iframes
 
 
+@timed("probe packets")
+def probe_packets(ffprobe_exe, video_file, window=None):
+    """Reads the packets of the first video stream of a video using ffprobe, without decoding them.
+
+    The packets are stored in decoding order, so they are sorted by their presentation timestamp to get the index of
+    the frame they contain. Packets marked to be discarded are not counted, since the decoder does not output them.
+
+    If a time window is given, ffprobe only reads the packets around it (-read_intervals) and only the packets whose
+    time is inside the window are returned, so the frame indices are counted from the first frame of the window.
+
+    Args:
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video to probe.
+        window (tuple): Start and end times of the window, in seconds (any of them can be None). By default (None),
+                        the whole video.
+
+    Returns:
+        tuple: List of packets, in presentation order, as tuples (timestamp, is_keyframe), the time base of the
+               timestamps (Fraction) and the start time of the video, in seconds.
+
+    """
+    read_intervals_args = None
+    if window is not None:
+        read_intervals_args = get_read_intervals_args(window, get_video_start_time(ffprobe_exe, video_file))
+
+    # Run ffprobe
+    ffprobe_output = subprocess.check_output(get_packets_args(ffprobe_exe, video_file, read_intervals_args))
+    packets, time_base, start_time = parse_packets(ffprobe_output.decode("utf8").splitlines())
+
+    if window is not None:
+        packets = crop_packets(packets, time_base, start_time, window)
+
+    return packets, time_base, start_time
+
+
+def get_packets_args(ffprobe_exe, video_file, read_intervals_args=None):
+    """Gets the ffprobe arguments to read the packets of a video (see probe_packets())."""
+    return [ffprobe_exe, "-i", video_file] + (read_intervals_args or []) + \
+           ["-loglevel", "error", "-select_streams", "v:0", "-show_packets",
+            "-show_entries", "packet=pts,dts,flags:stream=time_base:format=start_time", "-of", "csv"]
+
+
+def get_video_start_time(ffprobe_exe, video_file):
+    """Gets the start time of a video, reading only its header with ffprobe.
+
+    The times used by ffmpeg to seek (-ss option) are relative to the start time, while the intervals read by ffprobe
+    (-read_intervals option) are absolute timestamps.
+
+    Args:
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+
+    Returns:
+        float: Start time of the video, in seconds.
+
+    """
+    ffprobe_output = subprocess.check_output([ffprobe_exe, "-i", video_file, "-loglevel", "error", "-show_entries",
+                                              "format=start_time", "-of", "csv=print_section=0"])
+    start_time = ffprobe_output.decode("utf8").strip()
+
+    return float(start_time) if start_time and start_time != "N/A" else 0.0
+
+
+def get_read_intervals_args(window, video_start_time=0.0):
+    """Gets the ffprobe arguments to read only the packets of a time window of a video (-read_intervals option).
+
+    ffprobe starts reading at the keyframe preceding the start of the window, so the packets read must still be
+    cropped to the window (see crop_packets()).
+
+    Args:
+        window (tuple): Start and end times of the window, relative to the start of the video, in seconds (any of
+                        them can be None).
+        video_start_time (float): Start time of the video, in seconds (see get_video_start_time()).
+
+    Returns:
+        list[str]: ffprobe arguments.
+
+    """
+    start, end = window
+    start_arg = format_seek_time(start + video_start_time) if start is not None else ""
+    end_arg = format_seek_time(end + video_start_time) if end is not None else ""
+
+    return ["-read_intervals", f"{start_arg}%{end_arg}"]
+
+
+def crop_packets(packets, time_base, start_time, window):
+    """Keeps only the packets whose time is inside a time window.
+
+    Args:
+        packets (list): Packets, in presentation order, as tuples (timestamp, is_keyframe) (see parse_packets()).
+        time_base (Fraction): Time base of the timestamps.
+        start_time (float): Start time of the video, in seconds.
+        window (tuple): Start (included) and end (excluded) times of the window, relative to the start of the video,
+                        in seconds (any of them can be None).
+
+    Returns:
+        list: Packets inside the window, in presentation order.
+
+    """
+    start, end = window
+    start = -math.inf if start is None else start - 1e-6
+    end = math.inf if end is None else end - 1e-6
+
+    return [packet for packet in packets if start <= float(packet[0] * time_base) - start_time < end]
+
+
+def parse_window_iframes(lines, frame_times, video_start_time=0.0):
+    """Parses the iframe indices of a time window of a video from the output of ffprobe, which has the timestamp and
+    the picture type of every frame (see get_iframes_args()).
+
+    The frames read by ffprobe start at the keyframe preceding the window, so every iframe is matched by its time with
+    the frames of the window.
+
+    Args:
+        lines (iterable[str]): Lines of the ffprobe output.
+        frame_times (list): Time of every frame of the window, relative to the start of the video, in seconds (see
+                            get_frame_times()).
+        video_start_time (float): Start time of the video, in seconds.
+
+    Returns:
+        list: List of iframes in the window, counted from its first frame.
+
+    """
+    iframes = []
+    for line in lines:
+        fields = line.strip().split(",")
+        if len(fields) < 2 or fields[1].strip() != "I":
+            continue
+
+        try:
+            frame_time = float(fields[0]) - video_start_time
+        except ValueError:
+            # No timestamp
+            continue
+
+        # Closest frame of the window, if any is close enough
+        idx = bisect.bisect_left(frame_times, frame_time - 1e-3)
+        if idx < len(frame_times) and abs(frame_times[idx] - frame_time) < 1e-3 and idx not in iframes[-1:]:
+            iframes.append(idx)
+
+    return iframes
+
+
+def parse_packets(lines):
+    """Parses the packets of a video from the output of ffprobe (see get_packets_args() and probe_packets()).
+
+    Args:
+        lines (iterable[str]): Lines of the ffprobe output.
+
+    Returns:
+        tuple: List of packets, in presentation order, as tuples (timestamp, is_keyframe), the time base of the
+               timestamps (Fraction) and the start time of the video, in seconds.
+
+    """
+    packets = []
+    time_base = Fraction(1)
+    start_time = 0.0
+    for line in lines:
+        section, *fields = line.strip().split(",")
+        if section == "stream":
+            time_base = Fraction(fields[0])
+        elif section == "format":
+            start_time = float(fields[0]) if fields[0] != "N/A" else 0.0
+        elif section == "packet":
+            pts, dts, flags = fields[:3]
+            if "D" in flags:
+                continue
+
+            # Some containers (eg.: AVI) only store the decoding timestamp
+            timestamp = pts if pts != "N/A" else dts
+            packets.append((int(timestamp) if timestamp != "N/A" else len(packets), "K" in flags))
+
+    # Sort the packets in presentation order (the sort is stable, so ties keep the decoding order)
+    packets.sort(key=lambda packet: packet[0])
+
+    return packets, time_base, start_time
+
+
+def get_keyframe_packets(ffprobe_exe, video_file, window=None):
+    """Get the keyframe indices of a video using ffprobe, reading only the packets of the video (no decoding).
+
+    Keyframes are the frames from which the decoding can start (eg.: IDR frames in H.264). In most videos they are the
+    same as the iframes, but an encoder may also insert iframes that are not flagged as keyframes (eg.: open GOPs). Use
+    validate_iframes() to compare both methods on a video.
+
+    Args:
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video from which to get the keyframe indices.
+        window (tuple): Start and end times of the window to read, in seconds (see probe_packets()).
+
+    Returns:
+        list: List of keyframes in the video.
+
+    """
+    packets, _, _ = probe_packets(ffprobe_exe, video_file, window)
+
+    return [i for i, (_, is_keyframe) in enumerate(packets) if is_keyframe]
+
+
+def get_frame_times(ffprobe_exe, video_file, window=None):
+    """Get the presentation time of every frame of a video using ffprobe, reading only the packets of the video.
+
+    The times are relative to the start of the video, which is the reference used by ffmpeg to seek (-ss option).
+
+    Args:
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+        window (tuple): Start and end times of the window to read, in seconds (see probe_packets()). The times are
+                        still relative to the start of the video, but indexed from the first frame of the window.
+
+    Returns:
+        list: Time of every frame in the video, in seconds, indexed by frame index.
+
+    """
+    packets, time_base, start_time = probe_packets(ffprobe_exe, video_file, window)
+
+    return [float(timestamp * time_base) - start_time for timestamp, _ in packets]
+
+
+def validate_iframes(ffprobe_exe, video_file):
+    """Compares the iframes obtained decoding the video with the keyframes obtained reading only its packets.
+
+    Args:
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video to check.
+
+    Returns:
+        list: Sorted list of the frame indices returned only by one of the two methods. It is empty if both methods
+              agree.
+
+    """
+    iframes = set(get_iframes(ffprobe_exe, video_file))
+    keyframes = set(get_iframes(ffprobe_exe, video_file, fast=True))
+
+    return sorted(iframes ^ keyframes)
+
+
 # ------------------------------------------------------------------------------------------------------------------
 # ------------------------------------------------------------------------------------------------------------------
 # ------------------------------------------------------------------------------------------------------------------
 
 # Methods for extracting the keyframes of a video using the extracted frames and image information (color, flow, etc.)
 
-def get_keyframes_color(iframes, frames_dir):
+def get_keyframes_color(iframes, frames, segmenter="iframes"):
     """Method to compute the most relevant frame (keyframe) on each shot sequence, based on color histogram.
 
     The iframes mark the start of every shot sequence. For every shot sequence, one frame is selected as new
-    keyframe.
+    keyframe (see select_keyframe_color()).
+
+    Args:
+        iframes (list): List with all the iframes in the video.
+        frames (iterable): All the frames of the video, in order (see stream_frames() and read_frames()).
+        segmenter (str): Either "iframes", if the shot sequences start at every iframe, or "content", if they start at
+                         every cut detected from the content of the frames (see iter_content_shots()).
+
+    Returns:
+        list: List of all relevant keyframes indices in the video, one for each sequence.
+
+    """
+    return list(iter_shot_keyframes(select_keyframe_color, iframes, frames, segmenter))
+
+
+def select_keyframe_color(start, shot, memory_limit=SHOT_MEMORY_LIMIT):
+    """Selects the most relevant frame of a shot sequence, based on color histogram.
 
     The selected keyframe is the frame whose color histogram is closer to the average of the color
     histograms of all the frames in the sequence shot.
 
+    The frames are read only once. The average histogram is computed as a running sum, while the histogram of every
+    frame is stored with its exact pixel counts (uint32) in an array of at most get_histogram_capacity() rows, to be
+    compared with the average at the end. If a long shot fills the array, every other stored histogram is dropped and
+    only one of every two frames is stored from then on (the average still includes all the frames). Shots that fit in
+    the array (8186 frames with the default limit) are scored exactly.
+
+    The memory used to score the histograms (the array, while it grows, the histograms of the batch being computed and
+    the histograms being compared) never grows beyond memory_limit. The frames themselves are not included.
+
     Args:
-        iframes (list): List with all the iframes in the video.
-        frames_dir (str): Directory where all the frames of the video are stored (extracted previously).
+        start (int): Index of the first frame of the shot sequence.
+        shot (iterable): Frames of the shot sequence, in order.
+        memory_limit (int): Maximum memory used to score the color histograms, in bytes.
 
     Returns:
-        list: List of all relevant keyframes indices in the video, one for each sequence.
+        int: Index of the keyframe in the video. The first frame of the shot sequence if it has no frames (eg.: the
+             video has fewer frames than probed).
 
     """
-    keyframes = [None] * (len(iframes) - 1)
+    # Color histograms are computed in small batches, so that only a few frames of the sequence are kept in memory
+    shot = iter(shot)
+    capacity = get_histogram_capacity(memory_limit)
+    store = np.empty((min(capacity, HISTOGRAM_BATCH_SIZE), 512), dtype=np.uint32)
+    hist_sum = np.zeros(512)
+    n_frames = 0
+    n_stored = 0
+    step = 1
+    for batch in iter(lambda: list(islice(shot, HISTOGRAM_BATCH_SIZE)), []):
+        with stage("color histograms") as s:
+            hists = calculate_histograms(batch)
+            s.add(frames=len(batch))
+
+        hist_sum += hists.sum(axis=0, dtype=np.float64)
+        for hist in hists:
+            if n_frames % step == 0:
+                if n_stored == capacity:
+                    # Keep every other stored histogram, and store one of every two frames from now on
+                    n_stored = (n_stored + 1) // 2
+                    store[:n_stored] = store[:2 * n_stored:2]
+                    step *= 2
 
-    # Loop through all the sequences
-    for i in range(len(iframes) - 1):
-        all_hist = []
-        for j in range(iframes[i], iframes[i + 1]):
-            frame = Frame(j, frames_dir)
-            all_hist.append(frame.histogram)
+                if n_frames % step == 0:
+                    if n_stored == len(store):
+                        # Grow the array up to its capacity
+                        store = np.resize(store, (min(2 * len(store), capacity), 512))
+                    store[n_stored] = hist
+                    n_stored += 1
 
-        all_hist = np.array(all_hist)
-        color_mean = np.mean(all_hist, axis=0)
+            n_frames += 1
 
-        # Find closest frame to average frame
-        min_corr = -1
-        # Initialize so it doesn't error in case program doesn't go inside if statement
-        min_idx = j
-        for h in range(all_hist.shape[0]):
-            corr = cv2.compareHist(all_hist[h], color_mean, cv2.HISTCMP_CORREL)
-            if corr >= min_corr:
-                min_corr = corr
-                min_idx = h
+    if n_frames == 0:
+        return start
 
-        # Add new keyframe index
-        keyframes[i] = iframes[i] + min_idx
+    with stage("color comparison"):
+        color_mean = hist_sum / n_frames
 
-    return keyframes
+        # Find closest frame to average frame, comparing only the stored histograms (the rows after n_stored are not
+        # initialized), in chunks that fit in the memory not used by the array (every histogram is converted to float64,
+        # with 4 sums and its correlation, see compare_histograms()). In case of a tie, the last frame is selected
+        chunk_size = max(1, (memory_limit - store.nbytes - HISTOGRAM_BATCH_MEMORY) // ((512 + 4) * 8))
+        max_corr = -np.inf
+        max_idx = 0
+        for i in range(0, n_stored, chunk_size):
+            corr = compare_histograms(store[i:min(i + chunk_size, n_stored)], color_mean)
+            idx = len(corr) - 1 - int(np.argmax(corr[::-1]))
+            if corr[idx] >= max_corr:
+                max_corr = corr[idx]
+                max_idx = i + idx
 
+    return start + max_idx * step
 
-def get_keyframes_flow(iframes, frames_dir):
+
+def get_histogram_capacity(memory_limit=SHOT_MEMORY_LIMIT):
+    """Gets the maximum number of color histograms stored by select_keyframe_color() for a memory limit.
+
+    The array of histograms grows by doubling its size, so the old and the new arrays exist at the same time while it
+    grows: only half of the memory left by the histograms of a batch (see HISTOGRAM_BATCH_MEMORY) is used by the
+    array.
+
+    Args:
+        memory_limit (int): Maximum memory used to score the color histograms of a shot sequence, in bytes.
+
+    Returns:
+        int: Maximum number of stored histograms (at least 2).
+
+    """
+    return max(2, (memory_limit - HISTOGRAM_BATCH_MEMORY) // 2 // (512 * np.dtype(np.uint32).itemsize))
+
+
+def get_keyframes_flow(iframes, frames, segmenter="iframes"):
     """Method to compute the most relevant frame (keyframe) on each shot sequence, based on optical flow.
 
     The iframes mark the start of every shot sequence. For every shot sequence, one frame is selected as new
-    keyframe.
-
-    The selected keyframe is the most still frame in the shot sequence, compared with its previous frames.
+    keyframe (see select_keyframe_flow()).
 
     Args:
         iframes (list): List with all the iframes in the video.
-        frames_dir (str): Directory where all the frames of the video are stored (extracted previously).
+        frames (iterable): All the frames of the video, in order (see stream_frames() and read_frames()).
+        segmenter (str): Either "iframes", if the shot sequences start at every iframe, or "content", if they start at
+                         every cut detected from the content of the frames (see iter_content_shots()).
 
     Returns:
         list: List of all relevant keyframes indices in the video, one for each sequence.
 
     """
-    keyframes = [None] * (len(iframes) - 1)
+    return list(iter_shot_keyframes(select_keyframe_flow, iframes, frames, segmenter))
+
+
+def select_keyframe_flow(start, shot):
+    """Selects the most relevant frame of a shot sequence, based on optical flow.
 
-    # Loop through all the sequences
-    for i in range(len(iframes) - 1):
-        # Load first frame of the sequence
-        frame_prev = Frame(iframes[i], frames_dir, extract_features=True)
+    The selected keyframe is the most still frame in the shot sequence, compared with its previous frames.
+
+    Args:
+        start (int): Index of the first frame of the shot sequence.
+        shot (iterable): Frames of the shot sequence, in order.
 
-        # Loop through the rest of the frames in the sequence
-        min_motion = np.Inf
-        min_motion_idx = iframes[i]
-        for j in range(iframes[i] + 1, iframes[i + 1]):
-            frame = Frame(j, frames_dir, extract_features=True)
+    Returns:
+        int: Index of the keyframe in the video. The first frame of the shot sequence if it has no frames (eg.: the
+             video has fewer frames than probed).
+
+    """
+    shot = iter(shot)
+
+    # Load first frame of the sequence. Only the grayscale image and the corners of every frame are computed, and
+    # every frame is carried over as the previous frame of the next one
+    im = next(shot, None)
+    if im is None:
+        return start
+
+    with stage("optical flow") as s:
+        frame_prev = Frame(start, im, extract_features=True)
+        s.add(frames=1)
+
+    # Loop through the rest of the frames in the sequence
+    min_motion = np.inf
+    min_motion_idx = start
+    for j, im in enumerate(shot, start + 1):
+        with stage("optical flow") as s:
+            frame = Frame(j, im, extract_features=True)
 
             # Calculate motion difference
             motion = calculate_stillness(frame, frame_prev)
+            s.add(frames=1)
+
+        # Compute frame with minimum motion, if motion is not None
+        # Motion is None only if previous frame has no features (eg.: black frame, i.e. no corners)
+        if motion is not None and motion < min_motion:
+            min_motion = motion
+            min_motion_idx = j
+
+        frame_prev = frame
 
-            # Compute frame with minimum motion, if motion is not None
-            # Motion is None only if previous frame has no features (eg.: black frame, i.e. no corners)
-            if motion is not None and motion < min_motion:
-                min_motion = motion
-                min_motion_idx = j
+    return min_motion_idx
 
-            frame_prev = frame
 
-        keyframes[i] = min_motion_idx
+def iter_shot_keyframes(select_keyframe, iframes, frames, segmenter="iframes"):
+    """Selects the most relevant frame (keyframe) on each shot sequence, and yields it as soon as the shot sequence has
+    been scored.
+
+    Args:
+        select_keyframe (function): Function that selects the keyframe of a shot sequence (eg.:
+                                    select_keyframe_color() or select_keyframe_flow()).
+        iframes (list): List with all the iframes in the video.
+        frames (iterable): All the frames of the video, in order (see stream_frames() and read_frames()).
+        segmenter (str): Either "iframes", if the shot sequences start at every iframe, or "content", if they start at
+                         every cut detected from the content of the frames, while they are consumed (see
+                         iter_content_shots()).
+
+    Yields:
+        int: Index of the keyframe of every shot sequence, in order.
+
+    """
+    shots = iter_content_shots(frames) if segmenter == "content" else iter_shots(frames, iframes)
+    for start, shot in shots:
+        yield select_keyframe(start, shot)
+
+
+def iter_sampled_shot_keyframes(select_keyframe, iframes, indexed_frames, segmenter="iframes"):
+    """Selects the most relevant frame (keyframe) on each shot sequence of a sample of the frames of a video (see
+    stream_sampled_frames()), and yields it as soon as the shot sequence has been scored.
+
+    Only the sampled frames are scored, and the keyframes are given as indices of the frames in the video. A shot
+    sequence without sampled frames has its first frame as keyframe.
+
+    Args:
+        select_keyframe (function): Function that selects the keyframe of a shot sequence (eg.:
+                                    select_keyframe_color() or select_keyframe_flow()).
+        iframes (list): List with all the iframes in the video.
+        indexed_frames (iterable): Sampled frames of the video, in order, as tuples (index, frame).
+        segmenter (str): Either "iframes" or "content" (see iter_shot_keyframes()).
+
+    Yields:
+        int: Index of the keyframe of every shot sequence, in order.
+
+    """
+    # Index in the video of every sampled frame, in the order they are consumed
+    indices = []
+
+    def iter_images(frames):
+        for idx, im in frames:
+            indices.append(idx)
+            yield im
+
+    if segmenter == "content":
+        for pos in iter_shot_keyframes(select_keyframe, iframes, iter_images(indexed_frames), segmenter):
+            yield indices[pos]
+        return
+
+    starts = get_shot_starts(iframes)
+
+    def get_shot(frame):
+        return bisect.bisect_right(starts, frame[0]) - 1
+
+    next_shot = 0
+    for shot_number, shot in groupby(indexed_frames, key=get_shot):
+        # Shot sequences without sampled frames
+        yield from starts[next_shot:shot_number]
+        next_shot = shot_number + 1
+
+        yield indices[select_keyframe(len(indices), iter_images(shot))]
+
+    yield from starts[next_shot:]
+
+
+def get_keyframes_parallel(select_keyframe, ffmpeg_exe, ffprobe_exe, video_file, iframes, frame_times, workers,
+                           analysis_size=None, profile=None):
+    """Computes the most relevant frame (keyframe) on each shot sequence, scoring the shots in parallel.
+
+    Every shot sequence is independent from the rest, so the shots are distributed across a pool of processes. Each
+    process seeks directly to the start of its shot and decodes only the frames of the shot (see stream_frames()), so
+    no frames are sent between processes. The keyframes are returned in order, regardless of which shot finishes
+    first.
+
+    Args:
+        select_keyframe (function): Function that selects the keyframe of a shot sequence (eg.:
+                                    select_keyframe_color() or select_keyframe_flow()).
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+        iframes (list): List with all the iframes in the video.
+        frame_times (list): Time of every frame in the video, in seconds (see get_frame_times()).
+        workers (int): Number of processes used to score the shots.
+        analysis_size (int): Maximum width of the frames used to score the shots (see get_analysis_size()).
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile).
+
+    Returns:
+        list: List of all relevant keyframes indices in the video, one for each sequence.
+
+    """
+    return list(iter_keyframes_parallel(select_keyframe, ffmpeg_exe, ffprobe_exe, video_file, iframes, frame_times,
+                                        workers, analysis_size, profile))
+
+
+def iter_keyframes_parallel(select_keyframe, ffmpeg_exe, ffprobe_exe, video_file, iframes, frame_times, workers,
+                            analysis_size=None, profile=None):
+    """Selects the most relevant frame (keyframe) on each shot sequence, scoring the shots in parallel, and yields the
+    keyframes in order as soon as they are known (see get_keyframes_parallel()).
+
+    Only a few shots per process are submitted in advance, so the memory doesn't grow with the length of the video.
+
+    Args:
+        select_keyframe (function): Function that selects the keyframe of a shot sequence.
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+        iframes (list): List with all the iframes in the video.
+        frame_times (list): Time of every frame in the video, in seconds (see get_frame_times()).
+        workers (int): Number of processes used to score the shots.
+        analysis_size (int): Maximum width of the frames used to score the shots (see get_analysis_size()).
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder (see DecodeProfile).
+
+    Yields:
+        int: Index of the keyframe of every shot sequence, in order.
+
+    """
+    size = get_video_size(ffprobe_exe, video_file)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        # The last shot goes from the last iframe to the end of the video
+        starts = get_shot_starts(iframes)
+        for start, end in zip(starts, starts[1:] + [len(frame_times)]):
+            if start >= end:
+                continue
+
+            pending.append(executor.submit(select_keyframe_in_range, select_keyframe, ffmpeg_exe, ffprobe_exe,
+                                           video_file, start, end - start, frame_times[start], size, analysis_size,
+                                           profile))
+
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def select_keyframe_in_range(select_keyframe, ffmpeg_exe, ffprobe_exe, video_file, start, n_frames, start_time, size,
+                             analysis_size=None, profile=None):
+    """Decodes a shot sequence of a video and selects its keyframe. It is run by every process of
+    get_keyframes_parallel().
+
+    Args:
+        select_keyframe (function): Function that selects the keyframe of a shot sequence.
+        ffmpeg_exe (str): ffmpeg executable.
+        ffprobe_exe (str): ffprobe executable.
+        video_file (str): Path of the video.
+        start (int): Index of the first frame of the shot sequence.
+        n_frames (int): Number of frames in the shot sequence.
+        start_time (float): Time of the first frame of the shot sequence, in seconds.
+        size (tuple(int)): Width and height of the video frames.
+        analysis_size (int): Maximum width of the frames used to score the shot.
+        profile (str or obj DecodeProfile): Decode profile with the options of the decoder.
+
+    Returns:
+        int: Index of the keyframe in the video.
+
+    """
+    shot = stream_frames(ffmpeg_exe, ffprobe_exe, video_file, start_time=start_time, n_frames=n_frames, size=size,
+                         analysis_size=analysis_size, profile=profile)
 
-    return keyframes
+    return select_keyframe(start, shot)